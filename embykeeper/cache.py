@@ -1,117 +1,1101 @@
+import asyncio
+import atexit
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import copy
+from datetime import datetime, timedelta, timezone
 import json
-from typing import Any, List
+import os
+from pathlib import Path
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from loguru import logger
 
 from .utils import CachedFuncProxy
 from .config import config
 
+# 前缀范围查询的上界后缀, 大于任何合法字符
+_KEY_MAX = "\U0010ffff"
 
-class Cache:
-    def __init__(self):
-        self._mongo_client = None
-        if hasattr(config, "mongodb") and config.mongodb:
-            try:
-                from pymongo import MongoClient
+# 读缓存中各前缀的默认过期时间 (秒), 托管部署中配置可能被外部修改, 不做缓存
+_LRU_PREFIX_TTL = {"config": 0}
 
-                self._mongo_client = MongoClient(config.mongodb)
-                self._db = self._mongo_client.embykeeper
-                self._collection = self._db.cache
-            except ImportError:
-                logger.warning("没有安装 pymongo 包, 将使用 JSON 存储缓存.")
-                self._setup_json_cache()
+# JSON 缓存快照中保存过期时间表的保留键
+_EXPIRES_KEY = "__expires__"
+
+# 待写入队列中的占位值
+_MISSING = object()
+_DELETED = object()
+
+
+class _Journal:
+    """JSON 缓存的追加写入日志.
+
+    每次修改仅追加一行记录, 由后台线程定时批量落盘 (fsync), 并在记录数超过阈值时压缩为快照文件.
+    快照写入流程: 轮换日志为 ".old" -> 写入临时快照 -> 原子替换快照 -> 删除 ".old", 任何一步崩溃后均可通过重放恢复.
+    """
+
+    def __init__(
+        self,
+        snapshot: Path,
+        lock: threading.RLock,
+        snapshot_data: Callable[[], Any],
+        flush_interval: float = 1.0,
+        compact_threshold: int = 1000,
+    ):
+        """
+        Args:
+            snapshot: 快照文件路径
+            lock: 与缓存数据共享的锁, 生成快照时需持有
+            snapshot_data: 在持有锁时调用, 返回当前数据的副本, 将在释放锁后序列化
+            flush_interval: 批量落盘间隔 (秒)
+            compact_threshold: 日志记录数超过该值时触发压缩
+        """
+        self.snapshot = snapshot
+        self.path = snapshot.with_name(snapshot.name + ".journal")
+        self.old_path = snapshot.with_name(snapshot.name + ".journal.old")
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        self._lock = lock
+        self._snapshot_data = snapshot_data
+        self._compact_lock = threading.Lock()  # 压缩过程互斥, 写入快照时不阻塞缓存读写
+        self._file = None
+        self._dirty = False
+        self._entries = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def pending(self):
+        """是否存在尚未压缩到快照中的日志."""
+        return self.old_path.exists() or (self.path.exists() and self.path.stat().st_size > 0)
+
+    def replay(self, apply: Callable[[list], None]) -> int:
+        """按顺序重放遗留日志, 返回重放的记录数."""
+        count = 0
+        for path in (self.old_path, self.path):
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 最后一条记录可能因崩溃而写入不完整
+                        logger.warning("缓存日志存在不完整的记录, 已忽略.")
+                        break
+                    try:
+                        apply(entry)
+                    except (TypeError, AttributeError, IndexError):
+                        continue
+                    count += 1
+        return count
+
+    def start(self):
+        if not self._file:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._worker, name="cache-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, entry: list):
+        """追加一条记录, 需在持有锁时调用."""
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._dirty = True
+        self._entries += 1
+        if self._entries >= self.compact_threshold:
+            self._wakeup.set()
+
+    def sync(self):
+        """将已追加的记录落盘."""
+        with self._lock:
+            if not self._dirty or not self._file:
+                return
+            self._file.flush()
+            self._dirty = False
+            fd = self._file.fileno()
+        os.fsync(fd)
+
+    def compact(self):
+        """将当前数据写为快照, 并清空日志. 仅在持有锁时复制数据, 序列化和写入在锁外进行."""
+        with self._compact_lock:
+            with self._lock:
+                data = self._snapshot_data()
+                if self._file:
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._file.close()
+                    self._file = None
+                self._rotate()
+                if not self._closed:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._dirty = False
+                self._entries = 0
+            text = json.dumps(data, ensure_ascii=False)
+            tmp = self.snapshot.with_name(self.snapshot.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot)
+            self.old_path.unlink(missing_ok=True)
+
+    def _rotate(self):
+        if not self.path.exists():
+            return
+        if self.old_path.exists():
+            # 上一次压缩未完成, 合并到旧日志中以免丢失尚未写入快照的记录
+            with open(self.old_path, "a", encoding="utf-8") as old, open(
+                self.path, "r", encoding="utf-8"
+            ) as cur:
+                shutil.copyfileobj(cur, old)
+                old.flush()
+                os.fsync(old.fileno())
+            self.path.unlink()
         else:
-            self._setup_json_cache()
+            os.replace(self.path, self.old_path)
+
+    def _worker(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._closed:
+                break
+            try:
+                self.sync()
+                if self._entries >= self.compact_threshold:
+                    self.compact()
+            except OSError as e:
+                logger.warning(f"缓存日志写入失败: {e}.")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+        try:
+            if self._entries or self.pending:
+                self.compact()
+            elif self._file:
+                self._file.close()
+                self._file = None
+        except OSError as e:
+            logger.warning(f"缓存日志写入失败: {e}.")
+
+
+class _JSONBackend:
+    """JSON 文件缓存, 数据常驻内存, 键中的 "." 表示嵌套层级."""
 
-    def _setup_json_cache(self):
-        self._cache_file = config.basedir / "cache.json"
+    in_memory = True
+
+    def __init__(self, file: Path, journal: bool = True):
+        self._cache_file = file
         self._data = {}
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._journal: _Journal = None
         if self._cache_file.exists():
             try:
                 with open(self._cache_file, "r", encoding="utf-8") as f:
                     self._data = json.load(f)
+                self._expires = self._data.pop(_EXPIRES_KEY, {})
             except json.JSONDecodeError:
                 logger.warning("缓存文件损坏, 将使用全新缓存.")
+        if journal:
+            self._journal = _Journal(
+                self._cache_file,
+                self._lock,
+                self._snapshot,
+                flush_interval=config.cache.flush_interval,
+                compact_threshold=config.cache.compact_threshold,
+            )
+            if self._journal.pending:
+                count = self._journal.replay(self._apply_journal_entry)
+                logger.debug(f"已从缓存日志恢复 {count} 条记录.")
+                self._journal.compact()
+            self._journal.start()
 
-    def get(self, key: str, default: Any = None) -> Any:
-        if self._mongo_client:
-            result = self._collection.find_one({"_id": key})
-            return result["value"] if result else default
-        else:
-            value = self._data
-            try:
-                for part in key.split("."):
-                    value = value.get(part, {})
-                return default if value == {} else value
-            except (AttributeError, TypeError):
-                return default
-
-    def set(self, key: str, value: Any) -> None:
-        if self._mongo_client:
-            self._collection.update_one({"_id": key}, {"$set": {"value": value}}, upsert=True)
+    def _apply_journal_entry(self, entry: list):
+        op, key = entry[0], entry[1]
+        if op == "set":
+            self._set(key, entry[2], *entry[3:])
+        elif op == "delete":
+            self._delete(key)
+
+    def _snapshot(self) -> dict:
+        """复制全部数据用于写入快照, 过期时间表保存在快照的保留键中.
+
+        仅复制嵌套的字典, 叶子值在写入时整体替换而不会原地修改, 因此可以共享.
+        """
+
+        def copy_tree(d: dict):
+            return {k: copy_tree(v) if isinstance(v, dict) else v for k, v in d.items()}
+
+        data = copy_tree(self._data)
+        if self._expires:
+            data[_EXPIRES_KEY] = dict(self._expires)
+        return data
+
+    def _dump(self) -> str:
+        """序列化全部数据, 过期时间表保存在快照的保留键中."""
+        if self._expires:
+            return json.dumps({**self._data, _EXPIRES_KEY: self._expires}, ensure_ascii=False)
+        return json.dumps(self._data, ensure_ascii=False)
+
+    def _save(self, *entries: list):
+        """持久化修改: 日志模式下追加记录, 否则重写整个缓存文件."""
+        if self._journal:
+            for entry in entries:
+                self._journal.append(entry)
         else:
-            parts = key.split(".")
-            current = self._data
-            for part in parts[:-1]:
-                current = current.setdefault(part, {})
-            current[parts[-1]] = value
             with open(self._cache_file, "w", encoding="utf-8") as f:
-                json.dump(self._data, f, ensure_ascii=False)
+                f.write(self._dump())
+
+    def _expired(self, key: str, now: float = None) -> bool:
+        """键或其任一上级键是否已过期."""
+        now = now or time.time()
+        parts = key.split(".")
+        for i in range(len(parts), 0, -1):
+            expire_at = self._expires.get(".".join(parts[:i]))
+            if expire_at is not None and expire_at <= now:
+                return True
+        return False
+
+    def _prune_expired(self, key: str, value: dict, now: float) -> dict:
+        """返回移除了已过期下级键的字典副本, 没有过期的下级键时返回原字典."""
+        prefix = key + "."
+        expired = {k[len(prefix) :] for k, t in self._expires.items() if t <= now and k.startswith(prefix)}
+        if not expired:
+            return value
+
+        def prune(d: dict, path: str):
+            result = {}
+            for k, v in d.items():
+                sub = f"{path}.{k}" if path else k
+                if sub in expired:
+                    continue
+                if isinstance(v, dict):
+                    v = prune(v, sub)
+                    if not v:
+                        continue
+                result[k] = v
+            return result
+
+        return prune(value, "")
+
+    def _clear_expires(self, key: str):
+        """
+        清除键及其子键的过期时间.
+        上级键的过期时间将下放到其余子键, 以免之后清理上级键时删除新写入的值.
+        """
+        if not self._expires:
+            return
+        self._expires.pop(key, None)
+        prefix = key + "."
+        for k in [k for k in self._expires if k.startswith(prefix)]:
+            del self._expires[k]
+        parts = key.split(".")
+        # 由近及远处理, 子键已有的过期时间优先
+        for i in range(len(parts) - 1, 0, -1):
+            parent = ".".join(parts[:i])
+            expire_at = self._expires.pop(parent, None)
+            if expire_at is None:
+                continue
+            node = self._data
+            for part in parts[:i]:
+                node = node.get(part) if isinstance(node, dict) else None
+            stack = [(node, parent)]
+            while stack:
+                node, path = stack.pop()
+                if isinstance(node, dict):
+                    stack.extend((v, f"{path}.{k}") for k, v in node.items())
+                elif path != key and not path.startswith(prefix):
+                    self._expires.setdefault(path, expire_at)
+
+    def _set(self, key: str, value: Any, expire_at: float = None):
+        self._clear_expires(key)
+        if expire_at:
+            self._expires[key] = expire_at
+        parts = key.split(".")
+        current = self._data
+        for part in parts[:-1]:
+            child = current.get(part)
+            if not isinstance(child, dict):
+                child = current[part] = {}
+            current = child
+        current[parts[-1]] = value
+
+    def _delete(self, key: str) -> bool:
+        self._clear_expires(key)
+        parts = key.split(".")
+        current = self._data
+        path = []
+
+        # 遍历路径，检查每一层
+        for part in parts[:-1]:
+            if not isinstance(current, dict) or part not in current:
+                return False
+            path.append((current, part))
+            current = current[part]
+
+        # 检查并删除最后一个键
+        if not (isinstance(current, dict) and parts[-1] in current):
+            return False
+        del current[parts[-1]]
+
+        # 清理空字典
+        for parent, part in reversed(path):
+            if not parent[part]:
+                del parent[part]
+            else:
+                break
+        return True
+
+    def items(self, prefix: str = ""):
+        """遍历所有叶子键值对."""
+
+        now = time.time()
+
+        def walk(d, current_path=""):
+            for k, v in d.items():
+                path = f"{current_path}.{k}" if current_path else k
+                if isinstance(v, dict):
+                    yield from walk(v, path)
+                elif path.startswith(prefix) and not self._expired(path, now):
+                    yield path, v
+
+        with self._lock:
+            return list(walk(self._data))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        if self._expires and self._expired(key, now):
+            return default
+        value = self._data
+        try:
+            for part in key.split("."):
+                value = value.get(part, {})
+        except (AttributeError, TypeError):
+            return default
+        if isinstance(value, dict) and self._expires:
+            value = self._prune_expired(key, value, now)
+        return default if value == {} else value
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        with self._lock:
+            if ttl:
+                expire_at = time.time() + ttl
+                self._set(key, value, expire_at)
+                self._save(["set", key, value, expire_at])
+            else:
+                self._set(key, value)
+                self._save(["set", key, value])
 
     def delete(self, key: str) -> None:
-        if self._mongo_client:
-            self._collection.delete_one({"_id": key})
+        with self._lock:
+            if self._delete(key):
+                self._save(["delete", key])
+
+    def get_many(self, keys: Iterable[str], default: Any = None) -> Dict[str, Any]:
+        return {key: self.get(key, default) for key in keys}
+
+    def set_many(self, items: Dict[str, Any], ttl: float = None) -> None:
+        expire_at = time.time() + ttl if ttl else None
+        with self._lock:
+            entries = []
+            for key, value in items.items():
+                self._set(key, value, expire_at)
+                entries.append(["set", key, value, expire_at] if expire_at else ["set", key, value])
+            self._save(*entries)
+
+    def find_by_prefix(self, prefix: str) -> List[str]:
+        return [k for k, _ in self.items(prefix)]
+
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            deleted = [key for key in keys if self._delete(key)]
+            # 只在有改动时写入一次文件
+            if deleted:
+                self._save(*[["delete", key] for key in deleted])
+
+    def compact(self) -> int:
+        """删除过期的键并合并日志, 返回删除的键数量."""
+        with self._lock:
+            now = time.time()
+            expired = [key for key, expire_at in self._expires.items() if expire_at <= now]
+            for key in expired:
+                self._delete(key)
+            if expired:
+                self._save(*[["delete", key] for key in expired])
+        if self._journal and self._journal.pending:
+            self._journal.compact()
+        return len(expired)
+
+    def close(self):
+        if self._journal:
+            self._journal.close()
+
+
+class _MongoBackend:
+    """MongoDB 缓存, 每个键为一个文档."""
+
+    in_memory = False
+
+    def __init__(self, url: str):
+        from pymongo import MongoClient
+
+        self._mongo_client = MongoClient(url)
+        self._db = self._mongo_client.embykeeper
+        self._collection = self._db.cache
+        # 由 MongoDB 自动删除过期的文档
+        self._collection.create_index("expire_at", expireAfterSeconds=0)
+
+    @staticmethod
+    def _now():
+        # pymongo 默认返回不带时区的 UTC 时间
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        result = self._collection.find_one({"_id": key})
+        if not result:
+            return default
+        # MongoDB 的过期清理每分钟进行一次, 因此读取时仍需检查
+        expire_at = result.get("expire_at")
+        if expire_at and expire_at <= self._now():
+            return default
+        return result["value"]
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        if ttl:
+            update = {"$set": {"value": value, "expire_at": self._now() + timedelta(seconds=ttl)}}
+        else:
+            update = {"$set": {"value": value}, "$unset": {"expire_at": ""}}
+        self._collection.update_one({"_id": key}, update, upsert=True)
+
+    def get_many(self, keys: Iterable[str], default: Any = None) -> Dict[str, Any]:
+        keys = list(keys)
+        results = dict.fromkeys(keys, default)
+        now = self._now()
+        for doc in self._collection.find({"_id": {"$in": keys}}):
+            expire_at = doc.get("expire_at")
+            if not (expire_at and expire_at <= now):
+                results[doc["_id"]] = doc["value"]
+        return results
+
+    def set_many(self, items: Dict[str, Any], ttl: float = None) -> None:
+        from pymongo import UpdateOne
+
+        if ttl:
+            expire_at = self._now() + timedelta(seconds=ttl)
+            updates = [{"$set": {"value": v, "expire_at": expire_at}} for v in items.values()]
         else:
-            parts = key.split(".")
-            current = self._data
-            path = []
+            updates = [{"$set": {"value": v}, "$unset": {"expire_at": ""}} for v in items.values()]
+        requests = [UpdateOne({"_id": k}, u, upsert=True) for k, u in zip(items, updates)]
+        if requests:
+            self._collection.bulk_write(requests, ordered=False)
+
+    def delete(self, key: str) -> None:
+        self._collection.delete_one({"_id": key})
+
+    def find_by_prefix(self, prefix: str) -> List[str]:
+        # 使用范围查询, 可以利用 _id 索引, 且无需转义正则
+        query = {"_id": {"$gte": prefix, "$lt": prefix + _KEY_MAX}}
+        return [doc["_id"] for doc in self._collection.find(query, {"_id": 1})]
+
+    def delete_many(self, keys: List[str]) -> None:
+        self._collection.delete_many({"_id": {"$in": keys}})
+
+    def compact(self) -> int:
+        # 过期文档由 TTL 索引自动删除
+        return 0
+
+    def close(self):
+        self._mongo_client.close()
+
+
+class _LRUBackend:
+    """远程缓存后端前的进程内读缓存.
+
+    按最近使用淘汰, 总大小不超过上限, 每个键按前缀设定过期时间. 写入和删除将同步更新读缓存.
+    """
+
+    in_memory = False
+
+    def __init__(self, backend, max_bytes: int, ttl: float, prefix_ttl: Dict[str, float] = None):
+        """
+        Args:
+            backend: 被包裹的缓存后端
+            max_bytes: 读缓存的最大总大小 (字节, 以 JSON 序列化长度估算)
+            ttl: 默认过期时间 (秒)
+            prefix_ttl: 各前缀的过期时间 (秒), 最长匹配的前缀生效, 0 表示不缓存
+        """
+        self._backend = backend
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._prefix_ttl = {**_LRU_PREFIX_TTL, **(prefix_ttl or {})}
+        self._items: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._size = 0
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_ttl(self, key: str) -> float:
+        parts = key.split(".")
+        for i in range(len(parts), 0, -1):
+            ttl = self._prefix_ttl.get(".".join(parts[:i]))
+            if ttl is not None:
+                return ttl
+        return self._ttl
+
+    def _discard(self, key: str):
+        item = self._items.pop(key, None)
+        if item:
+            self._size -= item[1]
+
+    def _lookup(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+            if item and item[2] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self._discard(key)
+            self.misses += 1
+            return _MISSING
+
+    def _store(self, key: str, value: Any, version: int = None, ttl: float = None):
+        ttl = min(self._get_ttl(key), ttl) if ttl else self._get_ttl(key)
+        size = 0 if value is _DELETED else len(json.dumps(value, ensure_ascii=False, default=str))
+        with self._lock:
+            # 读取期间发生过写入时, 读取的值可能已过时, 不予缓存
+            if version is not None and version != self._version:
+                return
+            self._discard(key)
+            if ttl <= 0 or size > self._max_bytes:
+                return
+            self._items[key] = (value, size, time.monotonic() + ttl)
+            self._size += size
+            while self._size > self._max_bytes:
+                _, (_, s, _) = self._items.popitem(last=False)
+                self._size -= s
+                self.evictions += 1
+
+    def _invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            self._version += 1
+            for key in keys:
+                self._discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "items": len(self._items),
+                "bytes": self._size,
+            }
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup(key)
+        if value is _MISSING:
+            version = self._version
+            value = self._backend.get(key, _DELETED)
+            self._store(key, value if value is _DELETED else copy.deepcopy(value), version)
+        elif value is not _DELETED:
+            value = copy.deepcopy(value)
+        return default if value is _DELETED else value
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        self._invalidate([key])
+        self._backend.set(key, value, ttl)
+        self._store(key, copy.deepcopy(value), ttl=ttl)
 
-            # 遍历路径，检查每一层
+    def delete(self, key: str) -> None:
+        self._invalidate([key])
+        self._backend.delete(key)
+        self._store(key, _DELETED)
+
+    def get_many(self, keys: Iterable[str], default: Any = None) -> Dict[str, Any]:
+        results = {}
+        missing = []
+        for key in keys:
+            value = self._lookup(key)
+            if value is _MISSING:
+                missing.append(key)
+            elif value is not _DELETED:
+                results[key] = copy.deepcopy(value)
+        if missing:
+            version = self._version
+            for key, value in self._backend.get_many(missing, _DELETED).items():
+                self._store(key, value if value is _DELETED else copy.deepcopy(value), version)
+                if value is not _DELETED:
+                    results[key] = value
+        return {key: results.get(key, default) for key in keys}
+
+    def set_many(self, items: Dict[str, Any], ttl: float = None) -> None:
+        self._invalidate(items)
+        self._backend.set_many(items, ttl)
+        for key, value in items.items():
+            self._store(key, copy.deepcopy(value), ttl=ttl)
+
+    def find_by_prefix(self, prefix: str) -> List[str]:
+        return self._backend.find_by_prefix(prefix)
+
+    def delete_many(self, keys: List[str]) -> None:
+        self._invalidate(keys)
+        self._backend.delete_many(keys)
+
+    def compact(self) -> int:
+        return self._backend.compact()
+
+    def close(self):
+        stats = self.stats()
+        total = stats["hits"] + stats["misses"]
+        if total:
+            logger.debug(
+                f"缓存读取命中率: {stats['hits'] / total:.1%} ({stats['hits']}/{total}), 淘汰 {stats['evictions']} 条."
+            )
+        self._backend.close()
+
+
+class _SQLiteBackend:
+    """SQLite 缓存, 以完整的键为主键, 前缀查询为索引上的范围扫描.
+
+    为与 JSON 缓存行为一致, 字典值将展开为各叶子键分别保存, 写入时删除与其重叠的上级和下级键;
+    当键不存在时, 将以其下级键组装为字典返回.
+    """
+
+    in_memory = False
+
+    def __init__(self, file: Path):
+        self._file = file
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(file), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expire_at REAL) WITHOUT ROWID"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(cache)")]
+        if "expire_at" not in columns:
+            self._conn.execute("ALTER TABLE cache ADD COLUMN expire_at REAL")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._conn.execute("COMMIT")
+
+    def _scan(self, prefix: str, columns: str = "key"):
+        return self._conn.execute(
+            f"SELECT {columns} FROM cache WHERE key >= ? AND key < ? "
+            "AND (expire_at IS NULL OR expire_at > ?) ORDER BY key",
+            (prefix, prefix + _KEY_MAX, time.time()),
+        )
+
+    def _delete(self, conn: sqlite3.Connection, key: str):
+        conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        conn.execute("DELETE FROM cache WHERE key >= ? AND key < ?", (key + ".", key + "." + _KEY_MAX))
+
+    @staticmethod
+    def _flatten(key: str, value: Any, expire_at: float = None) -> List[Tuple[str, str, Optional[float]]]:
+        """将值展开为叶子键的行, 空字典不产生任何行."""
+        if not isinstance(value, dict):
+            return [(key, json.dumps(value, ensure_ascii=False), expire_at)]
+        rows = []
+        for k, v in value.items():
+            rows.extend(_SQLiteBackend._flatten(f"{key}.{k}", v, expire_at))
+        return rows
+
+    def _replace(self, conn: sqlite3.Connection, key: str, value: Any, expire_at: float = None):
+        """写入键, 并删除其原有的下级键, 以及作为叶子值保存的上级键."""
+        parts = key.split(".")
+        ancestors = [".".join(parts[:i]) for i in range(1, len(parts))]
+        if ancestors:
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(a,) for a in ancestors])
+        self._delete(conn, key)
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, value, expire_at) VALUES (?, ?, ?)",
+            self._flatten(key, value, expire_at),
+        )
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM cache LIMIT 1").fetchone() is None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expire_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                if row[1] is not None and row[1] <= time.time():
+                    return default
+                return json.loads(row[0])
+            rows = self._scan(key + ".", "key, value").fetchall()
+        if not rows:
+            return default
+        value = {}
+        for k, v in rows:
+            parts = k[len(key) + 1 :].split(".")
+            current = value
             for part in parts[:-1]:
-                if not isinstance(current, dict) or part not in current:
-                    return
-                current = current[part]
-                path.append((part, current))
-
-            # 检查并删除最后一个键
-            if isinstance(current, dict) and parts[-1] in current:
-                del current[parts[-1]]
-
-                # 清理空字典
-                for part, parent in reversed(path):
-                    if isinstance(parent, dict) and part in parent and not parent[part]:
-                        del parent[part]
-                    else:
-                        break
+                child = current.get(part)
+                if not isinstance(child, dict):
+                    child = current[part] = {}
+                current = child
+            current[parts[-1]] = json.loads(v)
+        return value
 
-            with open(self._cache_file, "w", encoding="utf-8") as f:
-                json.dump(self._data, f, ensure_ascii=False, indent=2)
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        expire_at = time.time() + ttl if ttl else None
+        with self._transaction() as conn:
+            self._replace(conn, key, value, expire_at)
+
+    def delete(self, key: str) -> None:
+        with self._transaction() as conn:
+            self._delete(conn, key)
+
+    def get_many(self, keys: Iterable[str], default: Any = None) -> Dict[str, Any]:
+        return {key: self.get(key, default) for key in keys}
+
+    def set_many(self, items: Dict[str, Any], ttl: float = None) -> None:
+        expire_at = time.time() + ttl if ttl else None
+        with self._transaction() as conn:
+            for key, value in items.items():
+                self._replace(conn, key, value, expire_at)
 
     def find_by_prefix(self, prefix: str) -> List[str]:
-        if self._mongo_client:
-            return [
-                doc["_id"] for doc in self._collection.find({"_id": {"$regex": f"^{prefix}"}}, {"_id": 1})
-            ]
+        with self._lock:
+            return [row[0] for row in self._scan(prefix)]
+
+    def delete_many(self, keys: List[str]) -> None:
+        with self._transaction() as conn:
+            for key in keys:
+                self._delete(conn, key)
+
+    def import_items(self, items: Iterable[Tuple[str, Any]], expires: Dict[str, float] = None) -> int:
+        """在一个事务中写入多个键值对, 返回写入数量.
+
+        Args:
+            items: 键值对
+            expires: 各键的过期时间戳
+        """
+        expires = expires or {}
+        rows = [row for k, v in items for row in self._flatten(k, v, expires.get(k))]
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO cache (key, value, expire_at) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def compact(self) -> int:
+        """删除过期的键, 并将 WAL 合并回数据库文件, 返回删除的键数量."""
+        with self._transaction() as conn:
+            count = conn.execute("DELETE FROM cache WHERE expire_at <= ?", (time.time(),)).rowcount
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("PRAGMA optimize")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_file: Path, backend: _SQLiteBackend):
+    """将 JSON 缓存 (包括未合并的日志) 一次性导入 SQLite 缓存, 并将原文件重命名为 ".migrated"."""
+
+    journal = json_file.with_name(json_file.name + ".journal")
+    if not json_file.exists() and not journal.exists():
+        return
+    source = _JSONBackend(json_file, journal=True)
+    try:
+        count = backend.import_items(source.items(), source._expires)
+    finally:
+        source.close()
+    for path in (json_file, journal):
+        if path.exists():
+            os.replace(path, path.with_name(path.name + ".migrated"))
+    logger.info(f"已将 {count} 条缓存从 {json_file.name} 迁移到 SQLite 缓存.")
+
+
+class Cache:
+    def __init__(self):
+        self._backend = None
+        if hasattr(config, "mongodb") and config.mongodb:
+            try:
+                self._backend = _MongoBackend(config.mongodb)
+                if config.cache.lru_size:
+                    self._backend = _LRUBackend(
+                        self._backend,
+                        max_bytes=config.cache.lru_size * 1024 * 1024,
+                        ttl=config.cache.lru_ttl,
+                        prefix_ttl=config.cache.lru_prefix_ttl,
+                    )
+            except ImportError:
+                logger.warning("没有安装 pymongo 包, 将使用 JSON 存储缓存.")
+        if not self._backend:
+            if config.cache.backend == "sqlite":
+                self._backend = _SQLiteBackend(config.basedir / "cache.db")
+                if self._backend.is_empty():
+                    migrate_json_to_sqlite(config.basedir / "cache.json", self._backend)
+            else:
+                self._backend = _JSONBackend(config.basedir / "cache.json", journal=config.cache.journal)
+
+        # 异步接口: 所有 I/O 在单个线程中顺序执行, 尚未写入的修改合并后批量写入
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-io")
+        self._write_lock = threading.RLock()
+        # 键 -> (值, 过期时间)
+        self._pending: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._inflight: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._waiter: asyncio.Future = None
+        self._writer: asyncio.Task = None
+        self._loop: asyncio.AbstractEventLoop = None  # 后台写入所属的事件循环
+        # 当前上下文中 batch() 收集的修改
+        self._batch: ContextVar[Optional[Dict[str, Tuple[Any, Optional[float]]]]] = ContextVar(
+            "cache_batch", default=None
+        )
+
+        atexit.register(self.close)
+
+    def close(self):
+        """关闭缓存, 将尚未写入的修改持久化."""
+        self._executor.shutdown(wait=True)
+        self._flush_pending()
+        self._backend.close()
+
+    def stats(self) -> Optional[Dict[str, int]]:
+        """读缓存的命中统计, 未启用读缓存时返回 None."""
+        if isinstance(self._backend, _LRUBackend):
+            return self._backend.stats()
+        return None
+
+    def _lookup_pending(self, key: str):
+        """查找尚未写入的修改, 以保证读取到最新写入的值."""
+        for pending in (self._batch.get() or {}, self._pending, self._inflight):
+            # 其他线程可能同时撤回修改, 因此不使用 in 检查后再读取
+            item = pending.get(key, None)
+            if item is not None:
+                return item[0]
+        return _MISSING
+
+    def _write_pending(self, pending: Dict[str, Tuple[Any, Optional[float]]]):
+        """写入多个修改, 连续的同类修改合并为一次批量操作."""
+        with self._write_lock:
+            group, group_ttl, group_keys = {}, None, []
+
+            def flush():
+                if group:
+                    self._backend.set_many(dict(group), group_ttl)
+                    group.clear()
+                if group_keys:
+                    self._backend.delete_many(list(group_keys))
+                    group_keys.clear()
+
+            for key, (value, ttl) in pending.items():
+                if value is _DELETED:
+                    if group:
+                        flush()
+                    group_keys.append(key)
+                else:
+                    if group_keys or (group and ttl != group_ttl):
+                        flush()
+                    group[key] = value
+                    group_ttl = ttl
+            flush()
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        返回当前事件循环. 后台写入任务和 Future 属于首次使用的事件循环,
+        在其他事件循环中使用时 (例如测试或重新启动), 先写入遗留的修改再重置.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                self._flush_pending()
+                self._writer = None
+            self._loop = loop
+        return loop
+
+    def _enqueue(self, items: Dict[str, Tuple[Any, Optional[float]]]) -> asyncio.Future:
+        """将修改加入待写入队列, 返回该批修改写入完成时完成的 Future."""
+        loop = self._bind_loop()
+        self._pending.update(items)
+        if not self._waiter:
+            self._waiter = loop.create_future()
+        if not self._writer or self._writer.done():
+            self._writer = loop.create_task(self._writer_loop())
+        return self._waiter
+
+    def _withdraw(self, keys: Iterable[str]):
+        """撤回尚未写入的同名修改, 以免其在之后覆盖新写入的值. 需持有写入锁."""
+        for key in keys:
+            self._pending.pop(key, None)
+            # 已提交但尚未开始写入的批次在写入时持有同一把锁, 因此不会再写入被撤回的键
+            self._inflight.pop(key, None)
+
+    def _flush_pending(self):
+        """在当前线程立即写入所有尚未写入的修改."""
+        with self._write_lock:
+            # 正在写入的批次先于待写入的修改, 写入后清空以免后台重复写入
+            inflight = dict(self._inflight)
+            self._inflight.clear()
+            pending, self._pending = self._pending, {}
+            waiter, self._waiter = self._waiter, None
+            self._write_pending({**inflight, **pending})
+        if waiter:
+            self._resolve_threadsafe(waiter)
+
+    @staticmethod
+    def _resolve_threadsafe(waiter: asyncio.Future):
+        """在 Future 所属的事件循环中将其完成."""
+
+        def resolve():
+            if not waiter.done():
+                waiter.set_result(None)
+
+        loop = waiter.get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            resolve()
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(resolve)
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while self._waiter:
+            with self._write_lock:
+                # 被取消的写入任务可能遗留尚未写入的批次
+                self._inflight, self._pending = {**self._inflight, **self._pending}, {}
+            waiter, self._waiter = self._waiter, None
+            try:
+                await loop.run_in_executor(self._executor, self._write_pending, self._inflight)
+            except asyncio.CancelledError:
+                # 保留正在写入的批次, 由之后的同步写入或关闭缓存时写入
+                waiter.cancel()
+                raise
+            except Exception as e:
+                waiter.set_exception(e)
+                self._inflight = {}
+            else:
+                waiter.set_result(None)
+                self._inflight = {}
+
+    async def _run(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._lookup_pending(key)
+        if value is not _MISSING:
+            return default if value is _DELETED else value
+        return self._backend.get(key, default)
+
+    def set(self, key: str, value: Any, ttl: float = None) -> None:
+        """写入缓存
+
+        Args:
+            key: 键
+            value: 值
+            ttl: 过期时间 (秒), 为空时永不过期
+        """
+        self._write({key: (value, ttl)})
+
+    def set_nowait(self, key: str, value: Any, ttl: float = None) -> None:
+        """在事件循环中时, 将写入加入后台队列而不等待; 否则直接写入."""
+        self._write_nowait({key: (value, ttl)})
+
+    def get_many(self, keys: Iterable[str], default: Any = None) -> Dict[str, Any]:
+        """批量读取多个键, 返回键到值的字典."""
+        results, missing = self._split_pending(keys, default)
+        if missing:
+            results.update(self._backend.get_many(missing, default))
+        return results
+
+    def set_many(self, items: Dict[str, Any], ttl: float = None) -> None:
+        """批量写入多个键, 仅进行一次持久化 (MongoDB 中为一次 bulk_write).
+
+        Args:
+            items: 键到值的字典
+            ttl: 过期时间 (秒), 为空时永不过期
+        """
+        if items:
+            self._write({k: (v, ttl) for k, v in items.items()})
+
+    @contextmanager
+    def batch(self):
+        """在该上下文中的写入和删除将被暂存, 并在退出时一次性写入; 发生异常时将放弃这些修改.
+
+        在事件循环中使用时, 退出时不会等待写入完成. 嵌套使用时, 由最外层统一写入.
+        """
+        if self._batch.get() is not None:
+            yield self
+            return
+        batch = {}
+        token = self._batch.set(batch)
+        try:
+            yield self
+        finally:
+            self._batch.reset(token)
+        if batch:
+            self._write_nowait(batch)
+
+    def _write(self, items: Dict[str, Tuple[Any, Optional[float]]]):
+        batch = self._batch.get()
+        if batch is not None:
+            batch.update(items)
+            return
+        with self._write_lock:
+            self._withdraw(items)
+            self._write_pending(items)
+
+    def _write_nowait(self, items: Dict[str, Tuple[Any, Optional[float]]]):
+        if self._batch.get() is not None:
+            return self._write(items)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(items)
         else:
+            self._enqueue(items).add_done_callback(self._check_write)
+
+    async def _awrite(self, items: Dict[str, Tuple[Any, Optional[float]]]):
+        if self._batch.get() is not None:
+            return self._write(items)
+        await asyncio.shield(self._enqueue(items))
 
-            def get_keys_with_prefix(d, current_path="", keys=None):
-                if keys is None:
-                    keys = []
-                for k, v in d.items():
-                    path = f"{current_path}.{k}" if current_path else k
-                    if isinstance(v, dict):
-                        get_keys_with_prefix(v, path, keys)
-                    else:
-                        if path.startswith(prefix):
-                            keys.append(path)
-                return keys
+    @staticmethod
+    def _check_write(future: asyncio.Future):
+        if not future.cancelled() and future.exception():
+            logger.warning(f"缓存写入失败: {future.exception()}.")
 
-            return get_keys_with_prefix(self._data)
+    def delete(self, key: str) -> None:
+        self._write({key: (_DELETED, None)})
+
+    def find_by_prefix(self, prefix: str) -> List[str]:
+        self._flush_pending()
+        return self._backend.find_by_prefix(prefix)
 
     def delete_by_prefix(self, prefix: str) -> None:
         keys = self.find_by_prefix(prefix)
-        for key in keys:
-            self.delete(key)
+        self.delete_many(keys)
 
     def delete_many(self, keys: List[str]) -> None:
         """批量删除多个键的缓存
@@ -119,39 +1103,81 @@ class Cache:
         Args:
             keys: 要删除的键列表
         """
-        if self._mongo_client:
-            self._collection.delete_many({"_id": {"$in": keys}})
-        else:
-            # 批量删除所有键，只写入一次文件
-            changed = False
-            for key in keys:
-                parts = key.split(".")
-                current = self._data
-                path = []
+        if keys:
+            self._write({key: (_DELETED, None) for key in keys})
 
-                # 遍历路径，检查每一层
-                for part in parts[:-1]:
-                    if not isinstance(current, dict) or part not in current:
-                        break
-                    current = current[part]
-                    path.append((part, current))
+    def _split_pending(self, keys: Iterable[str], default: Any = None) -> Tuple[Dict[str, Any], List[str]]:
+        """从尚未写入的修改中读取, 返回已读取的值和需要从后端读取的键."""
+        results = {}
+        missing = []
+        for key in keys:
+            value = self._lookup_pending(key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                results[key] = default if value is _DELETED else value
+        return results, missing
 
-                # 检查并删除最后一个键
-                if isinstance(current, dict) and parts[-1] in current:
-                    del current[parts[-1]]
-                    changed = True
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """get 的异步版本, 不阻塞事件循环."""
+        value = self._lookup_pending(key)
+        if value is not _MISSING:
+            return default if value is _DELETED else value
+        if self._backend.in_memory:
+            return self._backend.get(key, default)
+        return await self._run(self._backend.get, key, default)
 
-                    # 清理空字典
-                    for part, parent in reversed(path):
-                        if isinstance(parent, dict) and part in parent and not parent[part]:
-                            del parent[part]
-                        else:
-                            break
+    async def aget_many(self, keys: Iterable[str], default: Any = None) -> Dict[str, Any]:
+        """get_many 的异步版本."""
+        results, missing = self._split_pending(keys, default)
+        if missing:
+            if self._backend.in_memory:
+                results.update(self._backend.get_many(missing, default))
+            else:
+                results.update(await self._run(self._backend.get_many, missing, default))
+        return results
 
-            # 只在有改动时写入一次文件
-            if changed:
-                with open(self._cache_file, "w", encoding="utf-8") as f:
-                    json.dump(self._data, f, ensure_ascii=False, indent=2)
+    async def aset(self, key: str, value: Any, ttl: float = None) -> None:
+        """set 的异步版本, 同一时间的多次写入将被合并."""
+        await self._awrite({key: (value, ttl)})
+
+    async def aset_many(self, items: Dict[str, Any], ttl: float = None) -> None:
+        """set_many 的异步版本."""
+        if items:
+            await self._awrite({k: (v, ttl) for k, v in items.items()})
+
+    async def adelete(self, key: str) -> None:
+        """delete 的异步版本."""
+        await self._awrite({key: (_DELETED, None)})
+
+    async def adelete_many(self, keys: Iterable[str]) -> None:
+        """批量异步删除多个键."""
+        keys = list(keys)
+        if keys:
+            await self._awrite({key: (_DELETED, None) for key in keys})
+
+    async def afind_by_prefix(self, prefix: str) -> List[str]:
+        """find_by_prefix 的异步版本."""
+        self._bind_loop()
+        if self._waiter:
+            await asyncio.shield(self._waiter)
+        return await self._run(self._backend.find_by_prefix, prefix)
+
+    def compact(self) -> int:
+        """删除过期的键并整理存储, 返回删除的键数量."""
+        self._flush_pending()
+        return self._compact()
+
+    def _compact(self) -> int:
+        with self._write_lock:
+            return self._backend.compact()
+
+    async def acompact(self) -> int:
+        """compact 的异步版本."""
+        self._bind_loop()
+        if self._waiter:
+            await asyncio.shield(self._waiter)
+        return await self._run(self._compact)
 
 
 cache: Cache = CachedFuncProxy(lambda: Cache())
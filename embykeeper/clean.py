@@ -1,6 +1,10 @@
+import asyncio
+
+from loguru import logger
 from rich.prompt import Prompt
 
 from .cache import cache
+from .config import config
 from .var import console
 
 
@@ -154,3 +158,19 @@ async def cleaner():
 
     console.print(result + "\n")
     console.rule()
+
+
+async def compactor():
+    """定期清理过期的运行历史和缓存键, 并整理缓存存储."""
+    from .runinfo import RunContext
+
+    while True:
+        await asyncio.sleep(config.cache.compact_interval)
+        try:
+            runs = await RunContext.purge_history()
+            keys = await cache.acompact()
+        except Exception as e:
+            logger.warning(f"缓存整理失败: {e}.")
+        else:
+            if runs or keys:
+                logger.debug(f"缓存整理完成: 清理了 {runs} 条运行历史和 {keys} 个过期键.")
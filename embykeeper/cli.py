@@ -427,6 +427,10 @@ async def main(
 
         return await debug_notifier()
 
+    from .clean import compactor
+
+    compactor_task = asyncio.create_task(compactor())
+
     try:
         checkin_man = None
         if checkiner:
@@ -507,6 +511,14 @@ async def main(
 
         RunContext.cancel_all()
 
+        compactor_task.cancel()
+        await asyncio.gather(compactor_task, return_exceptions=True)
+
+        if var.debug and var.tele_used.is_set():
+            from .telegram.metrics import metrics
+
+            metrics.report()
+
 
 if __name__ == "__main__":
     app()
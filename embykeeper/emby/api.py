@@ -97,14 +97,33 @@ class Emby:
             self._load_credentials()
         return self._user_id
 
-    def _load_credentials(self):
-        data: dict = cache.get(f"emby.credential.{self.hostname}.{self.a.username}", {})
+    @property
+    def _credential_key(self):
+        return f"emby.credential.{self.hostname}.{self.a.username}"
+
+    @property
+    def _env_key(self):
+        return f"emby.env.{self.hostname}.{self.a.username}"
+
+    async def _aload_cache(self):
+        """异步预读取缓存的凭据和环境, 避免在属性访问时阻塞事件循环."""
+        if self._token and self._env:
+            return
+        data = await cache.aget_many([self._credential_key, self._env_key], {})
+        if not self._token:
+            self._load_credentials(data[self._credential_key])
+        if not self._env:
+            self._load_env(data[self._env_key])
+
+    def _load_credentials(self, data: dict = None):
+        if data is None:
+            data = cache.get(self._credential_key, {})
         self._token = data.get("token", None)
         self._user_id = data.get("userid", None)
 
-    def _load_env(self):
-        cache_key = f"emby.env.{self.hostname}.{self.a.username}"
-        data: dict = cache.get(cache_key, {})
+    def _load_env(self, data: dict = None):
+        if data is None:
+            data = cache.get(self._env_key, {})
         if data:
             # 检查用户配置是否与缓存一致
             should_clear = False
@@ -122,7 +141,7 @@ class Emby:
             if should_clear:
                 logger.info("账户设置已修改, 将重新生成环境 (Headers).")
                 self._env = None
-                cache.delete(cache_key)
+                cache.delete(self._env_key)
             else:
                 try:
                     self._env = EmbyEnv.model_validate(data)
@@ -183,7 +202,7 @@ class Emby:
         return uuid.UUID(int=rd.getrandbits(128))
 
     def get_fake_env(self):
-        cached_env: dict = cache.get(f"emby.env.{self.hostname}.{self.a.username}", {})
+        cached_env: dict = cache.get(self._env_key, {})
 
         # 按优先级获取各个值
         is_filebar = random.random() < 0.2
@@ -206,7 +225,7 @@ class Emby:
         }
 
         env = EmbyEnv(**data)
-        cache.set(f"emby.env.{self.hostname}.{self.a.username}", data)
+        cache.set_nowait(self._env_key, data)
         return env
 
     def build_headers(self):
@@ -332,6 +351,8 @@ class Emby:
             self.log.warning("没有提供用户名或密码, 无法登陆, 执行失败.")
             return None
 
+        await self._aload_cache()
+
         data = {
             "Username": self.a.username,
             "Pw": self.a.password,
@@ -360,7 +381,7 @@ class Emby:
                 "token": self.token,
                 "userid": self.user_id,
             }
-            cache.set(f"emby.credential.{self.hostname}.{self.a.username}", cache_data)
+            await cache.aset(self._credential_key, cache_data)
             return self.token
 
     async def play(self, item: Union[dict, int], time: float = 10):
@@ -1,11 +1,19 @@
 from enum import IntEnum
-from typing import Optional, Union
+from typing import Dict, List, Optional, Union
 from io import BytesIO
-from multiprocessing import Process, Queue
+from multiprocessing import Pipe, Process, Queue
+from multiprocessing.connection import Connection
+from queue import Empty
 import asyncio
+import os
+import string
+import threading
 import time
 import uuid
 
+from loguru import logger
+
+from .config import config
 from .data import get_datas
 
 
@@ -20,246 +28,486 @@ class CharRange(IntEnum):
     NOT_NUMBER_LLETTER_ULETTER = 7
 
 
-class OCRService:
-    _pool = {}
-    _pool_lock = asyncio.Lock()
+# 各字符范围包含的字符, 与 DdddOcr.set_ranges 一致
+RANGE_CHARS = {
+    CharRange.NUMBER: string.digits,
+    CharRange.LLETTER: string.ascii_lowercase,
+    CharRange.ULETTER: string.ascii_uppercase,
+    CharRange.LLETTER_ULETTER: string.ascii_letters,
+    CharRange.NUMBER_LLETTER: string.ascii_lowercase + string.digits,
+    CharRange.NUMBER_ULETTER: string.ascii_uppercase + string.digits,
+    CharRange.NUMBER_LLETTER_ULETTER: string.ascii_letters + string.digits,
+}
+
+
+def pool_size() -> int:
+    """每个模型的 OCR 进程数上限, 未设置时为 CPU 核心数的四分之一 (1 - 4 个)."""
+    try:
+        size = config.checkiner.ocr_workers
+    except RuntimeError:  # 配置未加载
+        size = 0
+    return size or min(4, max(1, (os.cpu_count() or 1) // 4))
+
+
+def _varint(buf: bytes, pos: int):
+    result = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_varint(value: int):
+    out = bytearray()
+    while True:
+        b = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _proto_fields(buf: bytes):
+    """逐个返回 protobuf 消息的字段: (字段号, 类型, 字段起点, 值起点, 字段终点)"""
+    pos = 0
+    while pos < len(buf):
+        start = pos
+        tag, pos = _varint(buf, pos)
+        field, wire = tag >> 3, tag & 7
+        if wire == 0:
+            _, end = _varint(buf, pos)
+        elif wire == 1:
+            end = pos + 8
+        elif wire == 2:
+            length, pos = _varint(buf, pos)
+            end = pos + length
+        elif wire == 5:
+            end = pos + 4
+        else:
+            raise ValueError(f"unsupported wire type: {wire}")
+        yield field, wire, start, pos, end
+        pos = end
+
+
+def _proto_rewrite(buf: bytes, field: int, func):
+    """将消息中指定的嵌套消息字段替换为 func(原字段内容), func 返回 None 时保留原字段"""
+    parts = []
+    last = 0
+    for f, wire, start, pos, end in _proto_fields(buf):
+        if f != field or wire != 2:
+            continue
+        sub = func(buf[pos:end])
+        if sub is None:
+            continue
+        parts.append(buf[last:start])
+        parts.append(_encode_varint(field << 3 | 2) + _encode_varint(len(sub)) + sub)
+        last = end
+    parts.append(buf[last:])
+    return b"".join(parts)
+
+
+def dynamic_batch(model: bytes, name: str) -> bytes:
+    """
+    将 ONNX 模型中指定输入的第一维 (批大小) 改为可变, 以便一次推理多张图片.
+    仅修改输入声明, 不依赖 onnx 库.
+    Args:
+        model: ONNX 模型文件内容
+        name: 输入名称
+    """
+    done = False
+
+    def dim(buf):  # TensorShapeProto.Dimension: dim_param = 2
+        nonlocal done
+        if done:
+            return None
+        done = True
+        value = b"batch"
+        return _encode_varint(2 << 3 | 2) + _encode_varint(len(value)) + value
+
+    def shape(buf):  # TensorShapeProto: dim = 1
+        return _proto_rewrite(buf, 1, dim)
+
+    def tensor(buf):  # TypeProto.Tensor: shape = 2
+        return _proto_rewrite(buf, 2, shape)
+
+    def typ(buf):  # TypeProto: tensor_type = 1
+        return _proto_rewrite(buf, 1, tensor)
+
+    def value_info(buf):  # ValueInfoProto: name = 1, type = 2
+        for f, wire, _, pos, end in _proto_fields(buf):
+            if f == 1 and wire == 2:
+                if buf[pos:end].decode() != name:
+                    return None
+                return _proto_rewrite(buf, 2, typ)
+        return None
+
+    def graph(buf):  # GraphProto: input = 11
+        return _proto_rewrite(buf, 11, value_info)
+
+    result = _proto_rewrite(model, 7, graph)  # ModelProto: graph = 7
+    if not done:
+        raise ValueError(f"input not found: {name}")
+    return result
+
+
+class OCRModel:
+    """
+    OCR 进程中加载的模型.
+    默认模型的多个请求将按图片宽度分组, 同组的图片合并为一个批次进行一次推理;
+    自定义模型或无法启用批量推理时逐个识别.
+    批量推理依赖 ddddocr 1.5.x 的内部属性及模型结构, 其他版本将回退为逐个识别.
+    """
+
+    batch_size = 8  # 单次推理的最大图片数
+    batch_window = 0.005  # 等待更多请求以合并推理的时间 (秒)
+    fallback_logged = False  # 是否已记录回退为逐个识别
+
+    def __init__(self, model, custom: bool = False):
+        """
+        Args:
+            model: DdddOcr 实例
+            custom: 是否为自定义模型, 自定义模型不支持字符范围
+        """
+        self.model = model
+        self.custom = custom
+        self.charset = []  # 模型字符集
+        self.range_indices = {}  # 字符范围: 字符集中的索引
+        self.session = None  # 支持批量推理的会话
+        self.input_name = None
+        if not custom:
+            try:
+                self._load_batched()
+            except Exception as e:
+                self.session = None
+                if not OCRModel.fallback_logged:
+                    OCRModel.fallback_logged = True
+                    logger.warning(f"OCR 无法启用批量推理, 将逐个识别 (ddddocr 版本可能不受支持): {e}")
+
+    @property
+    def batched(self):
+        return self.session is not None
+
+    def _load_batched(self):
+        from onnxruntime import InferenceSession
+
+        session = self.model._DdddOcr__ort_session
+        self.input_name = session.get_inputs()[0].name
+        with open(self.model._DdddOcr__graph_path, "rb") as f:
+            data = dynamic_batch(f.read(), self.input_name)
+        self.session = InferenceSession(data, providers=session.get_providers())
+        self.charset = list(self.model._DdddOcr__charset)
+        # 替换原有会话, 仅保留一份模型
+        self.model._DdddOcr__ort_session = self.session
+
+    def range_index(self, char_range):
+        """返回字符范围在模型字符集中的索引, 代替 set_ranges 以便各请求使用不同的字符范围"""
+        import numpy as np
+
+        indices = self.range_indices.get(char_range, None)
+        if indices is None:
+            if isinstance(char_range, str):
+                chars = set(char_range)
+            elif char_range == CharRange.NOT_NUMBER_LLETTER_ULETTER:
+                chars = set(self.charset) - set(string.digits + string.ascii_letters)
+            else:
+                chars = set(RANGE_CHARS[char_range])
+            chars.add("")
+            indices = np.array([i for i, c in enumerate(self.charset) if c in chars])
+            self.range_indices[char_range] = indices
+        return indices
 
-    @classmethod
-    async def get(
-        cls,
-        ocr_name: str = None,
-        char_range: Optional[Union[CharRange, str]] = None,
-    ):
-        # 创建用于标识唯一实例的键
-        key = (ocr_name, char_range)
-        async with cls._pool_lock:
-            # 检查池中是否存在相同配置的实例
-            if key in cls._pool:
-                return cls._pool[key]
-            instance = cls(ocr_name, char_range)
-            cls._pool[key] = instance
-            return instance
+    @staticmethod
+    def image(image_data: bytes, gif: bool = False):
+        """读取图片, GIF 图片将合成为单张图片"""
+        from PIL import Image
 
-    def __init__(
-        self,
-        ocr_name: str = None,
-        char_range: Optional[Union[CharRange, str]] = None,
-    ) -> None:
+        if not gif:
+            return Image.open(BytesIO(image_data))
+
+        gif = Image.open(BytesIO(image_data))
+        frame_count = gif.n_frames
+
+        # Calculate how many frames to use (up to 5)
+        num_frames = min(5, frame_count)
+        frame_indices = [i * (frame_count - 1) // (num_frames - 1) for i in range(num_frames)]
+
+        # Get the first frame to determine size
+        gif.seek(0)
+        base_frame = gif.copy().convert("RGBA")
+
+        # Create a blank transparent image
+        composite = Image.new("RGBA", base_frame.size, (0, 0, 0, 0))
+
+        # Calculate alpha for each frame
+        alpha_per_frame = 255 // num_frames
+
+        for idx in frame_indices:
+            gif.seek(idx)
+            frame = gif.copy().convert("RGBA")
+            # Apply partial transparency
+            frame.putalpha(alpha_per_frame)
+            composite = Image.alpha_composite(composite, frame)
+
+        # Convert final image to RGB for OCR
+        return composite.convert("RGB")
+
+    @staticmethod
+    def tensor(image):
+        """与 DdddOcr.classification 相同的预处理, 返回 (64, 宽度) 的数组"""
+        import numpy as np
+        from PIL import Image
+
+        image = image.resize((int(image.size[0] * (64 / image.size[1])), 64), Image.LANCZOS).convert("L")
+        return (np.array(image).astype(np.float32) / 255.0 - 0.5) / 0.5
+
+    def decode(self, output, char_range=None) -> str:
+        """解码单张图片的输出 (序列长度, 字符集大小)"""
+        if char_range:
+            indices = self.range_index(char_range)
+            return "".join(self.charset[indices[i]] for i in output[:, indices].argmax(axis=1))
+        text = []
+        last = 0
+        for i in output.argmax(axis=1):
+            if i != last and i != 0:
+                text.append(self.charset[i])
+            last = i
+        return "".join(text)
+
+    def classify(self, image, char_range=None) -> str:
+        """识别单张图片"""
+        import numpy as np
+
+        # 自定义模型不支持字符范围
+        if char_range and not self.custom:
+            ocr_result = self.model.classification(image, probability=True)
+            if not self.charset:
+                self.charset = list(ocr_result["charsets"])
+            probability = np.atleast_2d(np.asarray(ocr_result["probability"]))
+            indices = self.range_index(char_range)
+            return "".join(self.charset[indices[i]] for i in probability[:, indices].argmax(axis=1))
+        return self.model.classification(image)
+
+    def run(self, requests, batch_size: int = None):
+        """
+        识别多张图片, 宽度相同的图片将合并推理.
+        Args:
+            requests: (图片数据, 字符范围, 是否为 GIF) 列表
+            batch_size: 单次推理的最大图片数
+        Returns:
+            与请求一一对应的识别结果, 出错的请求对应异常
+        """
+        import numpy as np
+
+        batch_size = batch_size or self.batch_size
+        results = [None] * len(requests)
+        groups = {}  # 宽度: [(序号, 数组, 字符范围)]
+        for i, (image_data, char_range, gif) in enumerate(requests):
+            try:
+                image = self.image(image_data, gif)
+                if self.batched:
+                    x = self.tensor(image)
+                    groups.setdefault(x.shape[1], []).append((i, x, char_range))
+                else:
+                    results[i] = self.classify(image, char_range)
+            except Exception as e:
+                results[i] = e
+        for items in groups.values():
+            for k in range(0, len(items), batch_size):
+                chunk = items[k : k + batch_size]
+                try:
+                    inputs = np.stack([x for _, x, _ in chunk])[:, np.newaxis]
+                    output = self.session.run(None, {self.input_name: inputs})[
+                        0
+                    ]  # (序列长度, 批大小, 字符集大小)
+                    for j, (i, _, char_range) in enumerate(chunk):
+                        results[i] = self.decode(output[:, j], char_range)
+                except Exception as e:
+                    for i, _, _ in chunk:
+                        results[i] = e
+        return results
+
+
+class OCRWorker:
+    """单个 OCR 子进程, 加载一份模型, 字符范围随请求指定."""
+
+    def __init__(self, ocr_name: str = None) -> None:
         self.ocr_name = ocr_name
-        self.char_range = char_range
 
         self._process = None
         self._queue_in = None  # 发送图片数据的队列
-        self._queue_out = None  # 接收识别结果的队列
-        self._subscribers = 0
-        self._last_active = time.time()
-        self._stop_event = None
-        self._monitor_task = None
+        self._conn_out = None  # 接收识别结果的管道
+        self._reader = None  # 读取识别结果的线程
         self._pending_requests = {}  # 存储待处理的请求
 
-    async def start(self):
+    @property
+    def alive(self):
+        return bool(self._process and self._process.is_alive())
+
+    @property
+    def load(self):
+        """已发送但尚未完成的请求数"""
+        return len(self._pending_requests)
+
+    def start(self):
         """启动OCR进程"""
-        if self._process and self._process.is_alive():
+        if self.alive:
             return
 
         self._queue_in = Queue()
-        self._queue_out = Queue()
-        self._stop_event = asyncio.Event()
+        self._conn_out, conn_in = Pipe(duplex=False)
 
         self._process = Process(
             target=self._process_main,
-            args=(
-                self._queue_in,
-                self._queue_out,
-                self.ocr_name,
-                self.char_range,
-            ),
+            args=(self._queue_in, conn_in, self.ocr_name),
             daemon=True,
         )
         self._process.start()
+        # 仅由子进程持有写入端, 子进程退出时读取线程将收到 EOF
+        conn_in.close()
+
+        # 启动结果读取线程
+        self._reader = threading.Thread(
+            target=self._read_results,
+            args=(asyncio.get_running_loop(), self._conn_out, self._process),
+            name="ocr-reader",
+            daemon=True,
+        )
+        self._reader.start()
 
-        # 启动监控任务
-        self._monitor_task = asyncio.create_task(self._monitor())
-
-    async def stop(self, force: bool = False):
-        """停止OCR进程"""
-        if force:
-            await self.force_stop()
-        else:
-            self._subscribers = 0  # 这将触发监控任务在空闲超时后关闭进程
-
-    async def force_stop(self):
-        """强制停止OCR进程"""
-        if self._monitor_task:
-            self._monitor_task.cancel()
-            try:
-                await self._monitor_task
-            except asyncio.CancelledError:
-                pass
+    async def stop(self):
+        """停止OCR进程, 在线程中等待进程退出, 不阻塞事件循环"""
+        process = self._detach()
+        if process:
+            await asyncio.get_running_loop().run_in_executor(None, self._join, process)
 
-        # 处理所有未完成的请求
+    def _detach(self):
+        """结束所有未完成的请求并通知进程退出, 返回仍需等待退出的进程"""
         for future in self._pending_requests.values():
             if not future.done():
                 future.set_exception(Exception("OCR进程已停止"))
         self._pending_requests.clear()
 
-        if self._process and self._process.is_alive():
+        process = self._process
+        if process and process.is_alive():
             self._queue_in.put(("stop", None))
-            self._process.join(timeout=1)
-            if self._process.is_alive():
-                self._process.terminate()
-                self._process.join()
+        else:
+            process = None
 
         self._process = None
         self._queue_in = None
-        self._queue_out = None
-        self._stop_event = None
+        self._conn_out = None
+        self._reader = None
+        return process
 
-    async def run(self, image_data: BytesIO, timeout: int = 60, gif: bool = False) -> str:
+    @staticmethod
+    def _join(process: Process):
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    async def run(
+        self,
+        image_data: bytes,
+        char_range: Optional[Union[CharRange, str]] = None,
+        timeout: int = 60,
+        gif: bool = False,
+    ) -> str:
         """发送图片到OCR进程并等待结果"""
-        if not self._process or not self._process.is_alive():
-            await self.start()
+        if not self.alive:
+            self.start()
 
         # 生成唯一请求ID
         request_id = str(uuid.uuid4())
-        future = asyncio.Future()
+        future = asyncio.get_running_loop().create_future()
         self._pending_requests[request_id] = future
 
         try:
-            self._last_active = time.time()
-            self._queue_in.put(("process", (request_id, image_data.getvalue(), gif)))
-            result = await asyncio.wait_for(future, timeout=timeout)
-            return result
+            self._queue_in.put(("process", (request_id, image_data, char_range, gif)))
+            return await asyncio.wait_for(future, timeout=timeout)
         finally:
             self._pending_requests.pop(request_id, None)
 
-    def subscribe(self):
-        """增加使用者计数"""
-        self._subscribers += 1
-        self._last_active = time.time()
-
-    def unsubscribe(self):
-        """减少使用者计数"""
-        self._subscribers = max(0, self._subscribers - 1)
-        self._last_active = time.time()
-
-    async def _monitor(self):
-        """监控进程状态和空闲时间，同时处理返回结果"""
-        while True:
-            try:
-                # 检查进程状态和空闲超时
-                if self._subscribers == 0 and time.time() - self._last_active > 300:
-                    await self.force_stop()
-                    break
-
-                if self._process and not self._process.is_alive():
-                    await self.force_stop()
+    def _read_results(self, loop: asyncio.AbstractEventLoop, conn: Connection, process: Process):
+        """在独立线程中阻塞读取识别结果, 并立即转交给事件循环"""
+        try:
+            while True:
+                try:
+                    status, result = conn.recv()
+                except (EOFError, OSError):
                     break
-
-                # 非阻塞方式检查结果队列
                 try:
-                    status, (request_id, result) = await asyncio.get_event_loop().run_in_executor(
-                        None, self._queue_out.get_nowait
-                    )
-
-                    # 找到对应的future并设置结果
-                    if request_id in self._pending_requests:
-                        future = self._pending_requests[request_id]
-                        if status == "error":
-                            future.set_exception(Exception(result))
-                        else:
-                            future.set_result(result)
-                except (asyncio.CancelledError, Exception):
-                    pass
-
-                await asyncio.sleep(0.1)  # 短暂休眠避免CPU占用过高
+                    loop.call_soon_threadsafe(self._deliver, status, result)
+                except RuntimeError:  # 事件循环已关闭
+                    return
+        finally:
+            conn.close()
+        try:
+            loop.call_soon_threadsafe(self._on_process_exit, process)
+        except RuntimeError:
+            pass
+
+    def _deliver(self, status: str, result):
+        """设置对应请求的结果"""
+        if not isinstance(result, tuple):
+            # 模型加载失败, 无法处理任何请求
+            for future in self._pending_requests.values():
+                if not future.done():
+                    future.set_exception(Exception(result))
+            return
+        request_id, result = result
+        future = self._pending_requests.get(request_id, None)
+        if future and not future.done():
+            if status == "error":
+                future.set_exception(Exception(result))
+            else:
+                future.set_result(result)
 
-            except asyncio.CancelledError:
-                break
+    def _on_process_exit(self, process: Process):
+        """进程意外退出时清理状态"""
+        if self._process is process:
+            self._detach()
 
     @staticmethod
     def _process_main(*args, **kw):
-        return asyncio.run(OCRService._async_process_main(*args, **kw))
+        return asyncio.run(OCRWorker._async_process_main(*args, **kw))
 
     @staticmethod
-    async def _async_process_main(
-        queue_in: Queue,
-        queue_out: Queue,
-        ocr_name: str,
-        char_range: Optional[Union[CharRange, str]],
-    ):
+    async def _async_process_main(queue_in: Queue, queue_out: Connection, ocr_name: str):
         model = None
-        use_probability = False
 
         try:
             from ddddocr import DdddOcr
             from onnxruntime.capi.onnxruntime_pybind11_state import InvalidProtobuf
-            from PIL import Image
-            from io import BytesIO
 
             # 加载模型
             if not ocr_name:
                 model = DdddOcr(beta=True, show_ad=False)
-                if char_range:
-                    use_probability = True
-                    model.set_ranges(char_range)
             else:
                 data = []
                 files = (f"{ocr_name}.onnx", f"{ocr_name}.json")
                 async for p in get_datas(files, caller="OCR"):
                     if p is None:
-                        queue_out.put(("error", "无法下载所需文件"))
+                        queue_out.send(("error", "无法下载所需文件"))
                         return
                     data.append(p)
                 try:
                     model = DdddOcr(show_ad=False, import_onnx_path=str(data[0]), charsets_path=str(data[1]))
                 except InvalidProtobuf:
-                    queue_out.put(("error", "文件下载不完全"))
+                    queue_out.send(("error", "文件下载不完全"))
                     return
 
-            def process_single_image(image, use_probability):
-                if use_probability:
-                    ocr_result = model.classification(image, probability=True)
-                    ocr_text = ""
-                    for i in ocr_result["probability"]:
-                        ocr_text += ocr_result["charsets"][i.index(max(i))]
-                else:
-                    ocr_text = model.classification(image)
-                return ocr_text
-
-            def process_gif(gif_data):
-                gif = Image.open(BytesIO(gif_data))
-                frame_count = gif.n_frames
-
-                # Calculate how many frames to use (up to 5)
-                num_frames = min(5, frame_count)
-                frame_indices = [i * (frame_count - 1) // (num_frames - 1) for i in range(num_frames)]
-
-                # Get the first frame to determine size
-                gif.seek(0)
-                base_frame = gif.copy().convert("RGBA")
-
-                # Create a blank transparent image
-                composite = Image.new("RGBA", base_frame.size, (0, 0, 0, 0))
-
-                # Calculate alpha for each frame
-                alpha_per_frame = 255 // num_frames
-
-                for idx in frame_indices:
-                    gif.seek(idx)
-                    frame = gif.copy().convert("RGBA")
-                    # Apply partial transparency
-                    frame.putalpha(alpha_per_frame)
-                    composite = Image.alpha_composite(composite, frame)
-
-                # Convert final image to RGB for OCR
-                final_image = composite.convert("RGB")
-                final_bytes = BytesIO()
-                final_image.save(final_bytes, format="PNG")
-                return process_single_image(final_bytes.getvalue(), use_probability)
+            engine = OCRModel(model, custom=bool(ocr_name))
 
             # 处理请求循环
-            while True:
+            stop = False
+            busy = False  # 上一批次是否包含多个请求
+            while not stop:
                 try:
                     cmd, data = queue_in.get()
                 except KeyboardInterrupt:
@@ -267,21 +515,196 @@ class OCRService:
                 if cmd == "stop":
                     break
 
-                request_id, image_data, is_gif = data
-                try:
-                    if is_gif:
-                        ocr_text = process_gif(image_data)
+                # 收集已到达的请求合并推理, 请求密集时再短暂等待后续请求, 空闲时不增加延迟
+                batch = [data]
+                deadline = time.perf_counter() + (OCRModel.batch_window if engine.batched and busy else 0)
+                while len(batch) < OCRModel.batch_size:
+                    try:
+                        remaining = deadline - time.perf_counter()
+                        cmd, data = (
+                            queue_in.get(timeout=remaining) if remaining > 0 else queue_in.get_nowait()
+                        )
+                    except Empty:
+                        break
+                    except KeyboardInterrupt:
+                        stop = True
+                        break
+                    if cmd == "stop":
+                        stop = True
+                        break
+                    batch.append(data)
+                busy = len(batch) > 1
+
+                results = engine.run(
+                    [(image_data, char_range, is_gif) for _, image_data, char_range, is_gif in batch]
+                )
+                for (request_id, *_), result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        queue_out.send(("error", (request_id, str(result))))
                     else:
-                        image = Image.open(BytesIO(image_data))
-                        ocr_text = process_single_image(image, use_probability)
-                    queue_out.put(("success", (request_id, ocr_text)))
-                except Exception as e:
-                    queue_out.put(("error", (request_id, str(e))))
+                        queue_out.send(("success", (request_id, result)))
 
         finally:
             if model:
                 del model
 
+
+class OCRPool:
+    """同一模型的 OCR 进程池, 各字符范围共享, 请求发送至负载最低的进程."""
+
+    def __init__(self, ocr_name: str = None, size: int = None) -> None:
+        self.ocr_name = ocr_name
+        self.size = size  # 进程数上限, None 为使用配置
+
+        self.workers: List[OCRWorker] = []
+        self._subscribers = 0
+        self._last_active = time.time()
+        self._monitor_task = None
+
+    @property
+    def max_workers(self):
+        return self.size or pool_size()
+
+    def _select(self) -> OCRWorker:
+        """选择负载最低的进程, 所有进程均繁忙且未达上限时启动新进程"""
+        self.workers = [w for w in self.workers if w.alive]
+        worker = min(self.workers, key=lambda w: w.load, default=None)
+        if worker is None or (worker.load and len(self.workers) < self.max_workers):
+            worker = OCRWorker(self.ocr_name)
+            worker.start()
+            self.workers.append(worker)
+        if not self._monitor_task or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._monitor())
+        return worker
+
+    async def start(self):
+        """启动至少一个OCR进程"""
+        if not any(w.alive for w in self.workers):
+            self._select()
+
+    async def stop(self, force: bool = False):
+        """停止所有OCR进程"""
+        if force:
+            await self.force_stop()
+        else:
+            self._subscribers = 0  # 这将触发监控任务在空闲超时后关闭进程
+
+    async def force_stop(self):
+        """强制停止所有OCR进程"""
+        if self._monitor_task and self._monitor_task is not asyncio.current_task():
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+        self._monitor_task = None
+
+        workers, self.workers = self.workers, []
+        await asyncio.gather(*(w.stop() for w in workers))
+
+    async def run(
+        self,
+        image_data: bytes,
+        char_range: Optional[Union[CharRange, str]] = None,
+        timeout: int = 60,
+        gif: bool = False,
+    ) -> str:
+        self._last_active = time.time()
+        return await self._select().run(image_data, char_range=char_range, timeout=timeout, gif=gif)
+
+    def subscribe(self):
+        self._subscribers += 1
+        self._last_active = time.time()
+
+    def unsubscribe(self, count: int = 1):
+        self._subscribers = max(0, self._subscribers - count)
+        self._last_active = time.time()
+
+    async def _monitor(self):
+        """监控空闲时间, 空闲超时后关闭所有进程"""
+        while True:
+            try:
+                if self._subscribers == 0:
+                    idle = time.time() - self._last_active
+                    if idle > 300:
+                        await self.force_stop()
+                        break
+                    await asyncio.sleep(300 - idle + 1)
+                else:
+                    await asyncio.sleep(300)
+            except asyncio.CancelledError:
+                break
+
+
+class OCRService:
+    _pool = {}
+    _pool_lock = asyncio.Lock()
+    _models: Dict[Optional[str], OCRPool] = {}  # ocr_name: 进程池
+
+    @classmethod
+    async def get(
+        cls,
+        ocr_name: str = None,
+        char_range: Optional[Union[CharRange, str]] = None,
+    ):
+        # 创建用于标识唯一实例的键
+        key = (ocr_name, char_range)
+        async with cls._pool_lock:
+            # 检查池中是否存在相同配置的实例
+            if key in cls._pool:
+                return cls._pool[key]
+            instance = cls(ocr_name, char_range)
+            cls._pool[key] = instance
+            return instance
+
+    def __init__(
+        self,
+        ocr_name: str = None,
+        char_range: Optional[Union[CharRange, str]] = None,
+    ) -> None:
+        self.ocr_name = ocr_name
+        self.char_range = char_range
+
+        # 同一模型的不同字符范围共享进程池
+        pool = self._models.get(ocr_name, None)
+        if pool is None:
+            pool = self._models[ocr_name] = OCRPool(ocr_name)
+        self.pool = pool
+        self._subscribers = 0  # 本实例在进程池中的使用者计数
+
+    async def start(self):
+        """启动OCR进程"""
+        await self.pool.start()
+
+    async def stop(self, force: bool = False):
+        """停止OCR进程, 非强制时仅释放本实例的使用者计数, 不影响共享进程池的其他字符范围"""
+        if force:
+            await self.pool.force_stop()
+        else:
+            self.pool.unsubscribe(self._subscribers)
+            self._subscribers = 0
+
+    async def force_stop(self):
+        """强制停止OCR进程"""
+        await self.pool.force_stop()
+
+    async def run(self, image_data: BytesIO, timeout: int = 60, gif: bool = False) -> str:
+        """发送图片到OCR进程并等待结果"""
+        return await self.pool.run(
+            image_data.getvalue(), char_range=self.char_range, timeout=timeout, gif=gif
+        )
+
+    def subscribe(self):
+        """增加使用者计数"""
+        self._subscribers += 1
+        self.pool.subscribe()
+
+    def unsubscribe(self):
+        """减少使用者计数"""
+        if self._subscribers:
+            self._subscribers -= 1
+            self.pool.unsubscribe()
+
     def __enter__(self):
         """上下文管理器入口"""
         self.subscribe()
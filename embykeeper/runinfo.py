@@ -2,23 +2,57 @@ from __future__ import annotations
 
 from asyncio import Event
 import asyncio
+from collections import OrderedDict, deque
 from datetime import datetime
 from enum import IntEnum, auto
-from typing import TYPE_CHECKING, Callable, Dict, List
+import json
+from typing import TYPE_CHECKING, Callable, Counter, Deque, Dict, List, Optional, Set, Tuple
 import random
 import string
 from loguru import logger
 
 from rich.text import Text
-from pydantic import BaseModel, PrivateAttr
+from pydantic import BaseModel, PrivateAttr, field_serializer
 
 from .utils import to_iterable
 from .cache import cache
+from .config import config
 
 if TYPE_CHECKING:
     from loguru import Logger
 
 _running_runs: Dict[str, RunContext] = {}
+_log_sink_id: int = None
+
+
+def _history_ttl():
+    """运行历史在缓存中的保留时间 (秒), 为空时永久保留."""
+    days = config.cache.runinfo_days
+    return days * 86400 if days else None
+
+
+def _escape_id(run_id: str):
+    """转义任务 ID 中的 ".", 以免其在缓存中被视为嵌套层级 (例如 checkiner.account.<phone>)."""
+    return run_id.replace("%", "%25").replace(".", "%2E")
+
+
+def _unescape_id(key: str):
+    return key.replace("%2E", ".").replace("%25", "%")
+
+
+def _run_key(run_id: str):
+    """任务记录在缓存中的键."""
+    return f"runinfo.{_escape_id(run_id)}"
+
+
+def _children_key(run_id: str):
+    """子任务列表在缓存中的键."""
+    return f"runinfo.children.{_escape_id(run_id)}"
+
+
+def _log_key(run_id: str, chunk: int):
+    """溢出的日志记录在缓存中的键."""
+    return f"runinfo.logs.{_escape_id(run_id)}.{chunk}"
 
 
 class RunStatus(IntEnum):
@@ -42,23 +76,169 @@ class LogRecord(BaseModel):
     time: datetime
 
 
+# 内存中的紧凑日志记录: (级别, 消息, 时间)
+LogEntry = Tuple[str, str, datetime]
+
+
+def _log_filter(record):
+    return record["extra"].get("run_id") in _running_runs
+
+
+def _log_sink(message):
+    record = message.record
+    run = _running_runs.get(record["extra"].get("run_id"))
+    if run:
+        run.add_log(record["level"].name.upper(), record["message"], record["time"])
+
+
+def _install_log_sink():
+    """添加全局日志处理器, 将绑定了 run_id 的日志记录到对应的运行中任务."""
+    global _log_sink_id
+    if _log_sink_id is None:
+        _log_sink_id = logger.add(_log_sink, filter=_log_filter, format="{message}")
+
+
+class _RunTree:
+    """内存中的任务树索引, 父子关系以增量方式写入缓存.
+
+    每个父任务的子任务列表在首次访问时从缓存加载, 此后以内存为准.
+    内存中最多保留 max_entries 个任务的索引, 超出时移除最久未访问的已结束任务, 需要时再从缓存加载.
+    """
+
+    max_entries = 4096
+
+    def __init__(self):
+        self.children: OrderedDict[str, Dict[str, None]] = OrderedDict()
+        self.statuses: OrderedDict[str, RunStatus] = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._flush_handle: asyncio.Handle = None
+
+    def get_children(self, run_id: str) -> Dict[str, None]:
+        children = self.children.get(run_id)
+        if children is None:
+            children = self.children[run_id] = dict.fromkeys(cache.get(_children_key(run_id), []))
+            self._trim(self.children)
+        else:
+            self.children.move_to_end(run_id)
+        return children
+
+    def set_status(self, run_id: str, status: RunStatus):
+        self.statuses[run_id] = status
+        self.statuses.move_to_end(run_id)
+        self._trim(self.statuses)
+
+    def _trim(self, entries: OrderedDict):
+        """超出上限时移除最久未访问的条目, 运行中和尚未写入缓存的任务除外."""
+        if len(entries) <= self.max_entries:
+            return
+        # 一次移除至上限的 3/4, 以免每次新增都遍历; 最近访问的条目总是保留
+        target = self.max_entries * 3 // 4
+        for run_id in list(entries)[:-1]:
+            if len(entries) <= target:
+                break
+            if run_id not in _running_runs and run_id not in self._dirty:
+                del entries[run_id]
+
+    def add(self, run_id: str, parent_ids: List[str]):
+        for parent_id in parent_ids:
+            children = self.get_children(parent_id)
+            if run_id not in children:
+                children[run_id] = None
+                self._dirty.add(parent_id)
+        self._schedule_flush()
+
+    def replace(self, run_id: str, child_ids: List[str]):
+        """替换子任务列表, 用于清理历史."""
+        self.children[run_id] = dict.fromkeys(child_ids)
+        self.children.move_to_end(run_id)
+        self._dirty.add(run_id)
+        self._schedule_flush()
+
+    def remove(self, run_id: str):
+        self.children.pop(run_id, None)
+        self.statuses.pop(run_id, None)
+        self._dirty.discard(run_id)
+
+    def iter_descendants(self, run_id: str):
+        """广度优先遍历所有子孙任务 ID."""
+        seen = {run_id}
+        queue = deque([run_id])
+        while queue:
+            for child_id in self.get_children(queue.popleft()):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    queue.append(child_id)
+                    yield child_id
+
+    def _schedule_flush(self):
+        # 同一轮事件循环中的多次修改合并为一次写入
+        if self._flush_handle or not self._dirty:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+        else:
+            self._flush_handle = loop.call_soon(self.flush)
+
+    def flush(self):
+        self._flush_handle = None
+        dirty, self._dirty = self._dirty, set()
+        with cache.batch():
+            for run_id in dirty:
+                cache.set_nowait(_children_key(run_id), list(self.children[run_id]), ttl=_history_ttl())
+
+
+_tree = _RunTree()
+
+
 class RunContext(BaseModel):
     _finished: Event = PrivateAttr(default_factory=Event)
     _started: Event = PrivateAttr(default_factory=Event)
     _cancel: Callable = PrivateAttr(default=None)
-    _handler_id: int = PrivateAttr(default=None)
+    _log: Deque[LogEntry] = PrivateAttr(default_factory=deque)
 
     id: str
     parent_ids: List[str] = []
-    description: str = None
+    description: Optional[str] = None
     status: RunStatus = RunStatus.PENDING
-    status_info: str = None
-    log: List[LogRecord] = []
-    duration: float = None
-    start_time: datetime = None
-    end_time: datetime = None
-    next_time: datetime = None
-    reschedule: int = None
+    status_info: Optional[str] = None
+    log: List[LogRecord] = []  # 仅用于序列化, 运行时日志保存在 _log 中
+    log_spilled: int = 0
+    duration: Optional[float] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    next_time: Optional[datetime] = None
+    reschedule: Optional[int] = None
+
+    def model_post_init(self, __context):
+        self._log.extend((r.level, r.message, r.time) for r in self.log)
+        self.log = []
+
+    @field_serializer("log")
+    def _serialize_log(self, log: List[LogRecord]):
+        return [{"level": level, "message": message, "time": time} for level, message, time in self._log]
+
+    def add_log(self, level: str, message: str, time: datetime = None):
+        """添加一条日志记录, 超过上限时将较早的一半记录转存到缓存."""
+        self._log.append((level, message, time or datetime.now()))
+        limit = config.cache.runinfo_log_size
+        if limit and len(self._log) > limit:
+            chunk = [self._log.popleft() for _ in range(max(limit // 2, 1))]
+            cache.set_nowait(
+                _log_key(self.id, self.log_spilled),
+                [(level, message, time.isoformat()) for level, message, time in chunk],
+                ttl=_history_ttl(),
+            )
+            self.log_spilled += 1
+
+    def load_spilled_logs(self) -> List[LogEntry]:
+        """从缓存读取已转存的日志记录."""
+        keys = [_log_key(self.id, i) for i in range(self.log_spilled)]
+        entries = []
+        for chunk in cache.get_many(keys, []).values():
+            entries.extend((level, message, datetime.fromisoformat(time)) for level, message, time in chunk)
+        return entries
 
     def start(self, status: RunStatus = RunStatus.RUNNING):
         """开始任务，设置开始时间和状态"""
@@ -71,9 +251,8 @@ class RunContext(BaseModel):
 
         if status:
             self.status = status
-            self.log.append(
-                LogRecord(level="DEBUG", message=f"任务状态已设置为 {status.name}", time=datetime.now())
-            )
+            _tree.set_status(self.id, status)
+            self.add_log("DEBUG", f"任务状态已设置为 {status.name}")
 
     def finish(self, status: RunStatus = None, status_info: str = None):
         """完成任务，记录状态和时间，并保存到缓存"""
@@ -95,13 +274,6 @@ class RunContext(BaseModel):
         # 设置完成事件
         self._finished.set()
 
-        # 移除logger handler
-        if self._handler_id is not None:
-            try:
-                logger.remove(self._handler_id)
-            except ValueError:
-                pass
-
         # 保存到缓存
         self.save()
 
@@ -109,7 +281,7 @@ class RunContext(BaseModel):
 
     def save(self):
         """保存当前任务到缓存"""
-        cache.set(f"runinfo.{self.id}", self.model_dump_json())
+        cache.set_nowait(_run_key(self.id), self.model_dump_json(), ttl=_history_ttl())
 
     @classmethod
     def cancel_all(cls):
@@ -124,39 +296,25 @@ class RunContext(BaseModel):
         return logger.bind(run_id=self.id)
 
     @classmethod
-    def prepare(cls, description: str = None, parent_ids: List[str] = None):
+    def prepare(cls, description: str = None, parent_ids: List[str] = None, run_id: str = None):
         """生成一个新的任务上下文"""
 
-        # 生成随机6位ID (大写字母和数字) 的运行时
-        chars = string.ascii_uppercase + string.digits
-        run_id = "".join(random.choices(chars, k=6))
+        # 未指定时, 生成随机6位ID (大写字母和数字) 的运行时
+        if not run_id:
+            chars = string.ascii_uppercase + string.digits
+            run_id = "".join(random.choices(chars, k=6))
         run = cls(id=run_id, parent_ids=to_iterable(parent_ids))
         run.description = description
 
-        # 设置对 loguru 的监控
-        def log_sink(message):
-            record = message.record
-            if record["extra"].get("run_id") == run_id:
-                log_record = LogRecord(
-                    level=record["level"].name.upper(),
-                    message=record["message"],
-                    time=record["time"],
-                )
-                run.log.append(log_record)
-
-        # 添加日志处理器
-        run._handler_id = logger.add(log_sink, filter=lambda record: "run_id" in record["extra"])
-
-        # 添加到运行中任务列表
+        # 添加到运行中任务列表, 日志将由全局日志处理器按 run_id 分发
+        _install_log_sink()
         _running_runs[run_id] = run
 
+        _tree.set_status(run_id, run.status)
+
         # 如果有父任务，记录父子关系
         if parent_ids:
-            for parent_id in parent_ids:
-                children = cache.get(f"runinfo.children.{parent_id}", [])
-                if run_id not in children:
-                    children.append(run_id)
-                    cache.set(f"runinfo.children.{parent_id}", children)
+            _tree.add(run_id, run.parent_ids)
 
         return run
 
@@ -167,7 +325,7 @@ class RunContext(BaseModel):
             return _running_runs[run_id]
 
         # 从缓存加载
-        run_json = cache.get(f"runinfo.{run_id}")
+        run_json = cache.get(_run_key(run_id))
         if run_json:
             return cls.model_validate_json(run_json)
         return None
@@ -184,39 +342,60 @@ class RunContext(BaseModel):
     def get_children(self):
         """获取所有子任务"""
         children = []
-        child_ids = cache.get(f"runinfo.children.{self.id}", [])
-        for child_id in child_ids:
+        for child_id in _tree.get_children(self.id):
             child = RunContext.get(child_id)
             if child:
                 children.append(child)
         return children
 
-    def yield_logs(self, reverse: bool = False, include_children: bool = False):
+    def get_descendants(self):
+        """获取所有子孙任务"""
+        descendants = []
+        for run_id in _tree.iter_descendants(self.id):
+            run = RunContext.get(run_id)
+            if run:
+                descendants.append(run)
+        return descendants
+
+    def get_running_descendants(self):
+        """获取所有正在运行的子孙任务"""
+        return [_running_runs[i] for i in _tree.iter_descendants(self.id) if i in _running_runs]
+
+    def status_rollup(self) -> Counter[RunStatus]:
+        """统计所有子孙任务的状态"""
+        counter = Counter()
+        for run_id in _tree.iter_descendants(self.id):
+            status = _tree.statuses.get(run_id)
+            if status is None:
+                run = RunContext.get(run_id)
+                if not run:
+                    continue
+                status = run.status
+                _tree.set_status(run_id, status)
+            counter[status] += 1
+        return counter
+
+    def yield_logs(self, reverse: bool = False, include_children: bool = False, include_spilled: bool = True):
         """按时间顺序产出日志记录"""
-        logs = self.log.copy()
-
+        runs = [self]
         if include_children:
-            for child in self.get_children():
-                logs.extend(child.log)
+            runs.extend(self.get_children())
 
-        # 确保所有日志都有时间戳
-        for log in logs:
-            if log.time is None:
-                log.time = datetime.now()
+        logs: List[LogEntry] = []
+        for run in runs:
+            if include_spilled and run.log_spilled:
+                logs.extend(run.load_spilled_logs())
+            logs.extend(run._log)
 
-        # 按时间排序
-        logs.sort(key=lambda x: x.time, reverse=reverse)
-        yield from logs
+        # 按时间排序, 仅在产出时转换为 LogRecord
+        logs.sort(key=lambda x: x[2].timestamp(), reverse=reverse)
+        for level, message, time in logs:
+            yield LogRecord(level=level, message=message, time=time)
 
     def log_sink(self, message):
         record = message.record
         if record["extra"].get("run_id") == self.id:
-            log_record = LogRecord(
-                level=record["level"].name.upper(),
-                message=Text(record["message"]).plain,
-                time=record["time"],
-            )
-            self.log.append(log_record)
+            self.add_log(record["level"].name.upper(), Text(record["message"]).plain, record["time"])
 
     @classmethod
     def run(cls, func: Callable, description: str = None, parent_ids: List[str] = None):
@@ -240,17 +419,12 @@ class RunContext(BaseModel):
 
     def get_running_children(self):
         """获取所有正在运行的子任务"""
-        children = []
-        child_ids = cache.get(f"runinfo.children.{self.id}", [])
-        for child_id in child_ids:
-            if child_id in _running_runs:
-                children.append(_running_runs[child_id])
-        return children
+        return [_running_runs[i] for i in _tree.get_children(self.id) if i in _running_runs]
 
     def cancel_tree(self):
-        """取消当前任务及其所有运行中的子任务"""
-        # 先取消所有子任务
-        for child in self.get_running_children():
+        """取消当前任务及其所有运行中的子孙任务"""
+        # 先由深至浅取消所有子孙任务
+        for child in reversed(self.get_running_descendants()):
             if child._cancel:
                 child._cancel()
 
@@ -272,7 +446,78 @@ class RunContext(BaseModel):
             existing = cls.get(run_id)
             if existing:
                 return existing
-        ctx = cls.prepare(description=description, parent_ids=parent_ids)
+        ctx = cls.prepare(description=description, parent_ids=parent_ids, run_id=run_id)
         if status:
             ctx.set(status)
         return ctx
+
+    @classmethod
+    async def purge_history(cls, max_runs: int = None):
+        """清理运行历史, 每个父任务 (例如每个账号) 仅保留最近的若干子任务.
+
+        Args:
+            max_runs: 每个父任务保留的子任务数量, 默认使用配置中的 cache.runinfo_runs
+
+        Returns:
+            删除的任务记录数量
+        """
+        max_runs = max_runs or config.cache.runinfo_runs
+        if not max_runs:
+            return 0
+        prefix = "runinfo.children."
+        keys = await cache.afind_by_prefix(prefix)
+        children_lists = {
+            _unescape_id(k[len(prefix) :]): v
+            for k, v in (await cache.aget_many(keys, [])).items()
+            if isinstance(v, list)
+        }
+        # 已加载到内存的子任务列表以内存为准
+        children_lists.update({k: list(v) for k, v in _tree.children.items() if v})
+        child_ids = {i for ids in children_lists.values() for i in ids}
+        run_records = await cache.aget_many([_run_key(i) for i in child_ids])
+        records = {i: run_records.get(_run_key(i)) for i in child_ids}
+        existing = {i for i, v in records.items() if v}
+
+        removed = set()
+        trimmed = {}
+        for parent_id, ids in children_lists.items():
+            # 丢弃记录已过期或未能完成的子任务
+            kept = [i for i in ids if i in _running_runs or i in existing or i in children_lists]
+            if len(kept) > max_runs:
+                old, kept = kept[:-max_runs], kept[-max_runs:]
+                # 连同子孙任务一起删除, 运行中的任务除外
+                stack = [i for i in old if i not in _running_runs]
+                while stack:
+                    run_id = stack.pop()
+                    if run_id not in removed:
+                        removed.add(run_id)
+                        stack.extend(i for i in children_lists.get(run_id, []) if i not in _running_runs)
+                kept = [i for i in old if i in _running_runs] + kept
+            trimmed[parent_id] = kept
+
+        # 同一任务可能属于多个父任务, 统一移除已删除的任务
+        for i in removed:
+            _tree.remove(i)
+        updated = {}
+        for parent_id, kept in trimmed.items():
+            kept = [i for i in kept if i not in removed]
+            if parent_id in removed or kept == children_lists[parent_id]:
+                continue
+            if parent_id in _tree.children:
+                # 保留清理期间新增的子任务
+                known = set(children_lists[parent_id])
+                kept += [i for i in _tree.children[parent_id] if i not in known]
+                _tree.replace(parent_id, kept)
+            else:
+                updated[_children_key(parent_id)] = kept
+        if updated:
+            await cache.aset_many(updated, ttl=_history_ttl())
+        if removed:
+            keys = [_run_key(i) for i in removed] + [_children_key(i) for i in removed]
+            for i in removed:
+                record = records.get(i)
+                if record:
+                    spilled = json.loads(record).get("log_spilled", 0)
+                    keys.extend(_log_key(i, n) for n in range(spilled))
+            await cache.adelete_many(keys)
+        return len(removed)
@@ -1,8 +1,11 @@
 import asyncio
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
 from dateutil import parser
+import heapq
+import itertools
+import random
 import re
-from typing import Callable, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
 import json
 import hashlib
 
@@ -13,6 +16,357 @@ from .runinfo import RunContext, RunStatus
 from .utils import next_random_datetime
 
 
+class Timer:
+    """由 TimerService 管理的单个定时器"""
+
+    __slots__ = ("when", "callback", "future", "_service", "_seq")
+
+    def __init__(self, service: "TimerService", when: datetime, callback: Callable[[], Any] = None):
+        self.when = when
+        self.callback = callback
+        self.future: asyncio.Future = None
+        self._service = service
+        self._seq: int = None
+
+    @property
+    def active(self):
+        return self._seq is not None
+
+    def cancel(self):
+        """取消定时器"""
+        self._service.cancel(self)
+
+    def reschedule(self, when: datetime):
+        """修改定时器的触发时间"""
+        self._service.reschedule(self, when)
+
+    async def wait(self):
+        """等待定时器触发, 等待被取消时定时器也将被取消"""
+        try:
+            await self.future
+        finally:
+            if self.active:
+                self.cancel()
+
+
+class TimerService:
+    """所有计划任务共用的定时器服务.
+
+    定时器保存在以触发时间排序的最小堆中, 添加, 取消和修改均为 O(log n), 事件循环中仅保留一个唤醒回调.
+    同时合并各计划任务对缓存的读写, 同一轮事件循环中的读取和写入分别批量进行.
+    """
+
+    # 最长唤醒间隔 (秒), 以应对系统时间调整或休眠
+    max_sleep = 60
+
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._handle: asyncio.TimerHandle = None
+        self._handle_when: float = None
+        self._cancelled = 0
+        self._loop: asyncio.AbstractEventLoop = None  # 定时器和唤醒回调所属的事件循环
+
+        self._reads: Dict[str, asyncio.Future] = {}
+        self._writes: Dict[str, Any] = {}
+        self._io_task: asyncio.Task = None
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        返回当前事件循环. 定时器和唤醒回调属于首次使用的事件循环,
+        在其他事件循环中使用时 (例如测试或重新启动), 丢弃属于原事件循环的状态, 尚未写入的缓存修改将在新的事件循环中写入.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                if self._handle:
+                    self._handle.cancel()
+                for _, seq, timer in self._heap:
+                    if timer._seq == seq:
+                        timer._seq = None
+                self._heap = []
+                self._cancelled = 0
+                self._handle = None
+                self._handle_when = None
+                self._reads = {}
+                self._io_task = None
+            self._loop = loop
+            if self._writes:
+                self._schedule_io()
+        return loop
+
+    def add(self, when: datetime, callback: Callable[[], Any] = None) -> Timer:
+        """添加定时器
+
+        Args:
+            when: 触发时间
+            callback: 触发时调用的函数 (可选)
+        """
+        timer = Timer(self, when, callback)
+        timer.future = self._bind_loop().create_future()
+        self._push(timer)
+        return timer
+
+    async def sleep_until(self, when: datetime):
+        """等待到指定时间"""
+        await self.add(when).wait()
+
+    def cancel(self, timer: Timer):
+        if timer.active:
+            # 延迟删除: 仅标记失效, 在弹出或失效项过多时清理
+            timer._seq = None
+            self._cancelled += 1
+            if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+                self._heap = [e for e in self._heap if e[2]._seq == e[1]]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+        if timer.future and not timer.future.done():
+            timer.future.cancel()
+
+    def reschedule(self, timer: Timer, when: datetime):
+        if timer.active:
+            timer._seq = None
+            self._cancelled += 1
+        timer.when = when
+        loop = self._bind_loop()
+        if timer.future.done() or timer.future.get_loop() is not loop:
+            timer.future = loop.create_future()
+        self._push(timer)
+
+    def _push(self, timer: Timer):
+        timer._seq = next(self._counter)
+        heapq.heappush(self._heap, (timer.when, timer._seq, timer))
+        self._arm()
+
+    def _arm(self):
+        """按最早的定时器设置唤醒回调"""
+        while self._heap and self._heap[0][2]._seq != self._heap[0][1]:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+        if not self._heap:
+            if self._handle:
+                self._handle.cancel()
+                self._handle = None
+            return
+        loop = self._bind_loop()
+        delay = min(max((self._heap[0][0] - datetime.now()).total_seconds(), 0), self.max_sleep)
+        when = loop.time() + delay
+        if self._handle and self._handle_when <= when:
+            return
+        if self._handle:
+            self._handle.cancel()
+        self._handle = loop.call_at(when, self._fire)
+        self._handle_when = when
+
+    def _fire(self):
+        self._handle = None
+        now = datetime.now()
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, timer = heapq.heappop(self._heap)
+            if timer._seq != seq:
+                self._cancelled -= 1
+                continue
+            timer._seq = None
+            if not timer.future.done():
+                timer.future.set_result(None)
+            if timer.callback:
+                try:
+                    timer.callback()
+                except Exception as e:
+                    logger.warning(f"定时任务回调发生错误: {e}")
+        self._arm()
+
+    def _schedule_io(self):
+        # 任务将在下一轮事件循环开始执行, 期间的读写将被合并
+        loop = self._bind_loop()
+        if not self._io_task:
+            self._io_task = loop.create_task(self._flush_io())
+
+    async def load(self, key: str) -> Any:
+        """从缓存读取, 同一轮事件循环中的读取将合并为一次批量读取"""
+        if key in self._writes:
+            return self._writes[key]
+        future = self._reads.get(key)
+        if not future:
+            future = self._reads[key] = self._bind_loop().create_future()
+            self._schedule_io()
+        return await asyncio.shield(future)
+
+    def persist(self, key: str, value: Any):
+        """写入缓存, 值为 None 时删除; 同一轮事件循环中的写入将合并为一次批量写入"""
+        self._writes[key] = value
+        self._schedule_io()
+
+    async def _flush_io(self):
+        from .cache import cache
+
+        self._io_task = None
+        reads, self._reads = self._reads, {}
+        writes, self._writes = self._writes, {}
+        if writes:
+            with cache.batch():
+                for key, value in writes.items():
+                    if value is None:
+                        cache.delete(key)
+                    else:
+                        cache.set(key, value)
+        if reads:
+            try:
+                results = await cache.aget_many(list(reads))
+            except Exception as e:
+                for future in reads.values():
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for key, future in reads.items():
+                    if not future.done():
+                        future.set_result(results.get(key))
+
+
+timers = TimerService()
+
+
+class SlotPlanner:
+    """为共用同一时间范围的多个计划任务统一规划执行时间, 以平滑负载.
+
+    将时间范围等分为与任务数相同的区间, 每个任务在各自区间内随机取点 (分层抽样), 并保证任意一段运行时长内开始的任务
+    不超过最大并发数. 规划结果按日期保存在缓存中, 重启后保持不变; 新增的任务将被插入到现有规划中最大的空隙.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        start_time: time = None,
+        end_time: time = None,
+        members: Iterable[str] = (),
+        max_concurrent: int = 0,
+        duration: float = 600,
+    ):
+        """
+        Args:
+            key: 规划ID, 用于缓存规划结果
+            start_time: 时间范围起始时间
+            end_time: 时间范围结束时间
+            members: 参与规划的任务ID
+            max_concurrent: 最大同时运行的任务数, 0 表示不限制
+            duration: 单个任务的预计运行时长 (秒)
+        """
+        self.key = key
+        self.start_time = start_time or time(0, 0)
+        self.end_time = end_time or time(23, 59, 59)
+        self.members = list(members)
+        self.max_concurrent = max_concurrent
+        self.duration = duration
+        self._plans: Dict[date, Dict[str, datetime]] = {}
+
+    def _get_config_hash(self):
+        config = {
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "max_concurrent": self.max_concurrent,
+            "duration": self.duration,
+        }
+        return hashlib.md5(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def _get_window(self, day: date):
+        start = datetime.combine(day, self.start_time)
+        end = datetime.combine(day, self.end_time)
+        if end < start:
+            end += timedelta(days=1)
+        return start, end
+
+    @staticmethod
+    def allocate(n: int, span: float, max_concurrent: int = 0, duration: float = 0) -> List[float]:
+        """在 [0, span] 中分配 n 个有序的时间偏移 (秒)
+
+        Args:
+            n: 任务数
+            span: 时间范围长度 (秒)
+            max_concurrent: 任意 duration 秒内开始的任务数上限, 0 表示不限制
+            duration: 单个任务的预计运行时长 (秒)
+        """
+        if n <= 0:
+            return []
+        offsets = [(i + random.random()) / n * span for i in range(n)]
+        if max_concurrent and duration:
+            limited = offsets.copy()
+            for i in range(max_concurrent, n):
+                limited[i] = max(limited[i], limited[i - max_concurrent] + duration)
+            if limited[-1] <= span:
+                return limited
+            # 无法满足时等间隔分布, 使任意一段运行时长内开始的任务数尽可能少
+            offsets = [i / (n - 1) * span for i in range(n)]
+            logger.warning(
+                f"时间范围内无法满足最大同时运行数 {max_concurrent} 的限制, 将在时间范围内等间隔分布, "
+                f"同时运行数最多为 {SlotPlanner.max_starts(offsets, duration)}."
+            )
+        return offsets
+
+    @staticmethod
+    def max_starts(offsets: List[float], duration: float) -> int:
+        """有序的时间偏移中, 任意 duration 秒内开始的任务数的最大值"""
+        count = j = 0
+        for i, offset in enumerate(offsets):
+            while offset - offsets[j] >= duration:
+                j += 1
+            count = max(count, i - j + 1)
+        return count
+
+    def _plan(self, day: date) -> Dict[str, datetime]:
+        from .cache import cache
+
+        plan = self._plans.get(day)
+        if plan is not None:
+            return plan
+        cache_key = f"scheduler.plan.{self.key}.{day.strftime('%Y%m%d')}"
+        cached = cache.get(cache_key)
+        if cached and cached.get("config_hash") == self._get_config_hash():
+            plan = {m: parser.parse(t) for m, t in cached.get("slots", {}).items()}
+        else:
+            start, end = self._get_window(day)
+            members = self.members.copy()
+            random.shuffle(members)
+            offsets = self.allocate(
+                len(members), (end - start).total_seconds(), self.max_concurrent, self.duration
+            )
+            plan = {m: start + timedelta(seconds=o) for m, o in zip(members, offsets)}
+            self._save(day, plan)
+        self._plans = {d: p for d, p in self._plans.items() if d >= day - timedelta(days=1)}
+        self._plans[day] = plan
+        return plan
+
+    def _save(self, day: date, plan: Dict[str, datetime]):
+        from .cache import cache
+
+        cache.set_nowait(
+            f"scheduler.plan.{self.key}.{day.strftime('%Y%m%d')}",
+            {
+                "config_hash": self._get_config_hash(),
+                "slots": {m: t.isoformat() for m, t in plan.items()},
+            },
+            ttl=7 * 86400,
+        )
+
+    def _insert(self, day: date, plan: Dict[str, datetime], member: str) -> datetime:
+        """将新任务插入到现有规划中最大的空隙"""
+        start, end = self._get_window(day)
+        points = sorted([start, end, *plan.values()])
+        a, b = max(zip(points, points[1:]), key=lambda p: p[1] - p[0])
+        plan[member] = a + (b - a) / 2
+        self._save(day, plan)
+        return plan[member]
+
+    def slot(self, member: str, day: date) -> datetime:
+        """获取任务在某日的规划执行时间"""
+        plan = self._plan(day)
+        if member in plan:
+            return plan[member]
+        return self._insert(day, plan, member)
+
+
 class Scheduler:
     """异步函数计划执行器"""
 
@@ -67,6 +421,7 @@ class Scheduler:
         sid: str = None,
         description: str = None,
         on_next_time: Callable[[datetime], None] = None,
+        planner: SlotPlanner = None,
     ):
         """
         Args:
@@ -77,6 +432,7 @@ class Scheduler:
             sid: 调度器ID, 用于缓存下次执行时间
             description: 调度器描述
             on_next_time: 回调函数，在计算出下一次执行时间时调用
+            planner: 执行时间规划器 (可选), 设置后将使用其为该调度器规划的时间
         """
         self.func = func
         if config.debug_cron:
@@ -92,6 +448,7 @@ class Scheduler:
         self.sid = sid
         self.description = description
         self.on_next_time = on_next_time
+        self.planner = None if config.debug_cron else planner
         self._cache_key = f"scheduler.{sid}" if sid else None
         self._next_time = None
         self._ctx: RunContext = None
@@ -123,65 +480,78 @@ class Scheduler:
         """计算或获取缓存的下一次执行时间"""
         from .cache import cache
 
+        cached = cache.get(self._cache_key) if self._cache_key else None
+        next_time, entry = self._resolve_next_time(cached)
+        if entry:
+            cache.set(self._cache_key, entry)
+        return next_time
+
+    async def _aget_next_time(self) -> datetime:
+        """_get_next_time 的异步版本, 通过定时器服务批量读写缓存"""
+        cached = await timers.load(self._cache_key) if self._cache_key else None
+        next_time, entry = self._resolve_next_time(cached)
+        if entry:
+            timers.persist(self._cache_key, entry)
+        return next_time
+
+    def _resolve_next_time(self, cached: dict = None):
+        """根据缓存内容计算下一次执行时间
+
+        Returns:
+            (下一次执行时间, 需要写入缓存的内容, 无需写入时为 None)
+        """
         now = datetime.now()
-        next_time = None
 
-        # Try to get cached next execution time
-        if self._cache_key:
-            cached = cache.get(self._cache_key)
-            if cached:
-                cached_config_hash = cached.get("config_hash")
-                cached_time = cached.get("next_time")
-
-                # Check if config hash matches and time hasn't passed
-                if (
-                    cached_config_hash == self._get_scheduler_config()
-                    and cached_time
-                    and parser.parse(cached_time) > now
-                ):
-                    next_time = parser.parse(cached_time)
-
-        # Calculate new next_time if needed
-        if not next_time:
-            # Calculate interval days
-            if isinstance(self.days, (list, tuple)):
-                interval = self.days[0] + (self.days[1] - self.days[0])
-            else:
-                interval = self.days
+        # Try to use cached next execution time
+        if cached:
+            cached_config_hash = cached.get("config_hash")
+            cached_time = cached.get("next_time")
 
-            next_time = next_random_datetime(
-                start_time=self.start_time, end_time=self.end_time, interval_days=interval
-            )
+            # Check if config hash matches and time hasn't passed
+            if (
+                cached_config_hash == self._get_scheduler_config()
+                and cached_time
+                and parser.parse(cached_time) > now
+            ):
+                return parser.parse(cached_time), None
 
-            # Cache the next execution time with config hash
-            if self._cache_key:
-                cache.set(
-                    self._cache_key,
-                    {
-                        "config_hash": self._get_scheduler_config(),
-                        "next_time": next_time.isoformat(),
-                        "description": self.description,
-                    },
-                )
+        # Calculate interval days
+        if isinstance(self.days, (list, tuple)):
+            interval = self.days[0] + (self.days[1] - self.days[0])
+        else:
+            interval = self.days
 
-        return next_time
+        next_time = next_random_datetime(
+            start_time=self.start_time, end_time=self.end_time, interval_days=interval
+        )
+        if self.planner and self.sid:
+            planned = self.planner.slot(self.sid, next_time.date())
+            if planned > now:
+                next_time = planned
+
+        # Cache the next execution time with config hash
+        entry = None
+        if self._cache_key:
+            entry = {
+                "config_hash": self._get_scheduler_config(),
+                "next_time": next_time.isoformat(),
+                "description": self.description,
+            }
+        return next_time, entry
 
     async def schedule(self):
         """等待到指定时间范围内执行函数"""
-        from .cache import cache
-
         while True:
             now = datetime.now()
-            self._next_time = self._get_next_time()
+            self._next_time = await self._aget_next_time()
 
             # Call the hook function if provided
             if self.on_next_time:
                 self._ctx = self.on_next_time(self._next_time)
 
             # Wait until the scheduled time
-            wait_seconds = (self._next_time - now).total_seconds()
-            if wait_seconds > 0:
-                await asyncio.sleep(wait_seconds)
+            if self._next_time > now:
+                await timers.sleep_until(self._next_time)
 
             # Execute the function
             try:
@@ -205,10 +575,7 @@ class Scheduler:
                     raise
 
             if self._cache_key:
-                try:
-                    cache.delete(self._cache_key)
-                except KeyError:
-                    pass
+                timers.persist(self._cache_key, None)
             self._ctx = None
             self._next_time = None
 
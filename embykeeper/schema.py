@@ -67,6 +67,10 @@ class CheckinerConfig(ConfigModel):
     retries: Optional[int] = 4
     concurrency: Optional[int] = 1
     random_start: Optional[int] = 60
+    smooth: Optional[bool] = False
+    max_concurrent: Optional[int] = Field(0, ge=0)
+    run_duration: Optional[int] = Field(10, ge=0)
+    ocr_workers: Optional[int] = Field(0, ge=0)
 
     model_config = {"extra": "allow"}
 
@@ -95,6 +99,20 @@ class NotifierConfig(ConfigModel):
     once: Optional[bool] = False
 
 
+class CacheConfig(ConfigModel):
+    backend: Optional[str] = Field("json", pattern="^(json|sqlite)$")
+    journal: Optional[bool] = True
+    flush_interval: Optional[float] = Field(1.0, gt=0)
+    compact_threshold: Optional[int] = Field(1000, gt=0)
+    lru_size: Optional[int] = Field(16, ge=0)
+    lru_ttl: Optional[float] = Field(300, ge=0)
+    lru_prefix_ttl: Optional[Dict[str, float]] = {}
+    compact_interval: Optional[float] = Field(3600, gt=0)
+    runinfo_days: Optional[int] = Field(30, ge=0)
+    runinfo_runs: Optional[int] = Field(100, ge=0)
+    runinfo_log_size: Optional[int] = Field(1000, ge=0)
+
+
 class SiteConfig(ConfigModel):
     checkiner: Optional[List[str]] = None
     monitor: Optional[List[str]] = None
@@ -207,6 +225,15 @@ class TelegramAccount(ConfigModel):
 class TelegramConfig(ConfigModel):
     account: Optional[List[TelegramAccount]] = []
     use_proxy: Optional[bool] = True
+    login_concurrency: Optional[int] = Field(8, ge=1)
+    login_concurrency_per_dc: Optional[int] = Field(4, ge=1)
+    session_wal: Optional[bool] = True
+    session_maintenance_interval: Optional[int] = Field(7, ge=0)
+    session_vacuum_ratio: Optional[float] = Field(0.25, ge=0, le=1)
+    shared_workers: Optional[bool] = False
+    shared_workers_min: Optional[int] = Field(4, ge=1)
+    shared_workers_max: Optional[int] = Field(64, ge=1)
+    auth_cache_ttl: Optional[int] = Field(24, ge=0)
 
 
 class BotConfig(ConfigModel):
@@ -231,6 +258,7 @@ class Config(ConfigModel):
 
     mongodb: Optional[str] = None
     basedir: Optional[str] = None
+    cache: Optional[CacheConfig] = CacheConfig()
     nofail: Optional[bool] = True
     noexit: Optional[bool] = False
     debug_cron: Optional[bool] = False
@@ -3,11 +3,11 @@ from __future__ import annotations
 import asyncio
 from datetime import datetime
 import random
-from typing import List, Dict, Tuple, Type
+from typing import List, Dict, Tuple, Type, Union
 
 from loguru import logger
 
-from embykeeper.schedule import Scheduler
+from embykeeper.schedule import Scheduler, SlotPlanner, Timer, timers
 from embykeeper.schema import TelegramAccount
 from embykeeper.config import config
 from embykeeper.runinfo import RunContext, RunStatus
@@ -27,8 +27,9 @@ class CheckinerManager:
 
     def __init__(self):
         self._tasks: Dict[str, asyncio.Task] = {}  # phone -> task
-        self._site_tasks: Dict[str, Dict[str, asyncio.Task]] = {}  # phone -> site -> task
+        self._site_tasks: Dict[str, Dict[str, Union[asyncio.Task, Timer]]] = {}  # phone -> site -> task
         self._schedulers: Dict[str, Scheduler] = {}  # phone -> scheduler
+        self._planner: SlotPlanner = None
         self._pool = AsyncTaskPool()
 
         config.on_list_change("telegram.account", self._handle_account_change)
@@ -40,6 +41,7 @@ class CheckinerManager:
         # Stop all existing schedulers
         for phone in list(self._schedulers.keys()):
             self.stop_account(phone)
+        self._planner = None
 
         # Reschedule all accounts with the new configuration
         for account in config.telegram.account:
@@ -76,6 +78,27 @@ class CheckinerManager:
         if phone in self._schedulers:
             del self._schedulers[phone]
 
+    def get_planner(self):
+        """获取使用全局签到设置的账号共用的执行时间规划器, 未启用负载平滑时返回 None"""
+        checkiner = config.checkiner
+        if not checkiner.smooth:
+            return None
+        if not self._planner:
+            scheduler = Scheduler.from_str(lambda ctx: None, checkiner.interval_days, checkiner.time_range)
+            self._planner = SlotPlanner(
+                "checkiner",
+                start_time=scheduler.start_time,
+                end_time=scheduler.end_time,
+                members=[
+                    f"checkiner.{a.phone}"
+                    for a in config.telegram.account
+                    if a.enabled and a.checkiner and not a.checkiner_config
+                ],
+                max_concurrent=checkiner.max_concurrent,
+                duration=checkiner.run_duration * 60,
+            )
+        return self._planner
+
     def schedule_account(self, account: TelegramAccount):
         """Schedule checkins for an account"""
         if (not account.checkiner) or (not account.enabled):
@@ -108,6 +131,7 @@ class CheckinerManager:
             on_next_time=on_next_time,
             description=f"{account.phone} 每日签到定时任务",
             sid=f"checkiner.{account.phone}",
+            planner=None if account.checkiner_config else self.get_planner(),
         )
         self._schedulers[account.phone] = scheduler
         return scheduler
@@ -130,7 +154,7 @@ class CheckinerManager:
 
     def schedule_reschedule(
         self, ctx: RunContext, at: datetime, account: TelegramAccount, site: str
-    ) -> asyncio.Task:
+    ) -> Timer:
         try:
             account_ctx = RunContext.get_or_create(f"checkiner.account.{account.phone}")
             site_ctx = RunContext.prepare(
@@ -138,26 +162,25 @@ class CheckinerManager:
             )
             site_ctx.reschedule = (ctx.reschedule or 0) + 1
 
-            async def _schedule():
-                # 计算延迟时间(秒)
-                delay = (at - datetime.now()).total_seconds()
-                if delay > 0:
-                    logger.debug(
-                        f"已安排账户 {account.phone} 的 {site} 站点在 {at.strftime('%m-%d %H:%M %p')} 重新尝试签到."
-                    )
-                    await asyncio.sleep(delay)
-                if account.phone in self._site_tasks and site in self._site_tasks[account.phone]:
-                    self._site_tasks[account.phone][site].cancel()
-                    del self._site_tasks[account.phone][site]
-                await self._run_single_site(site_ctx, account, site)
-
-            task = asyncio.create_task(_schedule())
             # Initialize _site_tasks for this phone if it doesn't exist
-            if account.phone not in self._site_tasks:
-                self._site_tasks[account.phone] = {}
-            # Store the task
-            self._site_tasks[account.phone][site] = task
-            return task
+            site_tasks = self._site_tasks.setdefault(account.phone, {})
+
+            # 取消该站点此前安排的重新签到
+            previous = site_tasks.pop(site, None)
+            if previous and previous is not asyncio.current_task():
+                previous.cancel()
+
+            def _start():
+                site_tasks[site] = asyncio.create_task(self._run_single_site(site_ctx, account, site))
+
+            if at > datetime.now():
+                logger.debug(
+                    f"已安排账户 {account.phone} 的 {site} 站点在 {at.strftime('%m-%d %H:%M %p')} 重新尝试签到."
+                )
+            # 由定时器服务统一等待, 到时后再创建签到任务
+            timer = timers.add(at, callback=_start)
+            site_tasks[site] = timer
+            return timer
         except Exception as e:
             logger.warning(f"重新安排 {site} 站点签到时间失败: {e}")
             show_exception(e, regular=False)
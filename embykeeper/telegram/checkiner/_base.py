@@ -34,6 +34,7 @@ from embykeeper.config import config
 from embykeeper.runinfo import RunStatus
 from embykeeper.telegram.pyrogram import Client
 from embykeeper.telegram.link import Link
+from embykeeper.telegram.keywords import KeywordClassifier
 
 __ignore__ = True
 
@@ -65,6 +66,17 @@ default_keywords = {
 }
 
 
+# 按优先级排列的 on_text 关键词类别及对应属性
+keyword_categories = (
+    ("ignore", "bot_text_ignore"),
+    ("account_fail", "bot_account_fail_keywords"),
+    ("too_many_tries_fail", "bot_too_many_tries_fail_keywords"),
+    ("checked", "bot_checked_keywords"),
+    ("fail", "bot_fail_keywords"),
+    ("success", "bot_success_keywords"),
+)
+
+
 class MessageType(Flag):
     IGNORE = auto()
     TEXT = auto()
@@ -176,6 +188,7 @@ class BotCheckin(BaseBotCheckin):
     max_retries = None  # 验证码错误或网络错误时最高重试次数 (默认无限)
     checked_retries = None # 今日已签到时最高重试次数 (默认不重试)
     init_first: bool = False  # 先执行自定义初始化函数, 再进行加入群组分析
+    priority: bool = False  # 时间敏感的签到, 相关会话的更新将优先处理
     # fmt: on
 
     @property
@@ -185,6 +198,11 @@ class BotCheckin(BaseBotCheckin):
         else:
             return self.retries
 
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        # 预先编译类中定义的关键词表
+        cls._text_classifier = KeywordClassifier.compile(cls.keyword_tables(cls))
+
     def __init__(self, *args, instant=False, **kw):
         super().__init__(*args, **kw)
         self.current_retries = 0  # 当前重试次数
@@ -217,6 +235,8 @@ class BotCheckin(BaseBotCheckin):
         group = await self.group_pool.append(self)
         handlers = self.get_handlers()
         for h in handlers:
+            h.priority = self.priority
+            h.owner = self.name
             await self.client.add_handler(h, group=group)
         try:
             yield
@@ -546,31 +566,43 @@ class BotCheckin(BaseBotCheckin):
         """
         await message.reply(captcha)
 
+    def keyword_tables(self):
+        """返回按优先级排列的关键词表, 注意该函数可能通过类直接调用 (self 为 cls)."""
+        tables = []
+        for category, attr in keyword_categories:
+            keywords = to_iterable(getattr(self, attr))
+            if not keywords and category != "ignore":
+                keywords = default_keywords[category]
+            tables.append((category, tuple(keywords)))
+        return tuple(tables)
+
+    def get_text_classifier(self) -> KeywordClassifier:
+        """返回关键词分类器, 实例中修改了关键词表时重新编译 (结果将被缓存)."""
+        classifier = type(self).__dict__.get("_text_classifier")
+        if classifier is None or any(attr in self.__dict__ for _, attr in keyword_categories):
+            classifier = KeywordClassifier.compile(self.keyword_tables())
+        return classifier
+
     async def on_text(self, message: Message, text: str):
         """接收非验证码消息时, 检测关键词并确认签到成功或失败, 发送用户提示."""
         if not text:
             return
-        if any(s in text for s in to_iterable(self.bot_text_ignore)):
+        category = self.get_text_classifier().classify(text)
+        if category == "ignore":
             pass
-        elif any(
-            s in text for s in to_iterable(self.bot_account_fail_keywords) or default_keywords["account_fail"]
-        ):
+        elif category == "account_fail":
             self.log.warning(f"签到失败: 账户错误.")
             await self.fail()
-        elif any(
-            s in text
-            for s in to_iterable(self.bot_too_many_tries_fail_keywords)
-            or default_keywords["too_many_tries_fail"]
-        ):
+        elif category == "too_many_tries_fail":
             self.log.warning(f"签到失败: 尝试次数过多.")
             await self.fail()
-        elif any(s in text for s in to_iterable(self.bot_checked_keywords) or default_keywords["checked"]):
+        elif category == "checked":
             self.log.info(f"今日已经签到过了.")
             await self.finish(RunStatus.NONEED, "今日已签到")
-        elif any(s in text for s in to_iterable(self.bot_fail_keywords) or default_keywords["fail"]):
+        elif category == "fail":
             self.log.info(f"签到失败: 验证码错误或网络错误, 正在重试.")
             await self.retry()
-        elif any(s in text for s in to_iterable(self.bot_success_keywords) or default_keywords["success"]):
+        elif category == "success":
             if await self.before_success():
                 if self.bot_success_pat:
                     matches = re.search(self.bot_success_pat, text)
@@ -38,8 +38,12 @@ class CCCheckin(BotCheckin):
         """分析分析传入的验证码图片并返回验证码."""
         if not message.reply_markup:
             return
+        options = [k.text for r in message.reply_markup.inline_keyboard for k in r]
+        clean = lambda r: r.translate(str.maketrans("", "", string.punctuation)).replace(" ", "")
+        # 仅缓存能与可用选项相匹配的识别结果
+        matched = lambda r: bool(r) and process.extractOne(clean(r), options)[1] >= 50
         for i in range(3):
-            result: str = await Link(self.client).ocr(message.photo.file_id)
+            result: str = await Link(self.client).ocr(message.photo.file_id, validate=matched)
             if result:
                 self.log.debug(f"远端已解析答案: {result}.")
                 break
@@ -48,9 +52,7 @@ class CCCheckin(BotCheckin):
         else:
             self.log.warning(f"签到失败: 验证码识别错误.")
             return await self.fail()
-        options = [k.text for r in message.reply_markup.inline_keyboard for k in r]
-        result = result.translate(str.maketrans("", "", string.punctuation)).replace(" ", "")
-        captcha, score = process.extractOne(result, options)
+        captcha, score = process.extractOne(clean(result), options)
         if score < 50:
             self.log.warning(f"远端答案难以与可用选项相匹配 (分数: {score}/100).")
         self.log.debug(f"[gray50]接收验证码: {captcha}.[/]")
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse, sre_constants
+
+from embykeeper.utils import to_iterable
+
+
+def fold(text: str):
+    return text.casefold().replace("ı", "i")
+
+
+class Automaton:
+    """
+    Aho-Corasick 多模式字符串匹配自动机, 一次扫描即可找出文本中出现的所有关键词.
+    默认情况下关键词与文本均按 casefold 后进行比较 (另将 "ı" 视为 "i", 与 re.IGNORECASE 一致).
+    """
+
+    __slots__ = ("goto", "fail", "output", "fold")
+
+    def __init__(self, words: Iterable[Tuple[str, Hashable]] = (), ignore_case: bool = True):
+        """
+        Args:
+            words: (关键词, 对应值) 列表, 同一关键词可对应多个值
+            ignore_case: 是否忽略大小写
+        """
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[Hashable, ...]] = [()]
+        self.fold = fold if ignore_case else str
+        for word, value in words:
+            self._insert(self.fold(word), value)
+        self._build()
+
+    def _insert(self, word: str, value: Hashable):
+        state = 0
+        for c in word:
+            nxt = self.goto[state].get(c)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+                self.goto[state][c] = nxt
+            state = nxt
+        if value not in self.output[state]:
+            self.output[state] += (value,)
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(c, 0)
+                self.fail[nxt] = f if f != nxt else 0
+                if self.output[self.fail[nxt]]:
+                    self.output[nxt] += tuple(
+                        v for v in self.output[self.fail[nxt]] if v not in self.output[nxt]
+                    )
+
+    def __bool__(self):
+        return len(self.goto) > 1
+
+    def iter(self, text: str):
+        """依次产生文本中各关键词出现位置对应的值."""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for c in self.fold(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if output[state]:
+                yield from output[state]
+
+    def find(self, text: str) -> Set[Hashable]:
+        """返回文本中出现的所有关键词对应的值."""
+        found = set()
+        for v in self.iter(text):
+            found.add(v)
+        return found
+
+
+class KeywordClassifier:
+    """
+    关键词分类器, 按优先级排列的多个关键词表被编译为一个自动机 (区分大小写).
+    单次扫描文本即可返回含有关键词的最高优先级类别, 与依次检查各关键词表的结果一致.
+    """
+
+    __slots__ = ("categories", "automaton", "always")
+
+    def __init__(self, tables: Iterable[Tuple[str, Iterable[str]]]):
+        """
+        Args:
+            tables: (类别, 关键词列表) 列表, 靠前的类别优先
+        """
+        self.categories: List[str] = []
+        words = []
+        self.always = None  # 含有空关键词的最高优先级类别, 任何文本均可匹配
+        for i, (category, keywords) in enumerate(tables):
+            self.categories.append(category)
+            for k in keywords:
+                if k:
+                    words.append((k, i))
+                elif self.always is None:
+                    self.always = i
+        self.automaton = Automaton(words, ignore_case=False)
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def compile(cls, tables: Tuple[Tuple[str, Tuple[str, ...]], ...]):
+        """编译关键词表, 相同的关键词表共享同一个分类器."""
+        return cls(tables)
+
+    def classify(self, text: str) -> Optional[str]:
+        """返回文本含有关键词的最高优先级类别, 均不含有时返回 None."""
+        best = len(self.categories) if self.always is None else self.always
+        if best:
+            for i in self.automaton.iter(text):
+                if i < best:
+                    best = i
+                    if not best:
+                        break
+        return self.categories[best] if best < len(self.categories) else None
+
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_REPEATS.add(getattr(sre_constants, "POSSESSIVE_REPEAT", sre_constants.MAX_REPEAT))
+_GROUPS = {sre_constants.SUBPATTERN}
+_GROUPS.add(getattr(sre_constants, "ATOMIC_GROUP", sre_constants.SUBPATTERN))
+
+
+def _literal_char(code: int) -> Optional[str]:
+    c = chr(code)
+    # 仅使用不受大小写折叠影响的字符, 确保忽略大小写时的匹配不会被遗漏
+    if c.isascii() or c.casefold() == c.upper().casefold() == c:
+        return c
+    return None
+
+
+def _required(items) -> Optional[FrozenSet[str]]:
+    """返回一组字面量, 正则的任何匹配必定包含其中之一; 无法确定时返回 None."""
+    candidates: List[FrozenSet[str]] = []
+    run = ""
+
+    def flush():
+        nonlocal run
+        if run:
+            candidates.append(frozenset([run]))
+            run = ""
+
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            c = _literal_char(av)
+            if c is not None:
+                run += c
+                continue
+            flush()
+        elif op in _GROUPS:
+            flush()
+            # SUBPATTERN 的参数为 (组号, 添加的标志, 移除的标志, 子模式), ATOMIC_GROUP 的参数即为子模式
+            sub = _required(av[-1] if op == sre_constants.SUBPATTERN else av)
+            if sub:
+                candidates.append(sub)
+        elif op == sre_constants.BRANCH:
+            flush()
+            alternatives = [_required(b) for b in av[1]]
+            if all(alternatives):
+                candidates.append(frozenset().union(*alternatives))
+        elif op in _REPEATS:
+            flush()
+            if av[0] >= 1:
+                sub = _required(av[2])
+                if sub:
+                    candidates.append(sub)
+        else:
+            flush()
+    flush()
+    if not candidates:
+        return None
+    return max(candidates, key=lambda s: (min(len(w) for w in s), -len(s)))
+
+
+@lru_cache(maxsize=1024)
+def required_literals(pattern: str) -> Optional[FrozenSet[str]]:
+    """
+    提取正则表达式的必需字面量, 正则的任何匹配必定包含其中之一.
+    Args:
+        pattern: 正则表达式
+    Returns:
+        字面量集合, 无法提取 (例如可匹配空字符串) 时为 None.
+    """
+    try:
+        return _required(sre_parse.parse(pattern))
+    except Exception:
+        return None
+
+
+class KeywordIndex:
+    """
+    同一客户端上所有监控器的关键词索引.
+    将各监控器 chat_keyword 的必需字面量合并为一个 Aho-Corasick 自动机, 每条消息只扫描一次,
+    之后仅有可能匹配的监控器才需执行各自的正则.
+    """
+
+    def __init__(self, cache_size: int = 128):
+        self.entries: Dict[int, Optional[FrozenSet[str]]] = {}  # 监控器编号: 字面量 (None 为总是候选)
+        self.always: FrozenSet[int] = frozenset()
+        self.automaton = Automaton()
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, FrozenSet[int]] = OrderedDict()
+
+    @staticmethod
+    def literals(monitor) -> Optional[FrozenSet[str]]:
+        """返回监控器各关键词的必需字面量, 无法对文本消息进行预筛选时返回 None."""
+        if not monitor.chat_keyword:
+            return None
+        words = set()
+        for k in to_iterable(monitor.chat_keyword):
+            if k is None:
+                # 仅匹配不含文本的消息, 不影响文本消息
+                continue
+            if not isinstance(k, str):
+                return None
+            lits = required_literals(k)
+            if lits is None:
+                return None
+            words.update(lits)
+        return frozenset(words)
+
+    def add(self, monitor):
+        self.entries[id(monitor)] = self.literals(monitor)
+        self._rebuild()
+
+    def remove(self, monitor):
+        if id(monitor) in self.entries:
+            del self.entries[id(monitor)]
+            self._rebuild()
+
+    def _rebuild(self):
+        self.always = frozenset(k for k, v in self.entries.items() if v is None)
+        self.automaton = Automaton((w, k) for k, v in self.entries.items() if v for w in v)
+        self._cache = OrderedDict()
+
+    def candidates(self, text: str) -> FrozenSet[int]:
+        """返回文本可能匹配的监控器编号, 同一文本的结果会被缓存, 供同一消息的各监控器共享."""
+        result = self._cache.get(text)
+        if result is None:
+            result = self.always | self.automaton.find(text)
+            self._cache[text] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def may_match(self, monitor, text: str) -> bool:
+        """监控器的关键词是否可能与文本匹配, 未注册的监控器总是返回 True."""
+        if id(monitor) not in self.entries:
+            return True
+        return id(monitor) in self.candidates(text)
@@ -1,8 +1,12 @@
 import asyncio
+from contextlib import asynccontextmanager
+import hashlib
 import random
-from typing import Callable, Coroutine, List, Optional, Tuple, Union
+import time
+from typing import Callable, Coroutine, Dict, List, Optional, Tuple, Union
 import uuid
 from io import BytesIO
+import weakref
 
 import tomli
 from loguru import logger
@@ -12,7 +16,10 @@ from pyrogram.enums import ParseMode
 from pyrogram.types import Message
 from pyrogram.errors.exceptions.bad_request_400 import YouBlockedUser
 from pyrogram.errors import FloodWait
+from pyrogram.file_id import FileId
 
+from embykeeper.cache import cache
+from embykeeper.config import config
 from embykeeper.utils import async_partial, truncate_str
 
 from .lock import super_ad_shown, super_ad_shown_lock, authed_services, authed_services_lock
@@ -23,11 +30,219 @@ class LinkError(Exception):
     pass
 
 
+class LinkChannel:
+    """
+    客户端与云服务机器人之间的长期通讯通道.
+    仅注册一个消息处理器并仅设置一次禁用提醒, 根据响应中的命令将其分发给等待中的请求,
+    同时进行中的请求数受窗口大小限制, 超出的请求将排队等待.
+    """
+
+    window = 5  # 同时进行中的请求数上限
+    channels: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def __init__(self, client: Client, bot: str):
+        self.client = client
+        self.bot = bot
+        self.log = logger.bind(scheme="telelink", username=client.me.full_name)
+        self.handler = MessageHandler(self._handler, filters.text & filters.bot & filters.user(bot))
+        self.handler.owner = "Link"
+        self.waiters: Dict[str, List[Tuple[asyncio.Future, Optional[Callable]]]] = {}
+        self.muted = False
+        self.lock = asyncio.Lock()
+        self.sem = asyncio.Semaphore(self.window)
+        self._tasks = set()
+
+    @classmethod
+    def get(cls, client: Client, bot: str) -> "LinkChannel":
+        """获取客户端的通讯通道, 不存在时创建."""
+        channel = cls.channels.get(client)
+        if channel is None:
+            channel = cls.channels[client] = cls(client, bot)
+        return channel
+
+    @property
+    def pending(self):
+        return sum(len(w) for w in self.waiters.values())
+
+    async def ensure(self):
+        """确保已设置禁用提醒并注册了消息处理器 (客户端重启后处理器将被清除)."""
+        async with self.lock:
+            if not self.muted:
+                try:
+                    await self.client.mute_chat(self.bot)
+                except FloodWait:
+                    self.log.debug(f"[gray50]设置禁用提醒因访问超限而失败: {self.bot}[/]")
+                else:
+                    self.muted = True
+            if self.handler not in self.client.dispatcher.groups.get(1, ()):
+                await self.client.add_handler(self.handler, group=1)
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个请求窗口, 窗口已满时排队等待."""
+        async with self.sem:
+            yield
+
+    def expect(self, cmd: str, condition: Union[bool, Callable[..., Coroutine], Callable] = None):
+        """登记一个等待中的请求, 返回接收响应的 Future."""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(cmd, []).append((future, condition))
+        return future
+
+    def discard(self, cmd: str, future: asyncio.Future):
+        """移除等待中的请求."""
+        waiters = self.waiters.get(cmd)
+        if not waiters:
+            return
+        waiters[:] = [w for w in waiters if w[0] is not future]
+        if not waiters:
+            del self.waiters[cmd]
+
+    def _delete_later(self, message: Message, delay: float = 0):
+        async def delete():
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await asyncio.wait_for(message.delete(revoke=True), 3)
+                text = truncate_str((message.text or "").replace("\n", ""), 30)
+                self.log.debug(f"[gray50]删除了 API 消息记录: {text}[/]")
+            except asyncio.TimeoutError:
+                pass
+
+        task = asyncio.create_task(delete())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handler(self, client: Client, message: Message):
+        try:
+            toml = tomli.loads(message.text)
+        except tomli.TOMLDecodeError:
+            self._delete_later(message)
+            return
+        for future, condition in list(self.waiters.get(toml.get("command", None), ())):
+            if future.done():
+                continue
+            if condition is None:
+                cond = True
+            elif asyncio.iscoroutinefunction(condition):
+                cond = await condition(toml)
+            elif callable(condition):
+                cond = condition(toml)
+            else:
+                cond = condition
+            if cond:
+                future.set_result(toml)
+                self._delete_later(message, 0.5)
+                return
+        message.continue_propagation()
+
+
+class LinkResultCache:
+    """
+    云服务查询结果的进程级合并与缓存.
+    按 (命令, 内容, 图片) 的哈希值索引: 相同的并发请求共享同一次请求, 经调用方验证有效的结果将在有效期内通过 Cache 持久保存.
+    """
+
+    _FAILED = object()
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0  # 命中已缓存结果的次数
+        self.coalesced = 0  # 合并到进行中请求的次数
+        self.misses = 0  # 实际发送请求的次数
+
+    @staticmethod
+    def photo_key(photo) -> Optional[str]:
+        """返回图片的内容标识, 同一图片在不同账号中的 file_id 不同, 因此使用其媒体编号; 无法由内容确定时返回 None."""
+        if photo is None:
+            return ""
+        if isinstance(photo, str):
+            try:
+                return f"media:{FileId.decode(photo).media_id}"
+            except Exception:
+                return f"file:{photo}"
+        if isinstance(photo, BytesIO):
+            data = photo.getvalue()
+        elif isinstance(photo, (bytes, bytearray)):
+            data = bytes(photo)
+        else:
+            return None
+        return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+    @classmethod
+    def key(cls, command: str, payload: str, photo=None) -> Optional[str]:
+        """返回查询的索引, 图片无法由内容确定时返回 None, 此时不应缓存或合并该查询."""
+        photo_key = cls.photo_key(photo)
+        if photo_key is None:
+            return None
+        digest = hashlib.sha256("\0".join((command, payload, photo_key)).encode()).hexdigest()
+        return f"link.result.{command}.{digest[:32]}"
+
+    @property
+    def saved(self):
+        """节省的请求次数."""
+        return self.hits + self.coalesced
+
+    def stats(self):
+        total = self.hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "saved": self.saved,
+            "hit_rate": self.saved / total if total else 0.0,
+        }
+
+    async def run(
+        self, key: str, func: Callable[[], Coroutine], ttl: float, validate: Callable[[dict], bool] = None
+    ):
+        """
+        执行查询, 优先使用缓存结果或进行中的相同请求.
+        Args:
+            key: 查询的索引
+            func: 实际发送请求的异步函数
+            ttl: 结果有效期 (秒)
+            validate: 验证结果是否有效的函数, 仅缓存有效的结果; 未提供时不缓存结果, 仅合并相同的并发请求
+        Returns:
+            (结果, 是否使用了已有结果)
+        """
+        valid = lambda r: validate is None or validate(r)
+        result = await cache.aget(key)
+        if result is not None and valid(result):
+            self.hits += 1
+            return result, True
+        future = self.inflight.get(key)
+        if future is not None:
+            result = await asyncio.shield(future)
+            if result is not self._FAILED and valid(result):
+                self.coalesced += 1
+                return result, True
+        self.misses += 1
+        future = self.inflight[key] = asyncio.get_running_loop().create_future()
+        result = self._FAILED
+        try:
+            result = await func()
+            if result and validate and validate(result):
+                try:
+                    await cache.aset(key, result, ttl=ttl)
+                except Exception as e:
+                    logger.debug(f"云服务查询结果无法缓存: {e}")
+            return result, False
+        finally:
+            # 请求被取消或出错时, 等待中的相同请求将自行发送请求
+            future.set_result(result)
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+
 class Link:
     """云服务类, 用于认证和高级权限任务通讯."""
 
     bot = "embykeeper_auth_bot"
     post_count = 0
+    results = LinkResultCache()
+    answer_ttl = 7 * 86400  # 经验证的问题答案和验证码识别结果的缓存有效期
+    revalidating: Dict[str, asyncio.Task] = {}  # 后台重新验证中的认证: 缓存键
 
     def __init__(self, client: Client):
         self.client = client
@@ -100,143 +315,102 @@ class Link:
             if photo and file:
                 raise ValueError("can not use both photo and file")
 
-            for r in range(retries):
-                try:
-                    await self.client.mute_chat(self.bot)
-                except FloodWait:
-                    self.log.debug(f"[gray50]设置禁用提醒因访问超限而失败: {self.bot}[/]")
-                future = asyncio.Future()
-                handler = MessageHandler(
-                    async_partial(self._handler, cmd=cmd, future=future, condition=condition),
-                    filters.text & filters.bot & filters.user(self.bot),
-                )
-                await self.client.add_handler(handler, group=1)
-                try:
-                    messages = []
-                    if photo:
-                        messages.append(
-                            await self.client.send_photo(
-                                self.bot, photo, caption=cmd, parse_mode=ParseMode.DISABLED
+            channel = LinkChannel.get(self.client, self.bot)
+            async with channel.slot():
+                for r in range(retries):
+                    await channel.ensure()
+                    future = channel.expect(cmd, condition)
+                    try:
+                        messages = []
+                        if photo:
+                            messages.append(
+                                await self.client.send_photo(
+                                    self.bot, photo, caption=cmd, parse_mode=ParseMode.DISABLED
+                                )
                             )
-                        )
-                    elif file:
-                        messages.append(
-                            await self.client.send_document(
-                                self.bot, file, caption=cmd, parse_mode=ParseMode.DISABLED
+                        elif file:
+                            messages.append(
+                                await self.client.send_document(
+                                    self.bot, file, caption=cmd, parse_mode=ParseMode.DISABLED
+                                )
                             )
-                        )
-                    else:
-                        messages.append(
-                            await self.client.send_message(self.bot, cmd, parse_mode=ParseMode.DISABLED)
-                        )
-                    self.log.debug(f"[gray50]-> {cmd}[/]")
-                    results = await asyncio.wait_for(future, timeout=timeout)
-                except asyncio.CancelledError:
-                    try:
-                        await asyncio.wait_for(self.delete_messages(messages), 3)
+                        else:
+                            messages.append(
+                                await self.client.send_message(self.bot, cmd, parse_mode=ParseMode.DISABLED)
+                            )
+                        self.log.debug(f"[gray50]-> {cmd}[/]")
+                        results = await asyncio.wait_for(future, timeout=timeout)
+                    except asyncio.CancelledError:
+                        try:
+                            await asyncio.wait_for(self.delete_messages(messages), 3)
+                        except asyncio.TimeoutError:
+                            pass
+                        finally:
+                            raise
                     except asyncio.TimeoutError:
-                        pass
-                    finally:
-                        raise
-                except asyncio.TimeoutError:
-                    await self.delete_messages(messages)
-                    if r + 1 < retries:
-                        self.log.info(f"{name}超时 ({r + 1}/{retries}), 将在 3 秒后重试.")
-                        await asyncio.sleep(3)
-                        continue
-                    else:
-                        msg = f"{name}超时 ({r + 1}/{retries})."
+                        await self.delete_messages(messages)
+                        if r + 1 < retries:
+                            self.log.info(f"{name}超时 ({r + 1}/{retries}), 将在 3 秒后重试.")
+                            await asyncio.sleep(3)
+                            continue
+                        else:
+                            msg = f"{name}超时 ({r + 1}/{retries})."
+                            if fail:
+                                raise LinkError(msg)
+                            else:
+                                self.log.warning(msg)
+                                return None
+                    except YouBlockedUser:
+                        msg = "您在账户中禁用了用于 API 信息传递的 Bot: @embykeeper_auth_bot, 这将导致 embykeeper 无法运行, 请尝试取消禁用."
                         if fail:
                             raise LinkError(msg)
                         else:
-                            self.log.warning(msg)
+                            self.log.error(msg)
                             return None
-                except YouBlockedUser:
-                    msg = "您在账户中禁用了用于 API 信息传递的 Bot: @embykeeper_auth_bot, 这将导致 embykeeper 无法运行, 请尝试取消禁用."
-                    if fail:
-                        raise LinkError(msg)
-                    else:
-                        self.log.error(msg)
-                        return None
-                else:
-                    await self.delete_messages(messages)
-                    status, errmsg = [results.get(p, None) for p in ("status", "errmsg")]
-                    if status == "error":
-                        if fail:
-                            raise LinkError(f"{errmsg}.")
-                        else:
-                            self.log.warning(f"{name}错误: {errmsg}.")
-                            return False
-                    elif status == "ok":
-                        self.log.info(f"服务请求完成: {name}")
-                        return results
                     else:
-                        if fail:
-                            raise LinkError("出现未知错误.")
+                        await self.delete_messages(messages)
+                        status, errmsg = [results.get(p, None) for p in ("status", "errmsg")]
+                        if status == "error":
+                            if fail:
+                                raise LinkError(f"{errmsg}.")
+                            else:
+                                self.log.warning(f"{name}错误: {errmsg}.")
+                                return False
+                        elif status == "ok":
+                            self.log.info(f"服务请求完成: {name}")
+                            return results
                         else:
-                            self.log.warning(f"{name}出现未知错误.")
-                            return False
-                finally:
-                    try:
-                        await self.client.remove_handler(handler, group=1)
-                    except:
-                        pass
+                            if fail:
+                                raise LinkError("出现未知错误.")
+                            else:
+                                self.log.warning(f"{name}出现未知错误.")
+                                return False
+                    finally:
+                        channel.discard(cmd, future)
 
         finally:
             Link.post_count -= 1
 
-    async def _handler(
-        self,
-        client: Client,
-        message: Message,
-        cmd: str,
-        future: asyncio.Future,
-        condition: Union[bool, Callable[..., Coroutine], Callable] = None,
-    ):
-        try:
-            toml = tomli.loads(message.text)
-        except tomli.TOMLDecodeError:
-            await self.delete_messages([message])
-        else:
-            try:
-                if toml.get("command", None) == cmd:
-                    if condition is None:
-                        cond = True
-                    elif asyncio.iscoroutinefunction(condition):
-                        cond = await condition(toml)
-                    elif callable(condition):
-                        cond = condition(toml)
-                    if cond:
-                        if not future.done():
-                            future.set_result(toml)
-                        await asyncio.sleep(0.5)
-                        await self.delete_messages([message])
-                        return
-            except asyncio.CancelledError as e:
-                try:
-                    await asyncio.wait_for(self.delete_messages([message]), 3)
-                except asyncio.TimeoutError:
-                    pass
-                finally:
-                    if not future.done():
-                        future.set_exception(e)
-                    raise
-            else:
-                message.continue_propagation()
-
     async def auth(self, service: str, log_func=None):
-        """向机器人发送授权请求."""
+        """向机器人发送授权请求, 认证成功的结果将在有效期内持久保存, 重启后无需等待重新认证."""
+        uid = self.client.me.id
         async with authed_services_lock:
-            user_auth_cache = authed_services.get(self.client.me.id, {}).get(service, None)
+            user_auth_cache = authed_services.get(uid, {}).get(service, None)
             if user_auth_cache is not None:
                 return user_auth_cache
 
+            if await self._cached_auth(service):
+                authed_services.setdefault(uid, {})[service] = True
+                return True
+
             # No cache, perform auth
             if not log_func:
                 result = await self.post(
                     f"/auth {service} {self.instance}", name=f"服务 {service.upper()} 认证"
                 )
-                authed_services.setdefault(self.client.me.id, {})[service] = bool(result)
+                authed_services.setdefault(uid, {})[service] = bool(result)
+                if result:
+                    await self._store_auth(service)
                 return bool(result)
             else:
                 try:
@@ -249,12 +423,70 @@ class Link:
                     log_func(f"初始化错误: 使用 {service.upper()} 服务, 但{e}")
                     if "权限不足" in str(e):
                         await self._show_super_ad()
-                    authed_services.setdefault(self.client.me.id, {})[service] = False
+                    authed_services.setdefault(uid, {})[service] = False
                     return False
                 else:
-                    authed_services.setdefault(self.client.me.id, {})[service] = True
+                    authed_services.setdefault(uid, {})[service] = True
+                    await self._store_auth(service)
                     return True
 
+    def _auth_key(self, service: str):
+        return f"telegram.auth.{self.client.me.id}.{service}"
+
+    async def _cached_auth(self, service: str) -> bool:
+        """
+        检查持久保存的认证结果, 有效时直接返回.
+        认证结果超过有效期的一半时, 将在后台重新认证, 以便及时发现失效的授权.
+        """
+        ttl = config.telegram.auth_cache_ttl * 3600
+        if not ttl:
+            return False
+        key = self._auth_key(service)
+        try:
+            granted = await cache.aget(key)
+        except Exception as e:
+            self.log.debug(f"读取服务 {service.upper()} 认证缓存失败: {e}")
+            return False
+        if not granted:
+            return False
+        age = time.time() - granted
+        if not 0 <= age < ttl:
+            return False
+        if age > ttl / 2 and key not in Link.revalidating:
+            task = asyncio.create_task(self._revalidate_auth(service))
+            Link.revalidating[key] = task
+            task.add_done_callback(lambda _: Link.revalidating.pop(key, None))
+        self.log.debug(f"服务 {service.upper()} 使用已缓存的认证结果.")
+        return True
+
+    async def _store_auth(self, service: str):
+        ttl = config.telegram.auth_cache_ttl * 3600
+        if not ttl:
+            return
+        try:
+            await cache.aset(self._auth_key(service), time.time(), ttl=ttl)
+        except Exception as e:
+            self.log.debug(f"保存服务 {service.upper()} 认证缓存失败: {e}")
+
+    async def _revalidate_auth(self, service: str):
+        """在后台重新认证, 授权已失效时撤销缓存的认证结果; 请求超时等情况下保留原有结果."""
+        try:
+            result = await self.post(
+                f"/auth {service} {self.instance}", name=f"服务 {service.upper()} 重新认证"
+            )
+        except Exception as e:
+            self.log.debug(f"服务 {service.upper()} 重新认证失败: {e}")
+            return
+        if result:
+            await self._store_auth(service)
+        elif result is False:
+            self.log.warning(f"服务 {service.upper()} 的授权已失效, 将在下次使用时重新认证.")
+            authed_services.get(self.client.me.id, {}).pop(service, None)
+            try:
+                await cache.adelete(self._auth_key(service))
+            except Exception as e:
+                self.log.debug(f"删除服务 {service.upper()} 认证缓存失败: {e}")
+
     async def _show_super_ad(self):
         async with super_ad_shown_lock:
             user_super_ad_shown = super_ad_shown.get(self.client.me.id, False)
@@ -309,10 +541,43 @@ class Link:
         else:
             return None, None
 
-    async def pornemby_answer(self, question: str) -> Tuple[Optional[str], Optional[str]]:
-        """向机器人发送问题回答请求."""
-        results = await self.post(
-            f"/pornemby_answer {self.instance} {question}", timeout=20, name="请求问题回答"
+    async def query(
+        self,
+        command: str,
+        payload: str,
+        ttl: float,
+        photo=None,
+        validate: Callable[[Optional[str]], bool] = None,
+        **kw,
+    ):
+        """
+        发送可缓存的云服务查询, 相同的查询将被合并或直接使用缓存结果.
+        Args:
+            command: 命令名称
+            payload: 命令参数
+            ttl: 结果有效期 (秒)
+            photo: 图片
+            validate: 验证答案是否有效的函数, 仅缓存和共享有效的答案; 未提供时不缓存结果
+            kw: 传递给 post 的其他参数
+        """
+        cmd = f"/{command} {self.instance}"
+        if payload:
+            cmd += f" {payload}"
+        key = LinkResultCache.key(command, payload, photo)
+        if key is None:
+            return await self.post(cmd, photo=photo, **kw)
+        check = (lambda r: bool(validate(r.get("answer", None)))) if validate else None
+        results, shared = await Link.results.run(key, lambda: self.post(cmd, photo=photo, **kw), ttl, check)
+        if shared:
+            self.log.debug(f"[gray50]{kw.get('name', command)}使用了已有结果, 跳过请求.[/]")
+        return results
+
+    async def pornemby_answer(
+        self, question: str, validate: Callable[[Optional[str]], bool] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """向机器人发送问题回答请求, 仅缓存通过 validate 验证的答案."""
+        results = await self.query(
+            "pornemby_answer", question, self.answer_ttl, validate=validate, timeout=20, name="请求问题回答"
         )
         if results:
             return results.get("answer", None), results.get("by", None)
@@ -321,8 +586,8 @@ class Link:
 
     async def terminus_answer(self, question: str) -> Tuple[Optional[str], Optional[str]]:
         """向机器人发送问题回答请求."""
-        results = await self.post(
-            f"/terminus_answer {self.instance} {question}", timeout=20, name="请求问题回答"
+        results = await self.query(
+            "terminus_answer", question, self.answer_ttl, timeout=20, name="请求问题回答"
         )
         if results:
             return results.get("answer", None), results.get("by", None)
@@ -338,20 +603,29 @@ class Link:
             return None, None
 
     async def visual(self, photo, options: List[str], question=None) -> Tuple[Optional[str], Optional[str]]:
-        """向机器人发送视觉问题解答请求."""
-        cmd = f"/visual {self.instance} {'/'.join(options)}"
+        """向机器人发送视觉问题解答请求, 仅缓存属于可用选项的答案."""
+        payload = "/".join(options)
         if question:
-            cmd += f" {question}"
-        results = await self.post(cmd, photo=photo, timeout=20, name="请求视觉问题解答")
+            payload += f" {question}"
+        results = await self.query(
+            "visual",
+            payload,
+            self.answer_ttl,
+            photo=photo,
+            validate=lambda a: a in options,
+            timeout=20,
+            name="请求视觉问题解答",
+        )
         if results:
             return results.get("answer", None), results.get("by", None)
         else:
             return None, None
 
-    async def ocr(self, photo) -> Optional[str]:
-        """向机器人发送 OCR 解答请求."""
-        cmd = f"/ocr {self.instance}"
-        results = await self.post(cmd, photo=photo, timeout=20, name="请求验证码解答")
+    async def ocr(self, photo, validate: Callable[[Optional[str]], bool] = None) -> Optional[str]:
+        """向机器人发送 OCR 解答请求, 仅缓存通过 validate 验证的结果."""
+        results = await self.query(
+            "ocr", "", self.answer_ttl, photo=photo, validate=validate, timeout=20, name="请求验证码解答"
+        )
         if results:
             return results.get("answer", None)
         else:
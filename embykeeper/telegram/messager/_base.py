@@ -21,6 +21,7 @@ from embykeeper.data import get_data
 from embykeeper.var import debug
 from embykeeper.utils import show_exception, to_iterable, truncate_str, distribute_numbers
 from embykeeper.runinfo import RunContext, RunStatus
+from embykeeper.schedule import timers
 from embykeeper.config import config
 from embykeeper.schema import TelegramAccount
 
@@ -332,7 +333,7 @@ class Messager:
                 self.log.debug(
                     f"下一次计划任务将在 [blue]{next_p.at.strftime('%m-%d %H:%M:%S')}[/] 进行 ({'跳过' if next_p.skip else '有效'})."
                 )
-                await asyncio.sleep((next_p.at - datetime.now()).total_seconds())
+                await timers.sleep_until(next_p.at)
                 if not next_p.skip:
                     await self.send(next_p.message)
                 self.timeline.remove(next_p)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Dict, List
+
+from loguru import logger
+
+logger = logger.bind(scheme="telegram", nonotify=True)
+
+# 回调用时直方图的桶上界 (秒), 最后一个桶收集所有更长的用时
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+class HandlerStats:
+    """单个监控器 / 签到器的更新处理器统计."""
+
+    __slots__ = ("name", "checks", "matches", "errors", "time_total", "time_max", "histogram")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checks = 0  # 过滤器检查次数
+        self.matches = 0  # 过滤器匹配并执行回调的次数
+        self.errors = 0  # 过滤器或回调中发生异常的次数
+        self.time_total = 0.0
+        self.time_max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, elapsed: float):
+        self.time_total += elapsed
+        self.time_max = max(self.time_max, elapsed)
+        self.histogram[bisect_left(BUCKETS, elapsed)] += 1
+
+    @property
+    def time_mean(self):
+        return self.time_total / self.matches if self.matches else 0.0
+
+    def percentile(self, q: float):
+        """根据直方图估计回调用时的分位数 (取桶上界)."""
+        total = sum(self.histogram)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                return min(BUCKETS[i], self.time_max) if i < len(BUCKETS) else self.time_max
+        return self.time_max
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "checks": self.checks,
+            "matches": self.matches,
+            "errors": self.errors,
+            "time_total": self.time_total,
+            "time_mean": self.time_mean,
+            "time_p95": self.percentile(0.95),
+            "time_max": self.time_max,
+            "histogram": dict(zip([*BUCKETS, float("inf")], self.histogram)),
+        }
+
+
+class HandlerMetrics:
+    """按所属监控器 / 签到器名称汇总的更新处理器统计, 由所有客户端共享."""
+
+    def __init__(self):
+        self.stats: Dict[str, HandlerStats] = {}
+
+    def get(self, name: str):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = HandlerStats(name)
+        return stats
+
+    def snapshot(self, sort: str = "time_total") -> List[dict]:
+        """返回所有处理器统计, 默认按回调总用时降序排列."""
+        return sorted((s.to_dict() for s in self.stats.values()), key=lambda d: d[sort], reverse=True)
+
+    def top(self, n: int = 3, sort: str = "time_total"):
+        return [s for s in self.snapshot(sort)[:n] if s["matches"]]
+
+    def reset(self):
+        self.stats.clear()
+
+    def report(self, n: int = 20):
+        """在调试日志中输出处理器统计."""
+        stats = self.snapshot()[:n]
+        if not stats:
+            return
+        logger.debug("更新处理器统计 (检查 / 匹配 / 异常 / 平均用时 / P95 / 最长用时):")
+        for s in stats:
+            logger.debug(
+                f"  {s['name']}: {s['checks']} / {s['matches']} / {s['errors']} / "
+                f"{s['time_mean'] * 1000:.1f} ms / {s['time_p95'] * 1000:.0f} ms / {s['time_max'] * 1000:.0f} ms"
+            )
+
+
+metrics = HandlerMetrics()
+
+
+def handler_name(handler) -> str:
+    """获取处理器所属的监控器 / 签到器名称, 未设置时使用回调函数名称."""
+    name = getattr(handler, "owner", None)
+    if not name:
+        callback = getattr(handler, "callback", None)
+        name = f"{type(handler).__name__}:{getattr(callback, '__qualname__', '?')}"
+        try:
+            handler.owner = name
+        except AttributeError:
+            pass
+    return name
@@ -125,6 +125,7 @@ class Monitor:
     debug_no_log = False  # 调试模式不显示冗余日志
     allow_caption: bool = True  # 是否允许带照片的消息
     allow_text: bool = True  # 是否允许不带照片的消息
+    priority: bool = False  # 时间敏感的监控, 相关会话的更新将优先处理
     init_first: bool = False  # 先执行自定义初始化函数, 再进行加入群组分析
 
     def __init__(
@@ -177,8 +178,12 @@ class Monitor:
         group = await self.group_pool.append(self)
         handlers = self.get_handlers()
         for h in handlers:
+            h.priority = self.priority
+            h.owner = self.name
             await self.client.add_handler(h, group=group)
+        self.client.keyword_index.add(self)
         yield
+        self.client.keyword_index.remove(self)
         for h in handlers:
             try:
                 await self.client.remove_handler(h, group=group)
@@ -300,6 +305,9 @@ class Monitor:
         ):
             return
         text = message.text or message.caption
+        index = getattr(getattr(self, "client", None), "keyword_index", None)
+        if text and index and not index.may_match(self, text):
+            return
         if text and self.chat_except_keyword:
             for k in to_iterable(self.chat_except_keyword):
                 if re.search(k, text, re.IGNORECASE):
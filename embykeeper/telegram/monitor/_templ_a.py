@@ -63,6 +63,8 @@ class TemplateAMonitor(Monitor):
         self.trigger_max_time = self.t_config.trigger_max_time
         self.allow_caption = self.t_config.allow_caption
         self.allow_text = self.t_config.allow_text
+        # 仅在指定了会话时提升优先级, 否则处理器将匹配所有更新, 使全部更新进入高优先级通道
+        self.priority = bool(self.t_config.try_register_bot and self.chat_name)
         if (not self.chat_keyword) and (not self.chat_user) and (not self.chat_name):
             self.log.warning(f"初始化失败: 没有定义任何监控项, 请参考教程进行配置.")
             return False
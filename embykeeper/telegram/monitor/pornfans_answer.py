@@ -13,7 +13,6 @@ from ..link import Link
 from ..lock import pornfans_alert
 from . import Monitor
 
-
 QA_CACHE_KEY = "monitor.pornfans.answer.qa"
 
 
@@ -36,6 +35,7 @@ class _PornfansAnswerAnswerMonitor(Monitor):
     name = "PornFans 问题回答"
     history_chat_name = ["embytestflight", "PornFans_Chat"]
     chat_user = ["Porn_Emby_Bot", "Porn_emby_ScriptsBot"]
+    priority = True
     chat_except_keyword = "猜猜是什么番号"
     chat_keyword = r"问题\d*：(.*?)(\(.*第\d+题.*\))\n+(A:.*\n+B:.*\n+C:.*\n+D:.*)\n(?!\n*答案)"
     additional_auth = ["pornemby_pack"]
@@ -55,7 +55,7 @@ class _PornfansAnswerAnswerMonitor(Monitor):
 
     async def update_cache(self, to_date=None):
         if not to_date:
-            to_date = datetime.fromtimestamp(cache.get(f"{QA_CACHE_KEY}.timestamp", 0))
+            to_date = datetime.fromtimestamp(await cache.aget(f"{QA_CACHE_KEY}.timestamp", 0))
 
         if not to_date:
             self.log.info("首次使用 PornFans 问题回答, 正在缓存问题答案历史.")
@@ -68,6 +68,7 @@ class _PornfansAnswerAnswerMonitor(Monitor):
         finished = False
         while not finished:
             finished = True
+            entries = {}
             m: Message
             for g in to_iterable(self.history_chat_name):
                 async for m in self.client.search_messages(g, limit=100, offset=count, query="答案为"):
@@ -78,12 +79,13 @@ class _PornfansAnswerAnswerMonitor(Monitor):
                     if m.text:
                         for key in _PornfansAnswerResultMonitor.keys(_PornfansAnswerResultMonitor, m):
                             qs += 1
-                            cache.set(f"{QA_CACHE_KEY}.data.{key[0]}", key[5])
+                            entries[f"{QA_CACHE_KEY}.data.{key[0]}"] = key[5]
+            await cache.aset_many(entries)
             if count and (finished or count % 500 == 0):
                 self.log.info(f"读取问题答案历史: 已读取 {qs} 问题 / {count} 信息.")
                 await asyncio.sleep(2)
         self.log.debug(f"已向问题答案历史缓存写入 {qs} 条问题.")
-        cache.set(f"{QA_CACHE_KEY}.timestamp", datetime.now().timestamp())
+        await cache.aset(f"{QA_CACHE_KEY}.timestamp", datetime.now().timestamp())
 
     async def update(self):
         try:
@@ -118,7 +120,7 @@ class _PornfansAnswerAnswerMonitor(Monitor):
         if random.random() > self.config.get("possibility", 1.0):
             self.log.info(f"由于概率设置不作答: {spec}.")
             return
-        result = cache.get(f"{QA_CACHE_KEY}.data.{key[0]}")
+        result = await cache.aget(f"{QA_CACHE_KEY}.data.{key[0]}")
         if result:
             self.log.info(f"从缓存回答问题为{result}: {spec}.")
         elif self.config.get("only_history", False):
@@ -130,7 +132,9 @@ class _PornfansAnswerAnswerMonitor(Monitor):
             question = re.sub(r"\([^\)]*From资料库:第\d+题\)", "", question)
             for _ in range(3):
                 self.log.debug(f"未从历史缓存找到问题, 开始请求云端问题回答: {spec}.")
-                result, by = await Link(self.client).pornemby_answer(question + "\n" + choices)
+                result, by = await Link(self.client).pornemby_answer(
+                    question + "\n" + choices, validate=lambda a: a in self.key_map
+                )
                 if result:
                     self.log.info(f"请求 {by or '云端'} 问题回答为 {result}: {spec}.")
                     break
@@ -18,6 +18,7 @@ class PornfansDragonRainMonitor:
         additional_auth = ["pornemby_pack"]
         allow_edit = True
         debug_no_log = True
+        priority = True
 
         async def on_trigger(self, message: Message, key, reply):
             if pornfans_alert.get(self.client.me.id, False):
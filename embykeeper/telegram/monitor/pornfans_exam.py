@@ -31,6 +31,7 @@ class _PornfansExamResultMonitor(Monitor):
 class _PornfansExamAnswerMonitor(Monitor):
     name = "PornFans 科举"
     chat_user = ["Porn_Emby_Bot", "Porn_emby_ScriptsBot"]
+    priority = True
     chat_keyword = (
         r"问题\d*：根据以上封面图，猜猜是什么番号？\n+A:(.*)\n+B:(.*)\n+C:(.*)\n+D:(.*)\n(?!\n*答案)"
     )
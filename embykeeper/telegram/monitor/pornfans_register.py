@@ -11,6 +11,7 @@ class PornfansRegisterMonitor(Monitor):
     name = "PornFans 抢注"
     chat_name = ["embytestflight", "PornFans_Chat"]
     chat_user = "Porn_Emby_Bot"
+    priority = True
     chat_keyword = "开 放 注 册"
     additional_auth = ["pornemby_pack"]
 
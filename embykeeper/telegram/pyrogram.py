@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import base64
-from collections import OrderedDict
+from bisect import insort
+from collections import OrderedDict, deque
 from contextlib import asynccontextmanager
 from datetime import datetime
 import asyncio
@@ -10,7 +11,8 @@ import os
 from pathlib import Path
 import sqlite3
 import struct
-from typing import List, Union
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import logging
 
 from rich.prompt import Prompt
@@ -45,8 +47,13 @@ from pyrogram.storage.file_storage import USERNAMES_SCHEMA, UPDATE_STATE_SCHEMA
 from pyrogram.handlers.handler import Handler
 
 from embykeeper import var, __name__ as __product__, __version__
+from embykeeper.cache import cache
+from embykeeper.config import config
 from embykeeper.utils import async_partial, show_exception
 
+from .keywords import KeywordIndex
+from .metrics import metrics, handler_name
+
 var.tele_used.set()
 
 logger = logger.bind(scheme="telegram", nonotify=True)
@@ -72,28 +79,433 @@ for h in pyrogram_session_logger.handlers[:]:
 pyrogram_session_logger.addHandler(LogRedirector())
 
 
+def route_keys(flt) -> Optional[Tuple[Tuple[str, Union[int, str]], ...]]:
+    """
+    从处理器的过滤器中提取路由键, 无法确定时返回 None.
+    仅当过滤器以 "与" 的形式包含会话或用户过滤器时, 才能确定处理器只处理这些会话或用户的更新.
+    """
+    if isinstance(flt, filters.AndFilter):
+        return route_keys(flt.base) or route_keys(flt.other)
+    for kind, cls in (("chat", filters.chat), ("user", filters.user)):
+        if isinstance(flt, cls) and flt and "me" not in flt:
+            return tuple((kind, k) for k in flt)
+    return None
+
+
+def raw_update_keys(update, users: dict, chats: dict) -> List[Tuple[str, Union[int, str]]]:
+    """在解析前从原始更新中获取路由键, 用于在放入队列时判断更新所属的通道."""
+    message = getattr(update, "message", None)
+    peer = getattr(message, "peer_id", None)
+    if peer is None:
+        return []
+    keys = []
+    sender = getattr(message, "from_id", None) or (peer if isinstance(peer, raw.types.PeerUser) else None)
+    for kind, p in (("chat", peer), ("user", sender)):
+        if p is None:
+            continue
+        try:
+            raw_id = utils.get_raw_peer_id(p)
+            keys.append((kind, utils.get_peer_id(p)))
+        except Exception:
+            continue
+        entity = (users if isinstance(p, raw.types.PeerUser) else chats).get(raw_id)
+        username = getattr(entity, "username", None)
+        if username:
+            keys.append((kind, username.lower()))
+    return keys
+
+
+def update_keys(update) -> List[Tuple[str, Union[int, str]]]:
+    """获取更新对应的路由键, 与 filters.chat 及 filters.user 的判断方式一致."""
+    keys = []
+    for kind, attr in (("chat", "chat"), ("user", "from_user")):
+        peer = getattr(update, attr, None)
+        if peer:
+            keys.append((kind, peer.id))
+            if peer.username:
+                keys.append((kind, peer.username.lower()))
+    return keys
+
+
+class RouteTable:
+    """
+    按会话 / 用户编号索引的处理器路由表.
+    路由表不可变, 增删处理器时生成新表 (写时复制), 因此处理更新时无需加锁.
+    每个条目为 (组, 序号, 处理器), 各列表均按组和序号排序.
+    设置了 priority 属性的处理器所对应的路由键另行计数, 用于将相关更新放入高优先级通道.
+    """
+
+    __slots__ = ("entries", "catchall", "index", "priority", "priority_all")
+
+    def __init__(
+        self,
+        entries: Tuple[tuple, ...] = (),
+        catchall: Tuple[tuple, ...] = (),
+        index: Dict[tuple, Tuple[tuple, ...]] = None,
+        priority: Dict[tuple, int] = None,
+        priority_all: int = 0,
+    ):
+        self.entries = entries
+        self.catchall = catchall
+        self.index = index or {}
+        self.priority = priority or {}
+        self.priority_all = priority_all
+
+    @staticmethod
+    def _keys(handler: Handler):
+        if isinstance(handler, RawUpdateHandler):
+            return None
+        return route_keys(getattr(handler, "filters", None))
+
+    @staticmethod
+    def _insert(bucket: Tuple[tuple, ...], entry: tuple):
+        bucket = list(bucket)
+        insort(bucket, entry)  # 序号唯一, 比较不会涉及处理器本身
+        return tuple(bucket)
+
+    def add(self, entry: tuple):
+        keys = self._keys(entry[2])
+        catchall = self.catchall
+        index = self.index
+        if keys is None:
+            catchall = self._insert(catchall, entry)
+        else:
+            index = dict(index)
+            for k in keys:
+                index[k] = self._insert(index.get(k, ()), entry)
+        priority, priority_all = self._count_priority(entry[2], keys, 1)
+        return RouteTable(self._insert(self.entries, entry), catchall, index, priority, priority_all)
+
+    def remove(self, handler: Handler):
+        entries = tuple(e for e in self.entries if e[2] is not handler)
+        keys = self._keys(handler)
+        catchall = self.catchall
+        index = self.index
+        if keys is None:
+            catchall = tuple(e for e in catchall if e[2] is not handler)
+        else:
+            index = dict(index)
+            for k in keys:
+                bucket = tuple(e for e in index.get(k, ()) if e[2] is not handler)
+                if bucket:
+                    index[k] = bucket
+                else:
+                    index.pop(k, None)
+        priority, priority_all = self._count_priority(handler, keys, -1)
+        return RouteTable(entries, catchall, index, priority, priority_all)
+
+    def _count_priority(self, handler: Handler, keys, delta: int):
+        if not getattr(handler, "priority", False):
+            return self.priority, self.priority_all
+        if keys is None:
+            return self.priority, self.priority_all + delta
+        priority = dict(self.priority)
+        for k in keys:
+            count = priority.get(k, 0) + delta
+            if count > 0:
+                priority[k] = count
+            else:
+                priority.pop(k, None)
+        return priority, self.priority_all
+
+    def is_priority(self, packet) -> bool:
+        """判断原始更新是否应放入高优先级通道."""
+        if self.priority_all:
+            return True
+        if not self.priority or not packet:
+            return False
+        return any(k in self.priority for k in raw_update_keys(*packet))
+
+    def route(self, update) -> Tuple[tuple, ...]:
+        """返回可能处理该更新的处理器条目, 按组和序号排序."""
+        buckets = [b for b in (self.index.get(k) for k in update_keys(update)) if b]
+        if not buckets:
+            return self.catchall
+        if not self.catchall and len(buckets) == 1:
+            return buckets[0]
+        merged = {e[1]: e for b in buckets for e in b}
+        merged.update((e[1], e) for e in self.catchall)
+        return tuple(sorted(merged.values(), key=lambda e: e[:2]))
+
+
+def chat_key(update) -> Optional[int]:
+    """从原始更新中获取会话编号, 用于保证同一会话内的更新按顺序处理."""
+    peer = getattr(getattr(update, "message", None), "peer_id", None)
+    if peer is None:
+        return None
+    try:
+        return utils.get_raw_peer_id(peer)
+    except Exception:
+        return None
+
+
+class LaneStats:
+    """更新在队列中的等待时间统计."""
+
+    __slots__ = ("count", "total", "max", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = 0.0  # 指数移动平均
+
+    def add(self, wait: float):
+        self.count += 1
+        self.total += wait
+        self.max = max(self.max, wait)
+        self.recent = wait if self.count == 1 else self.recent * 0.9 + wait * 0.1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class Lanes:
+    """高优先级与普通两个通道, 取出时高优先级通道优先."""
+
+    __slots__ = ("high", "normal")
+
+    def __init__(self):
+        self.high = deque()
+        self.normal = deque()
+
+    def __len__(self):
+        return len(self.high) + len(self.normal)
+
+
+class LaneQueue(asyncio.Queue):
+    """按处理器优先级分通道的更新队列, 并统计各通道的等待时间."""
+
+    def __init__(self, dispatcher: Dispatcher):
+        super().__init__()
+        self.dispatcher = dispatcher
+        self.stats: Dict[str, LaneStats] = {"high": LaneStats(), "normal": LaneStats()}
+
+    def _init(self, maxsize):
+        self._queue = Lanes()
+
+    def _put(self, item):
+        lane = self._queue.high if self.dispatcher.routes.is_priority(item) else self._queue.normal
+        lane.append((time.perf_counter(), item))
+
+    def _get(self):
+        if self._queue.high:
+            lane, stats = self._queue.high, self.stats["high"]
+        else:
+            lane, stats = self._queue.normal, self.stats["normal"]
+        enqueued, item = lane.popleft()
+        stats.add(time.perf_counter() - enqueued)
+        return item
+
+    def has_priority(self):
+        return bool(self._queue.high)
+
+
+class PooledQueue(LaneQueue):
+    """放入更新时通知共享工作池的更新队列."""
+
+    def __init__(self, dispatcher: Dispatcher, pool: WorkerPool):
+        super().__init__(dispatcher)
+        self.pool = pool
+
+    def _put(self, item):
+        super()._put(item)
+        self.pool.notify(self.dispatcher, self.has_priority())
+
+
+class WorkerPool:
+    """
+    进程级别的共享更新处理工作池.
+    以轮询方式处理各客户端的更新队列, 根据积压的更新数在最小和最大工作数之间自动伸缩,
+    同一客户端同一会话的更新按接收顺序依次开始处理: 前一更新进入回调函数后即处理下一更新,
+    以免回调函数等待同一会话的后续消息时阻塞.
+    """
+
+    def __init__(self, min_workers: int = 4, max_workers: int = 64, idle_timeout: float = 60):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.idle_timeout = idle_timeout
+        self.dispatchers: Dict[Dispatcher, None] = {}
+        self.workers: Dict[asyncio.Task, None] = {}
+        self.idle = 0
+        self._tokens: asyncio.Queue = None  # 每个待处理的更新对应一个令牌
+        self._ready: deque = deque()  # 有待处理更新的分配器, 轮询处理
+        self._ready_high: deque = deque()  # 有高优先级更新的分配器, 优先轮询处理
+        self._busy: Dict[tuple, deque] = {}  # 正在处理的会话及其后续更新
+        self._resumed: deque = deque()  # 前一更新已进入回调函数, 可以开始处理的会话后续更新
+
+    def register(self, dispatcher: Dispatcher):
+        if not self.dispatchers:
+            self.min_workers = config.telegram.shared_workers_min
+            self.max_workers = max(config.telegram.shared_workers_max, self.min_workers)
+            self._tokens = asyncio.Queue()
+        self.dispatchers[dispatcher] = None
+        while len(self.workers) < self.min_workers:
+            self._spawn()
+        for _ in range(dispatcher.updates_queue.qsize()):
+            self.notify(dispatcher)
+
+    async def unregister(self, dispatcher: Dispatcher):
+        self.dispatchers.pop(dispatcher, None)
+        for ready in (self._ready, self._ready_high):
+            try:
+                ready.remove(dispatcher)
+            except ValueError:
+                pass
+        if not self.dispatchers:
+            workers = [t for t in self.workers if t is not asyncio.current_task()]
+            for t in workers:
+                t.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._busy.clear()
+            self._resumed.clear()
+        else:
+            for key in [k for k in self._busy if k[0] == id(dispatcher)]:
+                del self._busy[key]
+            self._resumed = deque(r for r in self._resumed if r[0] is not dispatcher)
+
+    def notify(self, dispatcher: Dispatcher, high: bool = False):
+        if dispatcher not in self.dispatchers:
+            return
+        if dispatcher not in self._ready:
+            self._ready.append(dispatcher)
+        if high and dispatcher not in self._ready_high:
+            self._ready_high.append(dispatcher)
+        self._wake()
+
+    def _wake(self):
+        self._tokens.put_nowait(None)
+        if self._tokens.qsize() > self.idle and len(self.workers) < self.max_workers:
+            self._spawn()
+
+    def stats(self):
+        """返回 (待处理更新数, 正在处理的工作数, 工作数)."""
+        pending = sum(d.updates_queue.qsize() for d in self.dispatchers)
+        pending += sum(len(q) for q in self._busy.values()) + len(self._resumed)
+        return pending, len(self.workers) - self.idle, len(self.workers)
+
+    def _spawn(self):
+        task = asyncio.create_task(self._worker())
+        self.workers[task] = None
+        # 新建的工作在开始等待前即视为空闲, 避免突发更新时重复创建
+        self.idle += 1
+
+    def _next(self):
+        """返回 (分配器, 更新, 是否为已占用会话的后续更新)."""
+        if self._resumed:
+            return (*self._resumed.popleft(), True)
+        while self._ready_high:
+            dispatcher: Dispatcher = self._ready_high.popleft()
+            queue: LaneQueue = dispatcher.updates_queue
+            if not queue.has_priority():
+                continue
+            packet = queue.get_nowait()
+            if queue.has_priority():
+                self._ready_high.append(dispatcher)
+            return dispatcher, packet, False
+        while self._ready:
+            dispatcher: Dispatcher = self._ready.popleft()
+            queue = dispatcher.updates_queue
+            if queue.empty():
+                continue
+            packet = queue.get_nowait()
+            if not queue.empty():
+                self._ready.append(dispatcher)
+            return dispatcher, packet, False
+        return None, None, False
+
+    async def _worker(self):
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._tokens.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if len(self.workers) > self.min_workers or not self.dispatchers:
+                        break
+                    continue
+                dispatcher, packet, resumed = self._next()
+                if packet is None:
+                    continue
+                self.idle -= 1
+                try:
+                    await self._run(dispatcher, packet, resumed)
+                finally:
+                    self.idle += 1
+        finally:
+            self.workers.pop(asyncio.current_task(), None)
+            self.idle -= 1
+
+    async def _run(self, dispatcher: Dispatcher, packet, resumed: bool = False):
+        chat = chat_key(packet[0])
+        if chat is None:
+            return await dispatcher.process(packet)
+        key = (id(dispatcher), chat)
+        if not resumed:
+            if key in self._busy:
+                self._busy[key].append(packet)
+                return
+            self._busy[key] = deque()
+        released = False
+
+        def release():
+            # 进入回调函数或处理结束时, 将会话交给下一个更新
+            nonlocal released
+            if released:
+                return
+            released = True
+            backlog = self._busy.get(key)
+            if backlog:
+                self._resumed.append((dispatcher, backlog.popleft()))
+                self._wake()
+            else:
+                self._busy.pop(key, None)
+
+        try:
+            await dispatcher.process(packet, on_dispatch=release)
+        finally:
+            release()
+
+
+worker_pool = WorkerPool()
+
+
 class Dispatcher(dispatcher.Dispatcher):
     updates_count = 0
 
     def __init__(self, client: Client):
         super().__init__(client)
         self.mutex = asyncio.Lock()
+        self.routes = RouteTable()
+        self.active = 0  # 正在处理的更新数
+        self._seq = 0
+        self.pool = worker_pool if config.telegram.shared_workers else None
+        if self.pool:
+            self.updates_queue = PooledQueue(self, self.pool)
+        else:
+            self.updates_queue = LaneQueue(self)
 
     async def start(self):
         logger.debug("Telegram 更新分配器启动.")
         if not self.client.no_updates:
 
             self.handler_worker_tasks = []
-            for _ in range(self.client.workers):
-                self.handler_worker_tasks.append(self.client.loop.create_task(self.handler_worker()))
+            if self.pool:
+                self.pool.register(self)
+            else:
+                for _ in range(self.client.workers):
+                    self.handler_worker_tasks.append(self.client.loop.create_task(self.handler_worker()))
 
             if not self.client.skip_updates:
                 await self.client.recover_gaps()
 
     async def stop(self, clear: bool = True):
         if not self.client.no_updates:
-            for i in range(self.client.workers):
-                self.updates_queue.put_nowait(None)
+            if self.pool:
+                await self.pool.unregister(self)
+            else:
+                for i in range(self.client.workers):
+                    self.updates_queue.put_nowait(None)
             for i in self.handler_worker_tasks:
                 i.cancel()
                 try:
@@ -103,6 +515,7 @@ class Dispatcher(dispatcher.Dispatcher):
             if clear:
                 self.handler_worker_tasks.clear()
                 self.groups.clear()
+                self.routes = RouteTable()
 
     def add_handler(self, handler, group: int):
         async def fn():
@@ -111,6 +524,8 @@ class Dispatcher(dispatcher.Dispatcher):
                     self.groups[group] = []
                     self.groups = OrderedDict(sorted(self.groups.items()))
                 self.groups[group].append(handler)
+                self._seq += 1
+                self.routes = self.routes.add((group, self._seq, handler))
                 # logger.debug(f"增加了 Telegram 更新处理器: {handler.__class__.__name__}.")
 
         return self.client.loop.create_task(fn())
@@ -121,6 +536,7 @@ class Dispatcher(dispatcher.Dispatcher):
                 if group not in self.groups:
                     raise ValueError(f"Group {group} does not exist. Handler was not removed.")
                 self.groups[group].remove(handler)
+                self.routes = self.routes.remove(handler)
                 # logger.debug(f"移除了 Telegram 更新处理器: {handler.__class__.__name__}.")
 
         return self.client.loop.create_task(fn())
@@ -128,70 +544,86 @@ class Dispatcher(dispatcher.Dispatcher):
     async def handler_worker(self):
         while True:
             packet = await self.updates_queue.get()
-            Dispatcher.updates_count += 1
 
             if packet is None:
                 break
 
+            await self.process(packet)
+
+    async def process(self, packet, on_dispatch: Callable[[], None] = None):
+        """处理一个更新, 调用回调函数前调用 on_dispatch."""
+        Dispatcher.updates_count += 1
+        self.active += 1
+        try:
+            update, users, chats = packet
+            parser = self.update_parsers.get(type(update), None)
+
             try:
-                update, users, chats = packet
-                parser = self.update_parsers.get(type(update), None)
+                parsed_update, handler_type = (
+                    await parser(update, users, chats) if parser is not None else (None, type(None))
+                )
+            except (ValueError, BadRequest):
+                return
 
-                try:
-                    parsed_update, handler_type = (
-                        await parser(update, users, chats) if parser is not None else (None, type(None))
-                    )
-                except (ValueError, BadRequest):
+            # 路由表为不可变对象, 直接读取当前引用即可
+            for _, _, handler in self.routes.route(parsed_update):
+                args = None
+                stats = None
+
+                if isinstance(handler, handler_type):
+                    stats = metrics.get(handler_name(handler))
+                    stats.checks += 1
+                    try:
+                        if await handler.check(self.client, parsed_update):
+                            args = (parsed_update,)
+                    except Exception as e:
+                        stats.errors += 1
+                        logger.warning(f"Telegram 错误: {e}")
+                        continue
+
+                elif isinstance(handler, RawUpdateHandler):
+                    stats = metrics.get(handler_name(handler))
+                    stats.checks += 1
+                    try:
+                        if await handler.check(self.client, update):
+                            args = (update, users, chats)
+                    except Exception as e:
+                        stats.errors += 1
+                        logger.debug(f"更新回调函数内发生错误.")
+                        show_exception(e, regular=False)
+                if args is None:
                     continue
 
-                async with self.mutex:
-                    groups = {i: g[:] for i, g in self.groups.items()}
-
-                for group in groups.values():
-                    for handler in group:
-                        args = None
-
-                        if isinstance(handler, handler_type):
-                            try:
-                                if await handler.check(self.client, parsed_update):
-                                    args = (parsed_update,)
-                            except Exception as e:
-                                logger.warning(f"Telegram 错误: {e}")
-                                continue
-
-                        elif isinstance(handler, RawUpdateHandler):
-                            try:
-                                if await handler.check(self.client, update):
-                                    args = (update, users, chats)
-                            except Exception as e:
-                                logger.debug(f"更新回调函数内发生错误.")
-                                show_exception(e, regular=False)
-                        if args is None:
-                            continue
-
-                        try:
-                            if inspect.iscoroutinefunction(handler.callback):
-                                await handler.callback(self.client, *args)
-                            else:
-                                await self.client.loop.run_in_executor(
-                                    self.client.executor, handler.callback, self.client, *args
-                                )
-                        except pyrogram.StopPropagation:
-                            raise
-                        except pyrogram.ContinuePropagation:
-                            continue
-                        except Exception as e:
-                            logger.error(f"更新回调函数内发生错误.")
-                            show_exception(e, regular=False)
-                        break
+                stats.matches += 1
+                if on_dispatch:
+                    on_dispatch()
+                    on_dispatch = None
+                start = time.perf_counter()
+                try:
+                    if inspect.iscoroutinefunction(handler.callback):
+                        await handler.callback(self.client, *args)
                     else:
-                        continue
-                    break
-            except pyrogram.StopPropagation:
-                pass
-            except Exception as e:
-                logger.warning("更新控制器错误.")
-                show_exception(e, regular=False)
+                        await self.client.loop.run_in_executor(
+                            self.client.executor, handler.callback, self.client, *args
+                        )
+                except pyrogram.StopPropagation:
+                    raise
+                except pyrogram.ContinuePropagation:
+                    continue
+                except Exception as e:
+                    stats.errors += 1
+                    logger.error(f"更新回调函数内发生错误.")
+                    show_exception(e, regular=False)
+                finally:
+                    stats.observe(time.perf_counter() - start)
+                break
+        except pyrogram.StopPropagation:
+            pass
+        except Exception as e:
+            logger.warning("更新控制器错误.")
+            show_exception(e, regular=False)
+        finally:
+            self.active -= 1
 
 
 class FileStorage(SQLiteStorage):
@@ -202,6 +634,8 @@ class FileStorage(SQLiteStorage):
 
         self.database = workdir / (self.name + self.FILE_EXTENSION)
         self.session_string = session_string
+        self.wal = config.telegram.session_wal
+        self._maintain_task: asyncio.Task = None
 
     def update(self):
         version = self.version()
@@ -239,10 +673,64 @@ class FileStorage(SQLiteStorage):
         self.version(version)
 
     async def open(self):
+        start = time.perf_counter()
+        await self._open()
+        if self.wal:
+            self.maintain()
+            # 长时间运行时定期检查是否需要整理
+            self._maintain_task = asyncio.create_task(self._maintain_loop())
+        else:
+            with self.conn:
+                self.conn.execute("VACUUM")
+        elapsed = time.perf_counter() - start
+        peers = self.conn.execute("SELECT COUNT(*) FROM peers").fetchone()[0]
+        logger.debug(f'会话文件 "{self.name}" 已打开 ({peers} 个对话), 用时 {elapsed:.2f} 秒.')
+
+    async def close(self):
+        if self._maintain_task:
+            self._maintain_task.cancel()
+            self._maintain_task = None
+        await super().close()
+
+    async def _maintain_loop(self, check_interval: int = 3600):
+        while True:
+            await asyncio.sleep(check_interval)
+            try:
+                self.maintain()
+            except sqlite3.Error as e:
+                logger.debug(f'整理会话文件 "{self.name}" 时发生错误: {e}')
+
+    def maintain(self, force: bool = False):
+        """
+        整理会话文件 (VACUUM / ANALYZE).
+        仅在空闲页比例过高或距离上次整理超过设定天数时执行.
+        Args:
+            force: 无视条件立即整理
+        """
+        key = f"telegram.session.maintenance.{self.name}"
+        pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        ratio = free / pages if pages else 0
+        interval = config.telegram.session_maintenance_interval * 86400
+        last = cache.get(key, None)
+        if not force and ratio <= config.telegram.session_vacuum_ratio:
+            if not interval or (last and time.time() - last < interval):
+                return False
+        logger.debug(f'正在整理会话文件 "{self.name}" (空闲页比例 {ratio:.0%}).')
+        self.conn.execute("VACUUM")
+        self.conn.execute("ANALYZE")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cache.set(key, time.time())
+        return True
+
+    async def _open(self):
         path = self.database
         file_exists = path.is_file()
 
         self.conn = sqlite3.connect(str(path), timeout=1, check_same_thread=False)
+        if self.wal:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
 
         if not file_exists:
             self.create()
@@ -285,17 +773,19 @@ class FileStorage(SQLiteStorage):
         else:
             self.update()
 
-        with self.conn:
-            self.conn.execute("VACUUM")
-
     async def delete(self):
         os.remove(self.database)
+        for suffix in ("-wal", "-shm"):
+            wal = self.database.with_name(self.database.name + suffix)
+            if wal.is_file():
+                os.remove(wal)
 
 
 class Client(pyrogram.Client):
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
         self.dispatcher = Dispatcher(self)
+        self.keyword_index = KeywordIndex()
         self.stop_handlers = []
         if self.in_memory:
             self.storage = MemoryStorage(self.name, self.session_string)
@@ -402,6 +892,7 @@ class Client(pyrogram.Client):
         if filter:
             f = f & filter
         handler = MessageHandler(async_partial(handler_func, future=future), f)
+        handler.owner = "catch_reply"
         await self.add_handler(handler, group=0)
         try:
             yield future
@@ -427,6 +918,7 @@ class Client(pyrogram.Client):
         if filter:
             f = f & filter
         handler = EditedMessageHandler(async_partial(handler_func, future=future), f)
+        handler.owner = "catch_edit"
         await self.add_handler(handler, group=0)
         try:
             yield future
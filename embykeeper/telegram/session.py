@@ -8,7 +8,8 @@ import glob
 import sqlite3
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import os
 import random
 
@@ -38,10 +39,99 @@ API_ID = _decode(_id)
 API_HASH = _decode(_hash)
 
 
+class LoginOrchestrator:
+    """Telegram 账号登录调度器.
+
+    限制同时登录的账号总数, 以及位于同一数据中心的账号数 (避免触发服务器限制), 同一代理的网络检测结果在多个会话间复用,
+    并在一批登录全部完成时汇报进度和耗时. 需要交互式登录的账号将逐个进行.
+    """
+
+    # 网络检测结果的有效期 (秒)
+    network_ttl = 300
+
+    def __init__(self, concurrency: int = 8, concurrency_per_dc: int = 4):
+        """
+        Args:
+            concurrency: 同时登录的账号数上限
+            concurrency_per_dc: 同一数据中心同时登录的账号数上限
+        """
+        self.concurrency = concurrency
+        self.concurrency_per_dc = concurrency_per_dc
+        self._sem = asyncio.Semaphore(concurrency)
+        self._dc_sems: Dict[int, asyncio.Semaphore] = {}
+        self._interactive = asyncio.Lock()
+        self._network: Dict[str, Tuple[float, asyncio.Task]] = {}
+        self._time_checked = False
+
+        self.total = 0
+        self.finished = 0
+        self.failed = 0
+        self.pending = 0
+        self.started: float = None
+
+    @staticmethod
+    def get_dc(session_str: str) -> Optional[int]:
+        """从 Pyrogram 会话字符串中读取数据中心编号"""
+        if not session_str:
+            return None
+        try:
+            return base64.urlsafe_b64decode(session_str + "=" * (-len(session_str) % 4))[0]
+        except (binascii.Error, IndexError):
+            return None
+
+    async def test_network(self, session: "ClientsSession"):
+        """检测网络状态, 同一代理的结果在有效期内复用"""
+        if not self._time_checked:
+            self._time_checked = True
+            asyncio.create_task(session.test_time())
+        proxy_str = get_proxy_str(session.proxy) or ""
+        checked, task = self._network.get(proxy_str, (None, None))
+        if not task or (task.done() and time.monotonic() - checked > self.network_ttl):
+            task = asyncio.create_task(session.test_network())
+            self._network[proxy_str] = (time.monotonic(), task)
+        return await asyncio.shield(task)
+
+    async def run(self, account: TelegramAccount, login: Callable[[], Awaitable]):
+        """在并发限制下执行登录, 并记录进度"""
+        if not self.pending:
+            self.started = time.perf_counter()
+            self.total = self.finished = self.failed = 0
+        self.total += 1
+        self.pending += 1
+
+        session_str = account.session or cache.get(f"telegram.session_str.{account.get_config_key()}")
+        # 没有登录凭据的账号需要交互式输入验证码, 逐个进行
+        dc = self.get_dc(session_str)
+        if dc:
+            limiter = self._dc_sems.setdefault(dc, asyncio.Semaphore(self.concurrency_per_dc))
+        else:
+            limiter = self._interactive
+        client = None
+        try:
+            async with self._sem, limiter:
+                client = await login()
+            return client
+        finally:
+            self.pending -= 1
+            self.finished += 1
+            if not client:
+                self.failed += 1
+            logger.debug(f"Telegram 账号登录进度: {self.finished} / {self.total}.")
+            if not self.pending and self.total > 1:
+                spent = time.perf_counter() - self.started
+                spec = f", {self.failed} 个失败" if self.failed else ""
+                logger.info(f"已完成 {self.total} 个 Telegram 账号的登录{spec}, 用时 {spent:.1f} 秒.")
+
+    def progress(self):
+        """当前批次的登录进度: (已完成, 总数, 失败)"""
+        return self.finished, self.total, self.failed
+
+
 class ClientsSession:
     pool = {}
     lock = asyncio.Lock()
     watch = None
+    orchestrator: LoginOrchestrator = None
 
     @classmethod
     async def watchdog(cls, timeout=120):
@@ -119,6 +209,11 @@ class ClientsSession:
         if not self.watch:
             self.__class__.watch = asyncio.create_task(self.watchdog())
             var.exit_handlers.append(self.__class__.shutdown)
+        if not self.orchestrator:
+            self.__class__.orchestrator = LoginOrchestrator(
+                concurrency=config.telegram.login_concurrency,
+                concurrency_per_dc=config.telegram.login_concurrency_per_dc,
+            )
 
     @property
     def basedir(self):
@@ -413,7 +508,7 @@ class ClientsSession:
             return None
 
     async def loginer(self, account: TelegramAccount):
-        client = await self.login(account)
+        client = await self.orchestrator.run(account, lambda: self.login(account))
         async with self.lock:
             if isinstance(client, Client) and client.me:
                 self.pool[account.phone] = (client, 1)
@@ -426,8 +521,7 @@ class ClientsSession:
                 await self.done.put((account, None))
 
     async def __aenter__(self):
-        await self.test_network()
-        asyncio.create_task(self.test_time())
+        await self.orchestrator.test_network(self)
         for a in self.accounts:
             try:
                 await self.lock.acquire()
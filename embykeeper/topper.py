@@ -39,11 +39,11 @@ async def topper():
                 else:
                     idle += 1
                 # 获取队列和任务统计
-                if hasattr(client, "dispatcher"):
+                if hasattr(client, "dispatcher") and not getattr(client.dispatcher, "pool", None):
                     try:
                         qsize = client.dispatcher.updates_queue.qsize()
                         tasks = client.dispatcher.handler_worker_tasks
-                        active = sum(1 for t in tasks if t.get_coro().cr_await.__name__ != "get")
+                        active = client.dispatcher.active
                         if qsize > 0 or active > 0:
                             # 当队列超过10或handler使用率超过80%时显示红色
                             if qsize >= 10 or (active / len(tasks) >= 0.8):
@@ -53,9 +53,30 @@ async def topper():
                     except:
                         queue_stats.append("[Error]")
 
+        from .telegram.pyrogram import worker_pool
+
+        if worker_pool.workers:
+            qsize, active, total = worker_pool.stats()
+            if qsize >= 10 or (active / total >= 0.8):
+                queue_stats.append(f"[red][{qsize}:{active}/{total}][/red]")
+            else:
+                queue_stats.append(f"[{qsize}:{active}/{total}]")
+
         queue_text = f" Queue: {' '.join(queue_stats)}" if queue_stats else ""
         return failed, pending, using, idle, queue_text
 
+    def get_lane_stats(pool: Dict[str, Tuple[Union[Client, Task], int]]):
+        """返回高优先级通道近期等待时间最长的客户端的通道统计."""
+        lanes = []
+        for v in pool.values():
+            if not v or isinstance(v, Task):
+                continue
+            queue = getattr(getattr(v[0], "dispatcher", None), "updates_queue", None)
+            stats = getattr(queue, "stats", None)
+            if stats and stats["high"].count:
+                lanes.append(stats)
+        return max(lanes, key=lambda s: s["high"].recent, default=None)
+
     def get_ocr_stats():
         """获取OCR子进程状态"""
         children = process.children()
@@ -85,6 +106,7 @@ async def topper():
         # Client状态
         if tele_used:
             from .telegram.pyrogram import Dispatcher
+            from .telegram.metrics import metrics
             from .telegram.link import Link
 
             failed, pending, using, idle, queue_text = get_client_stats(ClientsSession.pool)
@@ -102,10 +124,35 @@ async def topper():
 
             if Link.post_count > 0:
                 sys_stats.append((f"Link: {Link.post_count}", "bright_blue"))
+            if Link.results.saved > 0:
+                sys_stats.append((f"Link Saved: {Link.results.saved}", "bright_blue"))
 
             if Dispatcher.updates_count > 0:
                 sys_stats.append((f"Updates: {Dispatcher.updates_count}", "bright_blue"))
 
+            hot = metrics.top(2)
+            if hot:
+                hot_text = ", ".join(f"{s['name']} ({s['time_mean'] * 1000:.0f} ms)" for s in hot)
+                sys_stats.append((f"Hot: {hot_text}", "bright_blue"))
+
+            lanes = get_lane_stats(ClientsSession.pool)
+            if lanes:
+                sys_stats.append(
+                    (
+                        f"Wait: H {lanes['high'].recent * 1000:.0f}/N {lanes['normal'].recent * 1000:.0f} ms",
+                        "bright_blue",
+                    )
+                )
+
+        # 缓存读取命中率
+        from .cache import cache
+
+        cache_stats = cache.stats()
+        if cache_stats:
+            total = cache_stats["hits"] + cache_stats["misses"]
+            if total:
+                sys_stats.append((f"Cache: {cache_stats['hits'] / total:.0%} ({total})", "bright_blue"))
+
         if emby_used:
             from .emby.api import Emby
 
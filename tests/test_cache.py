@@ -0,0 +1,368 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from embykeeper.cache import Cache, _JSONBackend, _LRUBackend, _SQLiteBackend
+from embykeeper.config import config
+
+
+class _DictBackend:
+    in_memory = False
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def get_many(self, keys, default=None):
+        return {k: self.data.get(k, default) for k in keys}
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture()
+def basedir(tmp_path):
+    config.basedir = tmp_path
+    config.set({"cache": {"flush_interval": 60}})
+    return tmp_path
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        backend = _JSONBackend(tmp_path / "cache.json", journal=False)
+    else:
+        backend = _SQLiteBackend(tmp_path / "cache.db")
+    yield backend
+    backend.close()
+
+
+@pytest.fixture()
+def cache(basedir):
+    cache = Cache()
+    yield cache
+    cache.close()
+
+
+class _Clock:
+    """可手动推进的时钟, 替换缓存模块中的 time."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("embykeeper.cache.time", clock)
+    return clock
+
+
+def _run(coro):
+    """在新的事件循环中运行, 不影响当前线程的默认事件循环."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # 与 asyncio.run 相同, 取消遗留的任务
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+
+def _crash(backend: _JSONBackend):
+    """模拟进程崩溃: 停止后台线程, 不压缩日志."""
+    journal = backend._journal
+    journal._closed = True
+    journal._wakeup.set()
+    journal._thread.join()
+    if journal._file:
+        journal.sync()
+        journal._file.close()
+
+
+def test_lru_missing_key_returns_default():
+    lru = _LRUBackend(_DictBackend(), max_bytes=1024 * 1024, ttl=60)
+    assert lru.get("missing", "DEF") == "DEF"
+    assert lru.get("missing", "DEF") == "DEF"
+    assert lru.get_many(["other"], "DEF") == {"other": "DEF"}
+    assert lru.get_many(["other"], "DEF") == {"other": "DEF"}
+    lru.set("key", 1)
+    lru.delete("key")
+    assert lru.get("key", "DEF") == "DEF"
+    assert lru.get("key", "DEF") == "DEF"
+
+
+def test_journal_replay_after_crash(basedir):
+    file = basedir / "cache.json"
+    backend = _JSONBackend(file)
+    backend.set("a.b", 1)
+    backend.set("a.c", [1, 2])
+    backend.set("d", "x", ttl=3600)
+    backend.delete("a.b")
+    _crash(backend)
+    assert not file.exists()
+
+    restored = _JSONBackend(file)
+    try:
+        assert restored.get("a") == {"c": [1, 2]}
+        assert restored.get("d") == "x"
+        assert restored._expires.keys() == {"d"}
+        # 恢复后已压缩为快照
+        assert file.exists() and not restored._journal.pending
+    finally:
+        restored.close()
+
+
+def test_journal_ignores_torn_last_line(basedir):
+    file = basedir / "cache.json"
+    backend = _JSONBackend(file)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    _crash(backend)
+    journal = file.with_name("cache.json.journal")
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('["set", "c", ')
+
+    restored = _JSONBackend(file)
+    try:
+        assert restored.get("a") == 1
+        assert restored.get("b") == 2
+        assert restored.get("c") is None
+        restored.set("c", 3)
+    finally:
+        restored.close()
+
+    reopened = _JSONBackend(file)
+    try:
+        assert reopened.get("c") == 3
+    finally:
+        reopened.close()
+
+
+def test_journal_replays_old_journal_before_current(basedir):
+    file = basedir / "cache.json"
+    # 上一次压缩在替换快照前崩溃: 旧日志与新日志中均有记录
+    file.with_name("cache.json.journal.old").write_text(
+        '["set", "a", 1]\n["set", "b", 1]\n', encoding="utf-8"
+    )
+    file.with_name("cache.json.journal").write_text('["set", "a", 2]\n["delete", "b"]\n', encoding="utf-8")
+    backend = _JSONBackend(file)
+    try:
+        assert backend.get("a") == 2
+        assert backend.get("b") is None
+    finally:
+        backend.close()
+    assert json.loads(file.read_text(encoding="utf-8")) == {"a": 2}
+
+
+def test_journal_compact_while_writing(basedir):
+    file = basedir / "cache.json"
+    backend = _JSONBackend(file)
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            backend.set(f"k.{i}", i)
+            i += 1
+        backend.set("count", i)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(20):
+            backend._journal.compact()
+    finally:
+        stop.set()
+        thread.join()
+    count = backend.get("count")
+    _crash(backend)
+
+    restored = _JSONBackend(file)
+    try:
+        assert restored.get("count") == count
+        assert restored.get("k") == {str(i): i for i in range(count)}
+    finally:
+        restored.close()
+
+
+def test_backend_nested_dict_values(backend):
+    backend.set("a", {"b": 1, "c": {"d": 2}})
+    assert backend.get("a.b") == 1
+    assert backend.get("a.c.d") == 2
+    assert backend.get("a.c") == {"d": 2}
+    assert sorted(backend.find_by_prefix("a.")) == ["a.b", "a.c.d"]
+
+    backend.set("a.b", 5)
+    assert backend.get("a") == {"b": 5, "c": {"d": 2}}
+
+    backend.set("a.c", 3)
+    assert backend.get("a") == {"b": 5, "c": 3}
+    assert sorted(backend.find_by_prefix("a.")) == ["a.b", "a.c"]
+
+
+def test_backend_overwrite_leaf_with_children(backend):
+    backend.set("a", 1)
+    backend.set("a.b", 2)
+    assert backend.get("a") == {"b": 2}
+    assert backend.find_by_prefix("a") == ["a.b"]
+
+    backend.set("a", {})
+    assert backend.get("a") is None
+    assert backend.get("a.b") is None
+    assert backend.find_by_prefix("a") == []
+
+
+def test_backend_many_and_delete(backend):
+    backend.set_many({"x.a": 1, "x.b": {"c": 2}, "y": [1, 2]})
+    assert backend.get_many(["x.a", "x.b.c", "y", "z"], "DEF") == {
+        "x.a": 1,
+        "x.b.c": 2,
+        "y": [1, 2],
+        "z": "DEF",
+    }
+    backend.delete("x.b")
+    assert backend.get("x") == {"a": 1}
+    backend.delete_many(["x.a", "y"])
+    assert backend.get("x") is None
+    assert backend.find_by_prefix("") == []
+
+
+def test_backend_nested_expiry(backend, clock):
+    backend.set("a", {"b": 1, "c": {"d": 2}}, ttl=10)
+    backend.set("e.f", 1, ttl=10)
+    backend.set("e.g", 2, ttl=30)
+    backend.set("e.h", 3)
+    assert backend.get("a.c.d") == 2
+
+    clock.advance(20)
+    # 上级键过期时, 其下级键同样视为过期
+    assert backend.get("a") is None
+    assert backend.get("a.b") is None
+    assert backend.get("a.c.d") is None
+    assert backend.find_by_prefix("a") == []
+    # 读取上级键时不包含已过期的下级键
+    assert backend.get("e") == {"g": 2, "h": 3}
+    assert sorted(backend.find_by_prefix("e.")) == ["e.g", "e.h"]
+
+    # JSON 缓存按写入的键计数, SQLite 缓存按展开后的叶子键计数
+    assert backend.compact() == (2 if isinstance(backend, _JSONBackend) else 3)
+    assert backend.get("e") == {"g": 2, "h": 3}
+
+
+def test_backend_overwrite_clears_expiry(backend, clock):
+    backend.set("a", {"b": 1, "c": 2}, ttl=10)
+    backend.set("a.b", 3)
+    clock.advance(20)
+    # 重新写入的键不再过期, 其余下级键保留原过期时间
+    assert backend.get("a") == {"b": 3}
+    backend.set("a.c", 4, ttl=10)
+    backend.set("a.c", 5)
+    clock.advance(20)
+    assert backend.get("a") == {"b": 3, "c": 5}
+
+
+def test_async_read_your_writes(cache):
+    async def main():
+        cache.set_nowait("a", 1)
+        assert cache.get("a") == 1
+        assert await cache.aget("a") == 1
+        await cache.aset("a", 2)
+        assert cache.get("a") == 2
+        assert cache._backend.get("a") == 2
+
+        await cache.adelete("a")
+        assert cache.get("a", "DEF") == "DEF"
+        assert await cache.aget_many(["a", "b"], "DEF") == {"a": "DEF", "b": "DEF"}
+
+        # 同步写入晚于进行中的后台写入, 不应被其覆盖
+        for i in range(50):
+            cache.set_nowait(f"k.{i}", "async")
+            await asyncio.sleep(0)
+            cache.set(f"k.{i}", "sync")
+        assert await cache.afind_by_prefix("k.")
+        assert set(cache.get("k").values()) == {"sync"}
+        assert set(cache._backend.get("k").values()) == {"sync"}
+
+    _run(main())
+
+
+def test_async_writes_across_event_loops(cache):
+    async def write(value):
+        cache.set_nowait("a", value)
+
+    async def read():
+        await cache.aset("b", 1)
+        return cache._backend.get("a"), cache._backend.get("b")
+
+    _run(write(1))
+    # 在新的事件循环中, 遗留的修改将被写入, 后台写入重新启动
+    assert _run(read()) == (1, 1)
+    _run(write(2))
+    cache.close()
+    assert cache._backend.get("a") == 2
+
+
+def test_batch_flush_on_exit(cache):
+    cache.set("b", 1)
+    with cache.batch():
+        cache.set("a", 1)
+        cache.set_many({"c": 2, "d": 3})
+        cache.delete("b")
+        # 暂存的修改在上下文中可见, 但尚未写入
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache._backend.get("a") is None
+        assert cache._backend.get("b") == 1
+        with cache.batch():
+            cache.set("e", 4)
+        # 嵌套使用时由最外层统一写入
+        assert cache._backend.get("e") is None
+    assert cache._backend.get_many(["a", "b", "c", "d", "e"]) == {"a": 1, "b": None, "c": 2, "d": 3, "e": 4}
+
+
+def test_batch_rollback_on_error(cache):
+    cache.set("a", 1)
+    with pytest.raises(RuntimeError):
+        with cache.batch():
+            cache.set("a", 2)
+            cache.delete_many(["a"])
+            cache.set("b", 1)
+            raise RuntimeError()
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache._backend.get("b") is None
+
+
+def test_batch_in_event_loop(cache):
+    async def main():
+        with cache.batch():
+            cache.set("a", 1)
+            await cache.aset("b", 2)
+        # 退出时不等待写入完成, 但写入前即可读取
+        assert cache.get_many(["a", "b"]) == {"a": 1, "b": 2}
+        await cache.afind_by_prefix("")
+        assert cache._backend.get_many(["a", "b"]) == {"a": 1, "b": 2}
+
+    _run(main())
@@ -0,0 +1,203 @@
+import asyncio
+from types import SimpleNamespace
+
+import pyrogram
+from pyrogram import filters, raw
+from pyrogram.handlers import MessageHandler, RawUpdateHandler
+
+from embykeeper.config import config
+from embykeeper.telegram.pyrogram import Dispatcher, PooledQueue, RouteTable, WorkerPool, route_keys
+
+
+async def _callback(client, update):
+    pass
+
+
+def _update(chat_id=1, chat_username=None, user_id=7, user_username=None):
+    return SimpleNamespace(
+        chat=SimpleNamespace(id=chat_id, username=chat_username),
+        from_user=SimpleNamespace(id=user_id, username=user_username),
+    )
+
+
+def _build(*specs):
+    """按 (组, 过滤器) 依次添加处理器, 返回路由表和处理器列表."""
+    table = RouteTable()
+    handlers = []
+    for seq, (group, flt) in enumerate(specs):
+        handler = MessageHandler(_callback, flt) if flt is not None else RawUpdateHandler(_callback)
+        table = table.add((group, seq, handler))
+        handlers.append(handler)
+    return table, handlers
+
+
+def _route(table, update):
+    return [e[2] for e in table.route(update)]
+
+
+def test_route_keys():
+    assert route_keys(filters.chat("Foo")) == (("chat", "foo"),)
+    assert route_keys(filters.text & filters.user(7)) == (("user", 7),)
+    assert route_keys(filters.chat(1) & filters.text) == (("chat", 1),)
+    # "或" 组合, 取反, 以及含有 "me" 的过滤器均无法确定处理范围
+    assert route_keys(filters.chat(1) | filters.text) is None
+    assert route_keys(~filters.chat(1)) is None
+    assert route_keys(filters.chat("me")) is None
+    assert route_keys(filters.text) is None
+    assert route_keys(None) is None
+
+
+def test_route_preserves_group_and_insertion_order():
+    table, (a, b, c, d, e, f) = _build(
+        (1, filters.text),  # a: 全部会话
+        (0, filters.chat("foo") & filters.text),  # b
+        (0, filters.text),  # c: 全部会话
+        (2, filters.user(7)),  # d
+        (0, filters.chat(1)),  # e: 与 b 为同一会话 (编号与用户名)
+        (-1, None),  # f: 原始更新处理器
+    )
+    # 多个路由键及全部会话的处理器合并后, 仍按组及添加顺序排列, 首个匹配的处理器优先
+    assert _route(table, _update(chat_id=1, chat_username="Foo")) == [f, b, c, e, a, d]
+    assert _route(table, _update(chat_id=2, user_id=8)) == [f, c, a]
+    assert _route(table, _update(chat_id=2, user_id=7)) == [f, c, a, d]
+
+
+def test_route_without_catchall_returns_bucket():
+    table, (a, b) = _build((0, filters.chat(1)), (1, filters.chat(1) & filters.text))
+    assert _route(table, _update(chat_id=1)) == [a, b]
+    assert _route(table, _update(chat_id=2)) == []
+
+
+def test_route_table_remove():
+    table, (a, b, c) = _build((0, filters.chat(1)), (0, filters.text), (1, filters.chat([1, "foo"])))
+    removed = table.remove(a)
+    # 路由表不可变, 原表不受影响
+    assert _route(table, _update(chat_id=1)) == [a, b, c]
+    assert _route(removed, _update(chat_id=1)) == [b, c]
+    removed = removed.remove(c)
+    assert _route(removed, _update(chat_id=1, chat_username="foo")) == [b]
+    assert removed.index == {}
+    removed = removed.remove(b)
+    assert removed.entries == () and removed.catchall == ()
+
+
+def test_route_table_priority_counts():
+    table = RouteTable()
+    keyed = MessageHandler(_callback, filters.chat(1))
+    keyed.priority = True
+    unkeyed = MessageHandler(_callback, filters.text)
+    unkeyed.priority = True
+    table = table.add((0, 0, keyed))
+    assert table.priority == {("chat", 1): 1} and not table.priority_all
+    table = table.add((0, 1, unkeyed))
+    assert table.priority_all == 1
+    table = table.remove(keyed).remove(unkeyed)
+    assert table.priority == {} and table.priority_all == 0
+
+
+def test_process_calls_first_match_across_groups():
+    called = []
+
+    def handler(name, result=None, flt=filters.all):
+        async def callback(client, update):
+            called.append(name)
+            if result:
+                raise result()
+
+        return MessageHandler(callback, flt)
+
+    update = _update(chat_id=1)
+    nomatch = filters.create(lambda _, __, u: False)
+    table = RouteTable()
+    for seq, (group, h) in enumerate(
+        [
+            (0, handler("filtered", flt=filters.chat(1) & nomatch)),
+            (1, handler("continue", pyrogram.ContinuePropagation, filters.chat(1))),
+            (1, handler("first")),
+            (1, handler("same group")),
+            (2, handler("later group", flt=filters.chat(1))),
+        ]
+    ):
+        table = table.add((group, seq, h))
+
+    async def parse(update, users, chats):
+        return update, MessageHandler
+
+    dispatcher = SimpleNamespace(update_parsers={SimpleNamespace: parse}, routes=table, client=None, active=0)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(Dispatcher.process(dispatcher, (update, {}, {})))
+    finally:
+        loop.close()
+    assert called == ["continue", "first"]
+    assert dispatcher.active == 0
+
+
+class _PooledDispatcher:
+    process = Dispatcher.process
+
+    def __init__(self, pool, routes):
+        self.update_parsers = {SimpleNamespace: self._parse}
+        self.routes = routes
+        self.client = None
+        self.active = 0
+        self.updates_queue = PooledQueue(self, pool)
+
+    @staticmethod
+    async def _parse(update, users, chats):
+        return update, MessageHandler
+
+
+def test_pool_handler_can_wait_for_next_message_in_same_chat():
+    config.set({"telegram": {"shared_workers_min": 2, "shared_workers_max": 4}})
+    received = []
+
+    async def callback(client, update):
+        received.append(update.text)
+        if update.text == "question":
+            # 类似 Session.wait, 在回调函数中等待同一会话的下一条消息
+            await asyncio.wait_for(update.replied.wait(), 1)
+            received.append("answered")
+        else:
+            update.replied.set()
+
+    def packet(text, replied):
+        update = _update(chat_id=-5)
+        update.text, update.replied = text, replied
+        update.message = SimpleNamespace(peer_id=raw.types.PeerChat(chat_id=5))
+        return update, {}, {}
+
+    async def main():
+        pool = WorkerPool()
+        table = RouteTable().add((0, 0, MessageHandler(callback, filters.chat(-5))))
+        dispatcher = _PooledDispatcher(pool, table)
+        pool.register(dispatcher)
+        try:
+            event = asyncio.Event()
+            for text in ("question", "reply", "later"):
+                dispatcher.updates_queue.put_nowait(packet(text, event))
+            for _ in range(100):
+                if len(received) == 4:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await pool.unregister(dispatcher)
+        assert pool.stats()[0] == 0
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+    # 同一会话的更新仍按接收顺序开始处理
+    assert received[:3] == ["question", "reply", "later"]
+    assert received[3] == "answered"
+
+
+def test_lane_stats_per_queue():
+    a = _PooledDispatcher(WorkerPool(), RouteTable())
+    b = _PooledDispatcher(WorkerPool(), RouteTable())
+    a.updates_queue._put(_update())
+    a.updates_queue._get()
+    assert a.updates_queue.stats["normal"].count == 1
+    assert b.updates_queue.stats["normal"].count == 0
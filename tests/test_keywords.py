@@ -0,0 +1,169 @@
+import itertools
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from embykeeper.telegram.checkiner._base import BotCheckin, default_keywords, keyword_categories
+from embykeeper.telegram.keywords import Automaton, KeywordClassifier, KeywordIndex, required_literals
+
+PATTERNS = [
+    "签到",
+    "签到(成功|失败)",
+    "foo|bar",
+    "foo(bar|baz)",
+    "colou?r",
+    "(?:abc)?xyz",
+    "[abc]def",
+    "a{2,3}b",
+    "(?>atomic)ally",
+    "(?>abc|abd)",
+    r"\bword\b",
+    "(?=look)look",
+    "(?i)MiXeD",
+    "开.*注",
+    "(注册|开放)+",
+    "x*",
+    "(foo)?",
+    "a|",
+    "^$",
+]
+
+TEXTS = [
+    "",
+    "今日签到成功",
+    "签 到",
+    "FOObar",
+    "foobaz",
+    "colour",
+    "color",
+    "Colr",
+    "xyz",
+    "ABCXYZ",
+    "cdef",
+    "aab aaab",
+    "ATOMICALLY",
+    "abd",
+    "a word here",
+    "looking",
+    "mixed",
+    "开放注册",
+    "注册",
+    "nothing",
+]
+
+
+def test_required_literals():
+    assert required_literals("签到(成功|失败)") == {"签到"}
+    assert required_literals("成功|失败") == {"成功", "失败"}
+    assert required_literals("(?>atomic)ally") == {"atomic"}
+    assert required_literals("(?>a|b)c") == {"c"}
+    assert required_literals("[abc]def") == {"def"}
+    # 可能匹配空字符串, 或没有必需字面量时无法预筛选
+    for pattern in ("x*", "(foo)?", "a|", "^$", "[abc]", r"\d+"):
+        assert required_literals(pattern) is None
+
+
+def test_may_match_has_no_false_negatives():
+    monitors = [SimpleNamespace(chat_keyword=p) for p in PATTERNS]
+    monitors += [SimpleNamespace(chat_keyword=list(p)) for p in itertools.combinations(PATTERNS[:8], 2)]
+    index = KeywordIndex()
+    for m in monitors:
+        index.add(m)
+    for m, text in itertools.product(monitors, TEXTS):
+        keywords = m.chat_keyword if isinstance(m.chat_keyword, list) else [m.chat_keyword]
+        if any(re.search(k, text, re.IGNORECASE) for k in keywords):
+            assert index.may_match(m, text), (m.chat_keyword, text)
+    # 预筛选确实排除了不可能匹配的监控器
+    assert not index.may_match(monitors[0], "nothing")
+
+
+def test_keyword_index_remove():
+    index = KeywordIndex()
+    a, b = SimpleNamespace(chat_keyword="foo"), SimpleNamespace(chat_keyword="bar")
+    index.add(a)
+    index.add(b)
+    assert index.candidates("foo bar") == {id(a), id(b)}
+    index.remove(a)
+    assert index.candidates("foo bar") == {id(b)}
+    # 未注册的监控器总是可能匹配
+    assert index.may_match(a, "nothing")
+
+
+def test_automaton_overlapping_words():
+    automaton = Automaton([("he", 1), ("she", 2), ("hers", 3), ("is", 4)])
+    assert automaton.find("ushers") == {1, 2, 3}
+    # 与 re.IGNORECASE 一致, "ı" 视为 "i"
+    assert automaton.find("HıS") == {4}
+    assert not Automaton()
+
+
+def _reference_classify(tables, text):
+    for category, keywords in tables:
+        if any(k in text for k in keywords):
+            return category
+    return None
+
+
+class _Site(BotCheckin):
+    name = "测试"
+    bot_checked_keywords = ["今日已签"]
+    bot_success_keywords = ["签到成功"]
+
+
+def _instance(**overrides):
+    site = _Site.__new__(_Site)
+    site.__dict__.update(overrides)
+    return site
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "签到成功",
+        "今日已签, 签到成功",
+        "签到失败",
+        "账户不存在",
+        "您已尝试次数过多",
+        "你好",
+        "",
+        "签到成功 广告",
+    ],
+)
+def test_classifier_matches_reference(text):
+    for site in (
+        _instance(),
+        _instance(bot_text_ignore=["广告"]),
+        _instance(bot_success_keywords="成功", bot_fail_keywords=[]),
+        _instance(bot_checked_keywords=["签到"]),
+    ):
+        tables = site.keyword_tables()
+        assert site.get_text_classifier().classify(text) == _reference_classify(tables, text)
+
+
+def test_classifier_instance_overrides():
+    plain = _instance()
+    assert plain.get_text_classifier() is _Site._text_classifier
+    assert plain.get_text_classifier().classify("今日已签") == "checked"
+
+    # 实例中覆盖的关键词优先于类中定义的关键词
+    site = _instance(bot_success_keywords=["今日已签"], bot_checked_keywords=["已经"])
+    assert site.get_text_classifier() is not _Site._text_classifier
+    assert site.get_text_classifier().classify("今日已签") == "success"
+    assert site.get_text_classifier().classify("已经签到") == "checked"
+    # 置空时使用内置关键词表
+    site = _instance(bot_checked_keywords=[])
+    assert site.get_text_classifier().classify(default_keywords["checked"][0]) == "checked"
+    # 忽略关键词优先级最高
+    site = _instance(bot_text_ignore="今日")
+    assert site.get_text_classifier().classify("今日已签") == "ignore"
+    # 类中的分类器不受实例修改的影响
+    assert plain.get_text_classifier().classify("今日已签") == "checked"
+    assert [c for c, _ in plain.keyword_tables()] == [c for c, _ in keyword_categories]
+
+
+def test_classifier_empty_keyword_always_matches():
+    classifier = KeywordClassifier([("a", ["x"]), ("b", [""]), ("c", ["y"])])
+    assert classifier.classify("x") == "a"
+    assert classifier.classify("y") == "b"
+    assert classifier.classify("") == "b"
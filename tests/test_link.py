@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from embykeeper.cache import Cache, cache
+from embykeeper.config import config
+from embykeeper.telegram.link import LinkResultCache
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    config.basedir = tmp_path
+    config.set({"cache": {"flush_interval": 60}})
+    instance = Cache()
+    monkeypatch.setattr(cache, "_cached_value", instance)
+    yield instance
+    instance.close()
+
+
+def _run(coro):
+    """在新的事件循环中运行, 不影响当前线程的默认事件循环."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_results_cached_only_after_validation():
+    results = LinkResultCache()
+    answers = iter(["wrong", "A", "B"])
+    sent = []
+
+    async def post():
+        sent.append(None)
+        return {"answer": next(answers)}
+
+    valid = lambda r: r["answer"] in ("A", "B")
+
+    async def main():
+        # 未通过验证的结果不缓存
+        assert await results.run("k", post, 60, valid) == ({"answer": "wrong"}, False)
+        assert await results.run("k", post, 60, valid) == ({"answer": "A"}, False)
+        assert await results.run("k", post, 60, valid) == ({"answer": "A"}, True)
+        # 缓存的结果未通过本次调用的验证时重新请求
+        assert await results.run("k", post, 60, lambda r: r["answer"] == "B") == ({"answer": "B"}, False)
+
+    _run(main())
+    assert len(sent) == 3
+
+
+def test_results_without_validation_only_coalesced():
+    results = LinkResultCache()
+    sent = []
+
+    async def post():
+        sent.append(None)
+        await asyncio.sleep(0.01)
+        return {"answer": len(sent)}
+
+    async def main():
+        first = await asyncio.gather(*[results.run("k", post, 60) for _ in range(3)])
+        assert [r for r, _ in first] == [{"answer": 1}] * 3
+        assert sorted(shared for _, shared in first) == [False, True, True]
+        assert await results.run("k", post, 60) == ({"answer": 2}, False)
+
+    _run(main())
+    assert results.coalesced == 2 and results.hits == 0
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from embykeeper import runinfo
+from embykeeper.cache import Cache, cache
+from embykeeper.config import config
+from embykeeper.runinfo import RunContext, RunStatus, _RunTree
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    config.basedir = tmp_path
+    config.set({"cache": {"flush_interval": 60, "runinfo_log_size": 4}})
+    instance = Cache()
+    monkeypatch.setattr(cache, "_cached_value", instance)
+    monkeypatch.setattr(runinfo, "_tree", _RunTree())
+    yield instance
+    runinfo._running_runs.clear()
+    instance.close()
+
+
+def _prepare_finished(parent_ids, status=RunStatus.SUCCESS):
+    run = RunContext.prepare("child", parent_ids=parent_ids)
+    run.start()
+    run.finish(status)
+    return run
+
+
+def test_tree_trims_and_reloads(monkeypatch):
+    monkeypatch.setattr(_RunTree, "max_entries", 8)
+    tree = runinfo._tree
+    root = RunContext.prepare("root", run_id="root")
+    root.set(RunStatus.CATAGORY)
+    running = RunContext.prepare("running", parent_ids=["root"])
+    runs = [_prepare_finished(["root"]) for _ in range(40)]
+    for run in runs:
+        run.get_children()
+
+    assert len(tree.statuses) <= 8
+    assert len(tree.children) <= 8
+    # 运行中的任务不会被移除
+    assert "root" in tree.statuses and running.id in tree.statuses
+    assert "root" in tree.children
+
+    # 被移除的条目从缓存重新加载
+    assert root.status_rollup() == {RunStatus.SUCCESS: 40, RunStatus.PENDING: 1}
+    assert [r.id for r in root.get_children()] == [running.id] + [r.id for r in runs]
+    assert len(tree.statuses) <= 8
+
+
+def test_spilled_logs_reassembled_in_order():
+    run = RunContext.prepare("logs")
+    start = datetime(2024, 1, 1)
+    for i in range(11):
+        run.add_log("INFO", f"message {i}", start + timedelta(seconds=i))
+    assert run.log_spilled == 4
+    assert len(run._log) == 3
+
+    expected = [f"message {i}" for i in range(11)]
+    assert [r.message for r in run.yield_logs()] == expected
+    assert [r.message for r in run.yield_logs(reverse=True)] == expected[::-1]
+    assert [r.message for r in run.yield_logs(include_spilled=False)] == expected[-3:]
+
+    run.finish(RunStatus.SUCCESS)
+    loaded = RunContext.get(run.id)
+    assert loaded is not run
+    assert [r.message for r in loaded.yield_logs()][:11] == expected
+
+
+def test_purge_history_leaves_no_orphans(isolated):
+    parent = RunContext.prepare("account", run_id="checkiner.account.+123")
+    parent.set(RunStatus.CATAGORY)
+    running = RunContext.prepare("site", parent_ids=[parent.id])
+    children = []
+    for i in range(5):
+        child = RunContext.prepare("site", parent_ids=[parent.id])
+        grandchild = RunContext.prepare("step", parent_ids=[child.id])
+        for n in range(6):
+            grandchild.add_log("INFO", f"{i} {n}")
+        grandchild.finish(RunStatus.SUCCESS)
+        child.finish(RunStatus.SUCCESS)
+        children.append((child, grandchild))
+
+    assert all(g.log_spilled for _, g in children)
+    loop = asyncio.new_event_loop()
+    try:
+        removed = loop.run_until_complete(RunContext.purge_history(max_runs=2))
+    finally:
+        loop.close()
+    assert removed == 6
+
+    kept = [c.id for c, _ in children[-2:]]
+    # 超出数量的运行中任务不会被删除
+    assert list(runinfo._tree.get_children(parent.id)) == [running.id] + kept
+    assert isolated.get(runinfo._children_key(parent.id)) == [running.id] + kept
+
+    keys = isolated.find_by_prefix("runinfo.")
+    for child, grandchild in children[:3]:
+        for run in (child, grandchild):
+            escaped = runinfo._escape_id(run.id)
+            assert not [k for k in keys if escaped in k], run.id
+            assert RunContext.get(run.id) is None
+    for child, grandchild in children[3:]:
+        assert RunContext.get(child.id) and RunContext.get(grandchild.id)
+        assert len(list(RunContext.get(grandchild.id).yield_logs())) >= 6
+
+
+def test_tree_flushes_once_per_iteration(isolated):
+    async def main():
+        writes = []
+        set_nowait = isolated.set_nowait
+        isolated.set_nowait = lambda key, *args, **kw: writes.append(key) or set_nowait(key, *args, **kw)
+        parent = RunContext.prepare("account", run_id="parent")
+        ids = [RunContext.prepare("site", parent_ids=["parent"]).id for _ in range(3)]
+        assert isolated.get(runinfo._children_key(parent.id)) is None
+        await asyncio.sleep(0)
+        assert writes.count(runinfo._children_key(parent.id)) == 1
+        await isolated.afind_by_prefix("runinfo.")
+        assert isolated._backend.get(runinfo._children_key(parent.id)) == ids
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+
+from loguru import logger
+import pytest
+
+from embykeeper.cache import Cache, cache
+from embykeeper.config import config
+from embykeeper.schedule import SlotPlanner, TimerService
+
+
+@pytest.fixture()
+def isolated_cache(tmp_path, monkeypatch):
+    config.basedir = tmp_path
+    config.set({"cache": {"flush_interval": 60}})
+    instance = Cache()
+    monkeypatch.setattr(cache, "_cached_value", instance)
+    yield instance
+    instance.close()
+
+
+@pytest.fixture()
+def warnings():
+    messages = []
+    sink = logger.add(lambda m: messages.append(m.record["message"]), level="WARNING")
+    yield messages
+    logger.remove(sink)
+
+
+def _run(coro):
+    """在新的事件循环中运行, 不影响当前线程的默认事件循环."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _after(seconds: float):
+    return datetime.now() + timedelta(seconds=seconds)
+
+
+def test_timers_fire_in_time_order():
+    service = TimerService()
+    fired = []
+
+    async def main():
+        timers = [service.add(_after(d), lambda d=d: fired.append(d)) for d in (0.06, 0.02, 0.04, 0)]
+        await asyncio.gather(*[t.wait() for t in timers])
+
+    _run(main())
+    assert fired == [0, 0.02, 0.04, 0.06]
+    assert len(service) == 0
+
+
+def test_timer_cancel_and_reschedule():
+    service = TimerService()
+    fired = []
+
+    async def main():
+        cancelled = service.add(_after(0.02), lambda: fired.append("cancelled"))
+        moved = service.add(_after(1), lambda: fired.append("moved"))
+        last = service.add(_after(0.05), lambda: fired.append("last"))
+        cancelled.cancel()
+        moved.reschedule(_after(0.03))
+        assert len(service) == 2
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled.wait()
+        await asyncio.gather(moved.wait(), last.wait())
+
+    _run(main())
+    assert fired == ["moved", "last"]
+    assert len(service) == 0
+
+
+def test_timer_wait_cancelled_cancels_timer():
+    service = TimerService()
+
+    async def main():
+        timer = service.add(_after(10))
+        task = asyncio.create_task(timer.wait())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not timer.active
+        assert len(service) == 0
+
+    _run(main())
+
+
+def test_timers_rearm_across_event_loops():
+    service = TimerService()
+
+    async def arm():
+        service.add(_after(0.01))
+
+    async def wait():
+        await asyncio.wait_for(service.sleep_until(_after(0.05)), timeout=1)
+
+    # 事件循环在定时器触发前结束, 之后原唤醒时间已过
+    _run(arm())
+    time.sleep(0.02)
+    # 新的事件循环中, 原事件循环的唤醒回调不再阻止设置唤醒
+    _run(wait())
+    assert len(service) == 0
+
+
+def test_allocate_respects_max_concurrent(warnings):
+    for _ in range(20):
+        offsets = SlotPlanner.allocate(10, 7200, max_concurrent=2, duration=600)
+        assert offsets == sorted(offsets)
+        assert 0 <= offsets[0] and offsets[-1] <= 7200
+        assert SlotPlanner.max_starts(offsets, 600) <= 2
+    assert not warnings
+
+
+def test_allocate_fallback_spreads_evenly(warnings):
+    offsets = SlotPlanner.allocate(10, 3600, max_concurrent=2, duration=1800)
+    assert offsets == [i * 400 for i in range(10)]
+    assert SlotPlanner.max_starts(offsets, 1800) == 5
+    assert len(warnings) == 1 and "最多为 5" in warnings[0]
+
+
+def test_planner_slots_stable_per_member_and_day(isolated_cache):
+    members = [f"account{i}" for i in range(5)]
+    window = dict(start_time=dtime(9, 0), end_time=dtime(12, 0), max_concurrent=2, duration=600)
+    planner = SlotPlanner("checkin", members=members, **window)
+    day = date(2024, 1, 1)
+    slots = {m: planner.slot(m, day) for m in members}
+    assert all(datetime(2024, 1, 1, 9) <= t <= datetime(2024, 1, 1, 12) for t in slots.values())
+    assert {m: planner.slot(m, day) for m in members} == slots
+
+    # 重启后从缓存读取相同的规划
+    restarted = SlotPlanner("checkin", members=members, **window)
+    assert {m: restarted.slot(m, day) for m in members} == slots
+
+    # 新增的任务不影响已有任务的规划
+    added = restarted.slot("account5", day)
+    assert added not in slots.values()
+    assert {m: restarted.slot(m, day) for m in members} == slots
+    assert SlotPlanner("checkin", members=members, **window).slot("account5", day) == added
+
+    # 各日期分别规划, 配置变化时重新规划
+    other = {m: planner.slot(m, day + timedelta(days=1)) for m in members}
+    assert all(t.date() == day + timedelta(days=1) for t in other.values())
+    changed = SlotPlanner("checkin", members=members, **{**window, "end_time": dtime(10, 0)})
+    assert all(changed.slot(m, day) <= datetime(2024, 1, 1, 10) for m in members)
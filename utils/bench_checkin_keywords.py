@@ -0,0 +1,74 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from embykeeper.cli import AsyncTyper
+from embykeeper.config import config
+from embykeeper.utils import to_iterable
+
+app = AsyncTyper()
+
+REPLIES = [
+    "签到成功, 获得 10 积分, 当前积分 120",
+    "您今天已经签到过了, 请明日再来",
+    "验证码错误, 请重试",
+    "请先加入群组后再签到",
+    "尝试次数过多, 请稍后再试",
+    "请输入验证码",
+    "欢迎使用本机器人, 请选择功能",
+    "当前积分: 120, 连续签到 5 天",
+]
+
+
+def legacy(checker, text: str):
+    """原实现: 依次检查各关键词表."""
+    from embykeeper.telegram.checkiner._base import default_keywords
+
+    if any(s in text for s in to_iterable(checker.bot_text_ignore)):
+        return "ignore"
+    for category, attr in (
+        ("account_fail", "bot_account_fail_keywords"),
+        ("too_many_tries_fail", "bot_too_many_tries_fail_keywords"),
+        ("checked", "bot_checked_keywords"),
+        ("fail", "bot_fail_keywords"),
+        ("success", "bot_success_keywords"),
+    ):
+        if any(s in text for s in to_iterable(getattr(checker, attr)) or default_keywords[category]):
+            return category
+    return None
+
+
+@app.async_command()
+async def main(rounds: int = 20000):
+    """比较签到器依次检查关键词表与单次扫描关键词分类器的每条回复处理用时 (微秒)."""
+    config.basedir = Path(tempfile.mkdtemp())
+    config.set({})
+
+    from embykeeper.telegram.checkiner import BotCheckin
+    from embykeeper.telegram.dynamic import extract, get_cls
+
+    # 仅用于读取关键词表, 无需初始化
+    checkers = [object.__new__(c) for c in extract(get_cls("checkiner")) if issubclass(c, BotCheckin)]
+    samples = [(random.choice(checkers), random.choice(REPLIES)) for _ in range(rounds)]
+
+    for c, text in samples[:2000]:
+        assert legacy(c, text) == c.get_text_classifier().classify(text), (type(c).__name__, text)
+
+    start = time.perf_counter()
+    for c, text in samples:
+        legacy(c, text)
+    old = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    for c, text in samples:
+        c.get_text_classifier().classify(text)
+    new = (time.perf_counter() - start) / rounds * 1e6
+
+    print(f"checkers: {len(checkers)}, replies: {rounds}")
+    print(f"sequential any() scans: {old:.2f} us/reply")
+    print(f"keyword classifier:     {new:.2f} us/reply")
+
+
+if __name__ == "__main__":
+    app()
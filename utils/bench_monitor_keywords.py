@@ -0,0 +1,105 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import yaml
+
+from embykeeper.cli import AsyncTyper
+from embykeeper.config import config
+
+app = AsyncTyper()
+
+CHATTER = [
+    "早上好",
+    "有人在吗",
+    "这个片子怎么样",
+    "签到",
+    "哈哈哈哈",
+    "求个邀请码",
+    "今天又是摸鱼的一天",
+    "bot 挂了吗",
+]
+SPECIALS = [
+    "问题1：下面哪个是正确答案\nA:一\nB:二\nC:三\nD:四\n答案为：B",
+    "击杀者 someone 是否要奖励翻倍",
+    "恭喜 someone:本次获得100豆",
+    "someone血量已耗尽。",
+    "开 放 注 册",
+    "注册已开放, 剩余可注册人数：5",
+]
+
+
+def load_traffic(path: Path, count: int):
+    """读取 --analyze 生成的消息记录, 不存在时生成模拟群聊消息."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            messages = yaml.safe_load(f)["messages"]
+    else:
+        messages = [
+            " ".join(random.choices(CHATTER, k=random.randint(1, 6))) for _ in range(count)
+        ] + SPECIALS * max(1, count // 500)
+    random.shuffle(messages)
+    return [SimpleNamespace(text=t, caption=None, from_user=None) for t in messages[:count]]
+
+
+def load_monitors(client):
+    from embykeeper.telegram.dynamic import extract, get_cls
+    from embykeeper.telegram.monitor import Monitor
+
+    monitors = []
+    for cls in extract(get_cls("monitor")):
+        if not issubclass(cls, Monitor):
+            continue
+        monitors.append(
+            SimpleNamespace(
+                client=client,
+                chat_user=[],
+                chat_keyword=cls.chat_keyword,
+                chat_except_keyword=cls.chat_except_keyword,
+            )
+        )
+    return monitors
+
+
+def measure(monitors, messages):
+    from embykeeper.telegram.monitor import Monitor
+
+    start = time.perf_counter()
+    matches = 0
+    for m in messages:
+        for monitor in monitors:
+            for _ in Monitor.keys(monitor, m):
+                matches += 1
+    return (time.perf_counter() - start) / len(messages) * 1e6, matches
+
+
+@app.async_command()
+async def main(traffic: Path = None, count: int = 5000):
+    """比较逐个监控器执行正则与关键词索引预筛选的每条消息处理用时 (微秒)."""
+    config.basedir = Path(tempfile.mkdtemp())
+    config.set({})
+
+    from embykeeper.telegram.keywords import KeywordIndex
+
+    messages = load_traffic(traffic, count)
+
+    plain = load_monitors(None)
+    base, base_matches = measure(plain, messages)
+
+    index = KeywordIndex()
+    client = SimpleNamespace(keyword_index=index)
+    indexed = load_monitors(client)
+    for monitor in indexed:
+        index.add(monitor)
+    fast, fast_matches = measure(indexed, messages)
+
+    assert base_matches == fast_matches, "预筛选结果与逐个匹配不一致"
+    print(f"monitors: {len(plain)}, messages: {len(messages)}, matches: {base_matches}")
+    print(f"regex per monitor: {base:.1f} us/msg")
+    print(f"keyword index:     {fast:.1f} us/msg ({len(index.always)} monitors always scanned)")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,51 @@
+import time
+from pathlib import Path
+
+from embykeeper.cli import AsyncTyper
+
+app = AsyncTyper()
+
+DATA = Path(__file__).parent / "data"
+
+
+def load_captchas():
+    """读取 utils/data 下的验证码样本."""
+    files = sorted(DATA.glob("*/captcha.jpg")) + sorted(DATA.glob("*/captchas/*.jpg"))
+    return [f.read_bytes() for f in files]
+
+
+@app.async_command()
+async def main(sizes: str = "1,2,4,8,16", repeat: int = 8):
+    """模拟积压的验证码队列, 报告不同批大小下 OCR 模型的吞吐量 (张/秒)."""
+    from ddddocr import DdddOcr
+
+    from embykeeper.ocr import CharRange, OCRModel
+
+    captchas = load_captchas()
+    requests = [
+        (data, CharRange.NUMBER_LLETTER_ULETTER if i % 2 else None, False)
+        for i, data in enumerate(captchas * repeat)
+    ]
+
+    engine = OCRModel(DdddOcr(beta=True, show_ad=False))
+    if not engine.batched:
+        print("batched inference unavailable, falling back to per-image classification")
+    engine.run(requests[: len(captchas)], 1)  # 预热
+
+    expected = None
+    print(f"captchas: {len(captchas)}, queue: {len(requests)}")
+    for size in [int(s) for s in sizes.split(",")]:
+        start = time.perf_counter()
+        results = []
+        for k in range(0, len(requests), size):
+            # 每次取出 size 个请求, 与 OCR 进程中一次收集到的请求相同
+            results.extend(engine.run(requests[k : k + size], size))
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = results
+        assert results == expected, "批量推理结果与逐个推理不一致"
+        print(f"batch {size:>3}: {len(requests) / elapsed:7.1f} captchas/s")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,65 @@
+import statistics
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from embykeeper.cli import AsyncTyper
+from embykeeper.config import config
+
+app = AsyncTyper()
+
+DATA = Path(__file__).parent / "data"
+
+
+def load_captchas():
+    """读取 utils/data 下的验证码样本."""
+    files = sorted(DATA.glob("*/captcha.jpg")) + sorted(DATA.glob("*/captchas/*.jpg"))
+    return [(f.relative_to(DATA), f.read_bytes()) for f in files]
+
+
+@app.async_command()
+async def main(rounds: int = 5):
+    """报告 OCR 子进程的单个验证码往返用时, 以及扣除模型推理用时后的结果投递延迟 (毫秒)."""
+    config.basedir = Path(tempfile.mkdtemp())
+    config.set({})
+
+    from ddddocr import DdddOcr
+
+    from embykeeper.ocr import OCRService
+
+    captchas = load_captchas()
+
+    model = DdddOcr(beta=True, show_ad=False)
+    infer = []
+    for _, data in captchas * rounds:
+        start = time.perf_counter()
+        model.classification(data)
+        infer.append(time.perf_counter() - start)
+    del model
+
+    ocr = await OCRService.get()
+    latency = []
+    with ocr:
+        await ocr.run(BytesIO(captchas[0][1]))  # 预热: 启动进程并加载模型
+        for _, data in captchas * rounds:
+            start = time.perf_counter()
+            await ocr.run(BytesIO(data))
+            latency.append(time.perf_counter() - start)
+    await ocr.stop(force=True)
+
+    def ms(values, q=None):
+        if q is None:
+            return statistics.mean(values) * 1000
+        return sorted(values)[int(q * (len(values) - 1))] * 1000
+
+    print(f"captchas: {len(captchas)}, requests: {len(latency)}")
+    print(f"model inference:    mean {ms(infer):.1f} ms, p50 {ms(infer, 0.5):.1f} ms")
+    print(
+        f"service round-trip: mean {ms(latency):.1f} ms, p50 {ms(latency, 0.5):.1f} ms, max {max(latency) * 1000:.1f} ms"
+    )
+    print(f"delivery overhead:  mean {ms(latency) - ms(infer):.1f} ms")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,60 @@
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from embykeeper.cli import AsyncTyper
+from embykeeper.config import config
+
+app = AsyncTyper()
+
+
+def legacy_sink(run_id):
+    # 旧实现: 每个任务一个日志处理器, 每条日志需经过所有处理器
+    def log_sink(message):
+        if message.record["extra"].get("run_id") == run_id:
+            pass
+
+    return logger.add(log_sink, filter=lambda record: "run_id" in record["extra"])
+
+
+def measure(log, records: int):
+    start = time.perf_counter()
+    for i in range(records):
+        log.info(f"测试日志 {i}")
+    return (time.perf_counter() - start) / records * 1e6
+
+
+@app.async_command()
+async def main(records: int = 2000, runs: str = "1,10,100,1000,3000", legacy: bool = True):
+    config.basedir = Path(tempfile.mkdtemp())
+    config.set({})
+
+    from embykeeper.runinfo import RunContext
+
+    logger.remove()
+    sizes = [int(n) for n in runs.split(",")]
+    print(f"{'runs':>6} {'shared sink (us/record)':>24} {'per-run sinks (us/record)':>26}")
+    for n in sizes:
+        ctxs = [RunContext.prepare(f"bench {i}") for i in range(n)]
+        shared = measure(ctxs[-1].bind_logger(logger), records)
+        assert sum(1 for _ in ctxs[-1].yield_logs()) >= records
+
+        old = "-"
+        if legacy:
+            ids = [legacy_sink(ctx.id) for ctx in ctxs]
+            old = f"{measure(logger.bind(run_id='LEGACY'), records):.2f}"
+            for i in ids:
+                logger.remove(i)
+
+        start = time.perf_counter()
+        for ctx in ctxs:
+            ctx.finish()
+        print(
+            f"{n:>6} {shared:>24.2f} {old:>26}  (finish: {(time.perf_counter() - start) / n * 1e6:.1f} us/run)"
+        )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,56 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from embykeeper.cli import AsyncTyper
+from embykeeper.config import config
+
+app = AsyncTyper()
+
+
+async def prepare(workdir: Path, name: str, peers: int):
+    from embykeeper.telegram.pyrogram import FileStorage
+
+    storage = FileStorage(name, workdir)
+    await storage.open()
+    await storage.update_peers([(-1000000000000 - i, i * 7, "supergroup", None) for i in range(1, peers + 1)])
+    # 模拟对话删除产生的空闲页
+    storage.conn.execute("DELETE FROM peers WHERE id % 10 = 0")
+    await storage.save()
+    await storage.close()
+
+
+async def measure(workdir: Path, name: str, opens: int):
+    from embykeeper.telegram.pyrogram import FileStorage
+
+    start = time.perf_counter()
+    for _ in range(opens):
+        storage = FileStorage(name, workdir)
+        await storage.open()
+        await storage.close()
+    return (time.perf_counter() - start) / opens * 1000
+
+
+@app.async_command()
+async def main(peers: str = "1000,10000,100000", opens: int = 5):
+    """比较会话文件在整理模式与 WAL 模式下的打开用时 (毫秒)."""
+    config.basedir = Path(tempfile.mkdtemp())
+    config.set({})
+    logger.remove()
+    workdir = Path(tempfile.mkdtemp())
+    print(f"{'peers':>8} {'vacuum on open (ms)':>20} {'wal (ms)':>10}")
+    for n in [int(p) for p in peers.split(",")]:
+        results = []
+        for wal in (False, True):
+            config.telegram.session_wal = wal
+            name = f"bench_{n}_{int(wal)}"
+            await prepare(workdir, name, n)
+            results.append(await measure(workdir, name, opens))
+        print(f"{n:>8} {results[0]:>20.2f} {results[1]:>10.2f}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,49 @@
+import asyncio
+import base64
+import random
+import time
+
+from loguru import logger
+
+from embykeeper.cli import AsyncTyper
+from embykeeper.schema import TelegramAccount
+from embykeeper.telegram.session import LoginOrchestrator
+
+app = AsyncTyper()
+
+
+def fake_session(dc: int):
+    # 仅包含数据中心编号的模拟会话字符串
+    return base64.urlsafe_b64encode(bytes([dc]) + random.randbytes(8)).decode().rstrip("=")
+
+
+async def bench(accounts, concurrency: int, per_dc: int, latency: float):
+    orchestrator = LoginOrchestrator(concurrency=concurrency, concurrency_per_dc=per_dc)
+
+    async def login():
+        # 模拟打开会话存储和连接服务器的耗时
+        await asyncio.sleep(latency * random.uniform(0.5, 1.5))
+        return True
+
+    start = time.perf_counter()
+    await asyncio.gather(*[orchestrator.run(a, login) for a in accounts])
+    return time.perf_counter() - start
+
+
+@app.async_command()
+async def main(counts: str = "10,50,100", concurrency: str = "1,8,32", per_dc: int = 4, latency: float = 0.5):
+    """模拟登录不同数量的账号, 报告全部账号就绪所需的时间 (秒)."""
+    logger.remove()
+    levels = [int(c) for c in concurrency.split(",")]
+    print(f"{'accounts':>8} " + " ".join(f"{f'parallel={c}':>12}" for c in levels))
+    for n in [int(c) for c in counts.split(",")]:
+        accounts = [
+            TelegramAccount(phone=f"+100000{i:05d}", session=fake_session(random.choice([1, 2, 4, 5])))
+            for i in range(n)
+        ]
+        results = [await bench(accounts, c, per_dc, latency) for c in levels]
+        print(f"{n:>8} " + " ".join(f"{r:>12.2f}" for r in results))
+
+
+if __name__ == "__main__":
+    app()